@@ -0,0 +1,151 @@
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+
+#define TABLE_SIZE 1024
+#define N_ITEMS 20000
+
+struct entry {
+    char key[16];
+    int value;
+    struct entry *next;
+};
+
+static struct entry *table[TABLE_SIZE];
+
+static unsigned int hash(const char *s)
+{
+    unsigned int h = 2166136261u;
+    while (*s) {
+        h ^= (unsigned char)*s++;
+        h *= 16777619u;
+    }
+    return h % TABLE_SIZE;
+}
+
+static void table_put(const char *key, int value)
+{
+    unsigned int h = hash(key);
+    for (struct entry *e = table[h]; e; e = e->next) {
+        if (strcmp(e->key, key) == 0) {
+            e->value = value;
+            return;
+        }
+    }
+    struct entry *e = malloc(sizeof(*e));
+    if (!e)
+        exit(1);
+    strncpy(e->key, key, sizeof(e->key) - 1);
+    e->key[sizeof(e->key) - 1] = '\0';
+    e->value = value;
+    e->next = table[h];
+    table[h] = e;
+}
+
+static int table_get(const char *key, int *value)
+{
+    for (struct entry *e = table[hash(key)]; e; e = e->next) {
+        if (strcmp(e->key, key) == 0) {
+            *value = e->value;
+            return 1;
+        }
+    }
+    return 0;
+}
+
+static void table_free(void)
+{
+    for (int i = 0; i < TABLE_SIZE; i++) {
+        struct entry *e = table[i];
+        while (e) {
+            struct entry *next = e->next;
+            free(e);
+            e = next;
+        }
+        table[i] = NULL;
+    }
+}
+
+static void swap(int *a, int *b)
+{
+    int t = *a;
+    *a = *b;
+    *b = t;
+}
+
+static int partition(int *v, int lo, int hi)
+{
+    int pivot = v[hi];
+    int i = lo - 1;
+    for (int j = lo; j < hi; j++) {
+        if (v[j] <= pivot)
+            swap(&v[++i], &v[j]);
+    }
+    swap(&v[i + 1], &v[hi]);
+    return i + 1;
+}
+
+static void quicksort(int *v, int lo, int hi)
+{
+    while (lo < hi) {
+        int p = partition(v, lo, hi);
+        if (p - lo < hi - p) {
+            quicksort(v, lo, p - 1);
+            lo = p + 1;
+        } else {
+            quicksort(v, p + 1, hi);
+            hi = p - 1;
+        }
+    }
+}
+
+static int binary_search(const int *v, int n, int x)
+{
+    int lo = 0, hi = n - 1;
+    while (lo <= hi) {
+        int mid = lo + (hi - lo) / 2;
+        if (v[mid] == x)
+            return mid;
+        if (v[mid] < x)
+            lo = mid + 1;
+        else
+            hi = mid - 1;
+    }
+    return -1;
+}
+
+static unsigned int xorshift(unsigned int *state)
+{
+    unsigned int x = *state;
+    x ^= x << 13;
+    x ^= x >> 17;
+    x ^= x << 5;
+    return *state = x;
+}
+
+int main(void)
+{
+    static int values[N_ITEMS];
+    unsigned int state = 12345;
+    char key[16];
+    long checksum = 0;
+
+    for (int i = 0; i < N_ITEMS; i++) {
+        values[i] = (int)(xorshift(&state) % 100000);
+        snprintf(key, sizeof(key), "k%d", values[i] % 5000);
+        table_put(key, values[i]);
+    }
+
+    quicksort(values, 0, N_ITEMS - 1);
+
+    for (int i = 0; i < 5000; i++) {
+        int v;
+        snprintf(key, sizeof(key), "k%d", i);
+        if (table_get(key, &v))
+            checksum += binary_search(values, N_ITEMS, v) >= 0 ? v : -v;
+    }
+
+    table_free();
+    printf("%ld\n", checksum);
+    return 0;
+}
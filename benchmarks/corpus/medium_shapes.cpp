@@ -0,0 +1,76 @@
+#include <cmath>
+#include <cstdio>
+#include <memory>
+#include <vector>
+
+namespace {
+
+class Shape {
+public:
+    virtual ~Shape() = default;
+    virtual double area() const = 0;
+    virtual double perimeter() const = 0;
+};
+
+class Circle : public Shape {
+public:
+    explicit Circle(double r) : r_(r) {}
+    double area() const override { return M_PI * r_ * r_; }
+    double perimeter() const override { return 2 * M_PI * r_; }
+
+private:
+    double r_;
+};
+
+class Rect : public Shape {
+public:
+    Rect(double w, double h) : w_(w), h_(h) {}
+    double area() const override { return w_ * h_; }
+    double perimeter() const override { return 2 * (w_ + h_); }
+
+private:
+    double w_, h_;
+};
+
+class Triangle : public Shape {
+public:
+    Triangle(double a, double b, double c) : a_(a), b_(b), c_(c) {}
+    double area() const override
+    {
+        double s = perimeter() / 2;
+        return std::sqrt(s * (s - a_) * (s - b_) * (s - c_));
+    }
+    double perimeter() const override { return a_ + b_ + c_; }
+
+private:
+    double a_, b_, c_;
+};
+
+std::unique_ptr<Shape> make_shape(unsigned int i)
+{
+    switch (i % 3) {
+    case 0:
+        return std::make_unique<Circle>(1.0 + i % 7);
+    case 1:
+        return std::make_unique<Rect>(1.0 + i % 5, 2.0 + i % 3);
+    default:
+        return std::make_unique<Triangle>(3.0, 4.0, 5.0);
+    }
+}
+
+} // namespace
+
+int main()
+{
+    std::vector<std::unique_ptr<Shape>> shapes;
+    for (unsigned int i = 0; i < 100000; i++)
+        shapes.push_back(make_shape(i));
+
+    double total_area = 0, total_perimeter = 0;
+    for (const auto &s : shapes) {
+        total_area += s->area();
+        total_perimeter += s->perimeter();
+    }
+    std::printf("%.3f %.3f\n", total_area, total_perimeter);
+    return 0;
+}
@@ -0,0 +1,21 @@
+#include <stdio.h>
+
+static unsigned long fib(unsigned int n)
+{
+    unsigned long a = 0, b = 1;
+    for (unsigned int i = 0; i < n; i++) {
+        unsigned long t = a + b;
+        a = b;
+        b = t;
+    }
+    return a;
+}
+
+int main(void)
+{
+    unsigned long sum = 0;
+    for (unsigned int i = 0; i < 90; i++)
+        sum ^= fib(i);
+    printf("%lu\n", sum);
+    return 0;
+}
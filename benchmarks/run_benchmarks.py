@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+run_benchmarks.py
+
+Usage:
+    python benchmarks/run_benchmarks.py [--repeat 5] [--output results.json]
+                                        [--baseline benchmarks/baseline.json]
+                                        [--update-baseline] [--threshold passes_s=0.15]
+
+Runs every program of benchmarks/corpus (plus an optional synthetic program)
+through every config of benchmarks/configs and measures:
+- end-to-end, frontend and pass-pipeline wall time
+- wall time of every pass stage
+- number of tool processes started
+- frontend and obfuscated bitcode size and their growth ratio
+- peak RSS of the pass processes
+
+Results are written as JSON. With --baseline they are compared against a
+stored run and the script exits with status 1 if any metric regressed by more
+than its threshold. No baseline is committed, because timings only compare on
+the same host and toolchain. A missing baseline file, or one sharing no case
+with the run, is reported and exits with status 2 instead of passing
+silently; record one with --update-baseline first.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from src.services.artifact_cache import get_tool_version  # noqa: E402
+from src.services.llvm_pass_service import LLVMPassService  # noqa: E402
+from src.services.llvm_service import LLVMService  # noqa: E402
+
+BENCH_DIR = Path(__file__).resolve().parent
+CORPUS_DIR = BENCH_DIR / "corpus"
+CONFIGS_DIR = BENCH_DIR / "configs"
+
+# Allowed relative increase per metric before it counts as a regression.
+DEFAULT_THRESHOLDS = {
+    "end_to_end_s": 0.10,
+    "frontend_s": 0.15,
+    "passes_s": 0.10,
+    "processes": 0.0,
+    "obf_bytes": 0.02,
+    "growth": 0.02,
+    "peak_rss_kb": 0.10,
+}
+# Time differences below this many seconds are treated as noise.
+MIN_TIME_DELTA_S = 0.005
+
+
+def write_synthetic_program(path: Path, functions: int):
+    """Write a deterministic C program with `functions` small branchy functions."""
+    lines = ["#include <stdio.h>", ""]
+    for i in range(functions):
+        lines += [
+            f"static int f{i}(int x)",
+            "{",
+            "    int acc = 0;",
+            f"    for (int j = 0; j < (x & 15) + {i % 7 + 1}; j++) {{",
+            f"        if ((j ^ x) & {1 << (i % 5)})",
+            f"            acc += j * {i % 13 + 3};",
+            "        else",
+            f"            acc ^= x >> {i % 4 + 1};",
+            "    }",
+            f"    return acc + {i};",
+            "}",
+            "",
+        ]
+    lines += ["int main(void)", "{", "    long total = 0;"]
+    lines += [f"    total += f{i}({i});" for i in range(functions)]
+    lines += ['    printf("%ld\\n", total);', "    return 0;", "}", ""]
+    path.write_text("\n".join(lines), encoding="utf-8")
+
+
+def run_case(source: Path, config: Dict[str, Any], args, work_dir: Path) -> Dict[str, Any]:
+    """Compile and obfuscate one program once and return its metrics."""
+    bc_path = work_dir / f"{source.stem}.bc"
+    obf_path = work_dir / f"{source.stem}_obf.bc"
+    for path in (bc_path, obf_path):
+        if path.exists():
+            path.unlink()
+
+    started = time.monotonic()
+    LLVMService(args.clang).compile_to_bytecode(str(source), str(bc_path), args.compiler)
+    frontend_s = time.monotonic() - started
+
+    service = LLVMPassService(
+        args.clang, work_dir=str(work_dir), fused=args.fused, backend=args.backend, opt_path=args.opt,
+        in_memory=args.in_memory,
+    )
+    passes_started = time.monotonic()
+    run = service.apply_json_conf(config, str(bc_path), str(obf_path))
+    passes_s = time.monotonic() - passes_started
+
+    if not run.success or not obf_path.exists():
+        raise RuntimeError(f"Pipeline failed for {source.name}")
+
+    stages: Dict[str, float] = {}
+    for usage in run.resource_usage:
+        stages[f"{usage['stage']}#{usage['cycle']}"] = usage["wall_s"]
+
+    bc_bytes = bc_path.stat().st_size
+    obf_bytes = obf_path.stat().st_size
+    return {
+        "end_to_end_s": time.monotonic() - started,
+        "frontend_s": frontend_s,
+        "passes_s": passes_s,
+        "processes": 1 + sum(1 for u in run.resource_usage if not u.get("cached")),
+        "bc_bytes": bc_bytes,
+        "obf_bytes": obf_bytes,
+        "growth": obf_bytes / bc_bytes if bc_bytes else 0.0,
+        "peak_rss_kb": max((u.get("max_rss_kb", 0) for u in run.resource_usage), default=0),
+        "stages": stages,
+    }
+
+
+def summarize(runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Median of every metric over the repeated runs (plus the minimum end-to-end time)."""
+    summary = {
+        key: statistics.median(run[key] for run in runs)
+        for key in runs[0]
+        if key != "stages"
+    }
+    summary["end_to_end_min_s"] = min(run["end_to_end_s"] for run in runs)
+    summary["stages"] = {
+        stage: statistics.median(run["stages"].get(stage, 0.0) for run in runs)
+        for stage in runs[0]["stages"]
+    }
+    summary["repeat"] = len(runs)
+    return summary
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], thresholds: Dict[str, float]) -> List[str]:
+    """Return a description of every metric that regressed beyond its threshold."""
+    regressions = []
+    for case, current in results["cases"].items():
+        previous = baseline.get("cases", {}).get(case)
+        if previous is None:
+            print(f"[BENCH] {case}: no baseline, skipped")
+            continue
+        for metric, threshold in thresholds.items():
+            if metric not in current or metric not in previous:
+                continue
+            old, new = previous[metric], current[metric]
+            limit = old * (1 + threshold)
+            if metric.endswith("_s"):
+                limit = max(limit, old + MIN_TIME_DELTA_S)
+            if new > limit:
+                change = (new / old - 1) * 100 if old else float("inf")
+                regressions.append(f"{case}: {metric} {old:.4g} -> {new:.4g} (+{change:.1f}%, limit +{threshold * 100:.0f}%)")
+    return regressions
+
+
+NO_BASELINE = 2  # exit status when there is nothing to compare against
+
+
+def missing_baseline(path: str) -> bool:
+    """Report a --baseline file that does not exist yet."""
+    if Path(path).is_file():
+        return False
+    print(
+        f"[BENCH] No baseline at {path}; nothing to compare against. Record one on this "
+        f"host and toolchain with --update-baseline."
+    )
+    return True
+
+
+def check_regressions(results: Dict[str, Any], baseline_path: str, thresholds: Dict[str, float]) -> int:
+    """Compare results with the baseline file, print the outcome and return the exit status."""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    if not set(results["cases"]) & set(baseline.get("cases", {})):
+        print(f"[BENCH] The baseline {baseline_path} has none of these cases; nothing was compared.")
+        return NO_BASELINE
+    regressions = compare(results, baseline, thresholds)
+    for regression in regressions:
+        print(f"[REGRESSION] {regression}")
+    if regressions:
+        return 1
+    print("[BENCH] No regressions.")
+    return 0
+
+
+def parse_thresholds(values: List[str]) -> Dict[str, float]:
+    thresholds = dict(DEFAULT_THRESHOLDS)
+    for value in values:
+        metric, _, ratio = value.partition("=")
+        if metric not in thresholds or not ratio:
+            raise SystemExit(f"Invalid threshold '{value}', expected one of {sorted(thresholds)}=<ratio>")
+        thresholds[metric] = float(ratio)
+    return thresholds
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the obfuscation pipeline.")
+    parser.add_argument("--clang", default=os.getenv("CLANG_PATH", "clang"))
+    parser.add_argument("--opt", default=os.getenv("OPT_PATH", "opt"))
+    parser.add_argument("--backend", choices=["clang", "opt"], default="clang")
+    parser.add_argument("--fused", action="store_true", help="Use the fused pass pipeline.")
+    parser.add_argument("--in-memory", action="store_true", help="Pipe bitcode between stages instead of writing it to disk.")
+    parser.add_argument("--compiler", default="native", help='Target compiler passed to compile_to_bytecode ("native" = host target).')
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--synthetic", type=int, default=0, help="Also benchmark a generated program with this many functions.")
+    parser.add_argument("--filter", default="", help="Only run cases whose name contains this text.")
+    parser.add_argument("--output", default=str(BENCH_DIR / "results.json"))
+    parser.add_argument("--baseline", help="Baseline results to compare against.")
+    parser.add_argument("--update-baseline", action="store_true", help="Write the results to --baseline instead of comparing.")
+    parser.add_argument("--threshold", action="append", default=[], metavar="METRIC=RATIO")
+    args = parser.parse_args()
+
+    thresholds = parse_thresholds(args.threshold)
+    if args.baseline and not args.update_baseline and missing_baseline(args.baseline):
+        return NO_BASELINE  # before spending minutes on runs that cannot be checked
+    configs = {p.stem: json.loads(p.read_text(encoding="utf-8")) for p in sorted(CONFIGS_DIR.glob("*.json"))}
+
+    with tempfile.TemporaryDirectory(prefix="rmor-bench-") as tmp:
+        work_dir = Path(tmp)
+        sources = sorted(p for p in CORPUS_DIR.iterdir() if p.suffix in {".c", ".cpp"})
+        if args.synthetic:
+            synthetic = work_dir / f"synthetic_{args.synthetic}.c"
+            write_synthetic_program(synthetic, args.synthetic)
+            sources.append(synthetic)
+
+        cases = {}
+        for source in sources:
+            for config_name, config in configs.items():
+                case = f"{source.name}:{config_name}"
+                if args.filter not in case:
+                    continue
+                runs = [run_case(source, config, args, work_dir) for _ in range(args.repeat)]
+                cases[case] = summarize(runs)
+                print(f"[BENCH] {case}: {cases[case]['end_to_end_s']:.3f}s, {cases[case]['processes']} processes, growth x{cases[case]['growth']:.2f}")
+
+    results = {
+        "meta": {
+            "clang": get_tool_version(args.clang),
+            "backend": args.backend,
+            "fused": args.fused,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "system": platform.system(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "cases": cases,
+    }
+    Path(args.output).write_text(json.dumps(results, indent=4), encoding="utf-8")
+    print(f"[BENCH] Results written to {args.output}")
+
+    if args.baseline:
+        if args.update_baseline:
+            Path(args.baseline).write_text(json.dumps(results, indent=4), encoding="utf-8")
+            print(f"[BENCH] Baseline updated: {args.baseline}")
+            return 0
+        return check_regressions(results, args.baseline, thresholds)
+    print("[BENCH] No --baseline given; the results were not checked for regressions.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+startup_time.py
+
+Usage:
+    python benchmarks/startup_time.py [--repeat 10] [--output startup.json]
+                                      [--baseline benchmarks/startup_baseline.json] [--update-baseline]
+
+Starts the GUI in fresh processes with `python -m src.main --measure-startup`
+and records the median of:
+- import_s: importing the application modules
+- window_s: building the main window and drawing the first frame
+- startup_s: both of the above
+- process_s: wall time of the whole process, including interpreter startup
+
+Needs a display. With --baseline the results are compared like run_benchmarks.py.
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from run_benchmarks import NO_BASELINE, ROOT, check_regressions, missing_baseline
+
+THRESHOLDS = {"import_s": 0.10, "window_s": 0.10, "startup_s": 0.10, "process_s": 0.10}
+
+
+def measure_once() -> dict:
+    started = time.monotonic()
+    proc = subprocess.run(
+        [sys.executable, "-m", "src.main", "--measure-startup"],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    process_s = time.monotonic() - started
+    if proc.returncode != 0:
+        raise RuntimeError(f"GUI failed to start: {proc.stderr.strip()}")
+    # The app may print other lines; the measurement is the last one.
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result["process_s"] = process_s
+    return result
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Measure GUI cold-start time.")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--output", default=str(Path(__file__).resolve().parent / "startup.json"))
+    parser.add_argument("--baseline")
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+    if args.baseline and not args.update_baseline and missing_baseline(args.baseline):
+        return NO_BASELINE
+
+    runs = [measure_once() for _ in range(args.repeat)]
+    summary = {key: statistics.median(run[key] for run in runs) for key in runs[0]}
+    summary["repeat"] = len(runs)
+    print(f"[BENCH] startup {summary['startup_s'] * 1000:.0f} ms (process {summary['process_s'] * 1000:.0f} ms)")
+
+    results = {"meta": {"python": sys.version.split()[0]}, "cases": {"startup": summary}}
+    Path(args.output).write_text(json.dumps(results, indent=4), encoding="utf-8")
+
+    if args.baseline:
+        if args.update_baseline:
+            Path(args.baseline).write_text(json.dumps(results, indent=4), encoding="utf-8")
+            print(f"[BENCH] Baseline updated: {args.baseline}")
+            return 0
+        return check_regressions(results, args.baseline, THRESHOLDS)
+    print("[BENCH] No --baseline given; the results were not checked for regressions.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
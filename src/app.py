@@ -7,17 +7,22 @@ import tkinter as tk
 from tkinter import messagebox, filedialog
 import json
 import os
-from dotenv import load_dotenv
+import queue
+import threading
+import time
 
 from src.core.config import TAB_BG_INACTIVE, TAB_BG_ACTIVE, TAB_TEXT_INACTIVE
-from src.ui.views.pass_config_view import create_pass_config_frame
-from src.ui.views.json_config_view import create_json_config_frame
-from src.services.llvm_service import LLVMService
-from src.services.llvm_pass_service import LLVMPassService
-from src.services.pdf_fin_service import save_report_placeholder, view_pdf
-from src.utils.file_operations import save_obfuscated_file_placeholder
+from src.core.plan import ConfigError, canonical_param, compile_config
+from src.ui.views.pass_config_view import create_pass_config_frame, pass_properties, DEFAULT_SEED
+from src.ui.views.json_config_view import create_json_config_frame, JsonConfigTextSync
+from src.ui.config_model import ConfigModel
 from pathlib import Path
 
+# The service layer (and reportlab through the PDF service) is imported on first
+# use, so the window does not wait for it at startup.
+
+CONFIG_SYNC_DELAY_MS = 150 # Coalesce widget changes typed within this window into one JSON sync
+
 class ObfuscationApp:
     def __init__(self, root):
         # 1. Main Window Setup
@@ -42,8 +47,27 @@ class ObfuscationApp:
         self.attached_filepath = None
         self.obfuscated_filepath = None # To store the path of the obfuscated file
         self.final_report_content = None # To store the generated report text
+        self.resource_usage = None # Per-pass wall/CPU time and peak RSS of the last run
+        self.runtime_overhead = None # Runtime slowdown of the obfuscated program, if profiled
+        self.size_analysis = None # Per-function growth of the last run, if analysed
         self.config_data = None
         self.report_filepath = os.path.join("artifacts", "obfuscation_report.pdf")
+        self.worker_thread = None
+        self.worker_queue = queue.Queue()
+        self.report_thread = None
+        self.report_queue = queue.Queue()
+        self.active_services = []  # services the worker is running, so Cancel can reach them
+        self.watcher = None  # WatchService while watch mode is on
+        self.watch_queue = queue.Queue()
+        self._watched_config_text = None
+        self.cancel_requested = threading.Event()
+        self.stage_started_at = None
+        self.stage_label = ""
+        self.stage_output = None  # latest stderr line of the running stage
+        self.finished_stages = []
+        self.estimate = None
+        self.stage_times = {}
+        self.current_stage = None
         self.platform_var = tk.StringVar(value="Windows x64 (64-bit)")
         self.compiler_var = tk.StringVar(value="visual studio")
 
@@ -52,6 +76,10 @@ class ObfuscationApp:
         self.seed_labels = {}
         self.property_widgets = {}
         self.pass_display = {}
+        self.config_model = ConfigModel()
+        self._dirty_passes = set()
+        self._dirty_fields = False
+        self._sync_after_id = None
 
         # ==============================================================================
         # --- 2. Main Vertical Layout
@@ -93,7 +121,8 @@ class ObfuscationApp:
 
         # Create configuration sub-frames
         self.json_config_frame, self.json_config_text = create_json_config_frame(self.config_area_frame, self.load_json_file)
-        self.pass_config_frame, self.pass_vars, self.loop_entries, self.seed_entries, self.property_widgets, self.pass_display, self.properties_frames, self.seed_labels, self.common_seed_var, self.common_seed_entry = create_pass_config_frame(self.config_area_frame, self.toggle_pass_visibility, self.toggle_common_seed, self.update_json_from_passes)
+        self.json_text_sync = JsonConfigTextSync(self.json_config_text, self.config_model)
+        self.pass_config_frame, self.pass_vars, self.loop_entries, self.seed_entries, self.property_widgets, self.pass_display, self.properties_frames, self.seed_labels, self.common_seed_var, self.common_seed_entry, self.build_properties_frame = create_pass_config_frame(self.config_area_frame, self.toggle_pass_visibility, self.toggle_common_seed, self.update_json_from_passes)
 
         # Initially show the passes configuration panel
         self.pass_config_frame.grid(row=0, column=0, sticky="nsew")
@@ -108,17 +137,30 @@ class ObfuscationApp:
         ctk.CTkLabel(platform_frame, text="Target Platform:").grid(row=0, column=0, sticky="w", padx=(0, 10))
         self.platform_dropdown = ctk.CTkOptionMenu(platform_frame, values=["Windows x64 (64-bit)", "Windows x86 (32-bit)","Windows on Arm (ARM64)","Linux x86_64","Linux Arm64"], variable=self.platform_var)
         self.platform_dropdown.grid(row=0, column=1, sticky="w")
-        self.platform_var.trace('w', lambda *args: self.update_json_from_passes())
+        self.platform_var.trace('w', lambda *args: self.update_json_fields())
 
         ctk.CTkLabel(platform_frame, text="Target Compiler:").grid(row=0, column=2, sticky="w", padx=(20, 10))
         self.compiler_dropdown = ctk.CTkOptionMenu(platform_frame, values=["visual studio", "mingw/gnu"], variable=self.compiler_var)
         self.compiler_dropdown.grid(row=0, column=3, sticky="w")
-        self.compiler_var.trace('w', lambda *args: self.update_json_from_passes())
+        self.compiler_var.trace('w', lambda *args: self.update_json_fields())
+
+
+        # --- Control Buttons ---
+        control_frame = ctk.CTkFrame(root, fg_color="transparent")
+        control_frame.grid(row=3, column=0, sticky="ew", pady=15, padx=15)
+        control_frame.grid_columnconfigure(0, weight=1)
+
+        self.start_button = ctk.CTkButton(control_frame, text="Start Obfuscation", command=self.start_obfuscation, font=ctk.CTkFont(family='Helvetica', size=15, weight='bold'))
+        self.start_button.grid(row=0, column=0, sticky="ew")
+
+        self.watch_button = ctk.CTkButton(control_frame, text="Watch", command=self.toggle_watch, width=120)
+        self.watch_button.grid(row=0, column=1, sticky="e", padx=(10, 0))
 
+        self.cancel_button = ctk.CTkButton(control_frame, text="Cancel", command=self.cancel_obfuscation, state="disabled", fg_color="darkred", hover_color="#5a0000", width=100)
+        self.cancel_button.grid(row=0, column=2, sticky="e", padx=(10, 0))
 
-        # --- Control Button ---
-        self.start_button = ctk.CTkButton(root, text="Start Obfuscation", command=self.start_obfuscation, font=ctk.CTkFont(family='Helvetica', size=15, weight='bold'))
-        self.start_button.grid(row=3, column=0, sticky="ew", pady=15, padx=15)
+        self.progress_label = ctk.CTkLabel(control_frame, text="", font=ctk.CTkFont(family='Helvetica', size=12), text_color="gray", anchor="w")
+        self.progress_label.grid(row=1, column=0, columnspan=3, sticky="ew", pady=(5, 0))
         
         # --- Save Buttons ---
         button_frame = ctk.CTkFrame(root, fg_color="transparent")
@@ -134,69 +176,97 @@ class ObfuscationApp:
         self.view_pdf_button.grid(row=0, column=2, sticky="w")
 
         # --- Final Initialization ---
-        self.update_json_from_passes() # Sync JSON with default passes view
-
-    def update_json_from_passes(self):
-        """Updates the JSON text based on the checkbox configuration, using the new format."""
-        final_config = {
-            "input_file": self.attached_filepath if self.attached_filepath else "path/to/source.c",
-            "platform": self.platform_var.get(),
-            "compiler": self.compiler_var.get(),
-            "passes": []
-        }
+        self.update_json_from_passes()
+        self.flush_config_sync() # Sync JSON with default passes view
+
+    def update_json_from_passes(self, key=None):
+        """Schedules a debounced sync of the pass widgets into the config model and JSON text.
+        :param key: Pass whose widgets changed, or None if any pass or top-level field may have changed.
+        """
+        if key is None:
+            self._dirty_passes.update(self.pass_vars)
+            self._dirty_fields = True
+        else:
+            self._dirty_passes.add(key)
+        self._schedule_config_sync()
+
+    def update_json_fields(self):
+        """Schedules a debounced sync of the top-level fields (input file, platform, compiler)."""
+        self._dirty_fields = True
+        self._schedule_config_sync()
+
+    def _schedule_config_sync(self):
+        if self._sync_after_id is not None:
+            self.root.after_cancel(self._sync_after_id)
+        self._sync_after_id = self.root.after(CONFIG_SYNC_DELAY_MS, self.flush_config_sync)
+
+    def flush_config_sync(self):
+        """Applies pending widget changes to the config model; only changed entries are rewritten in the JSON text."""
+        if self._sync_after_id is not None:
+            self.root.after_cancel(self._sync_after_id)
+            self._sync_after_id = None
+
+        if self._dirty_fields:
+            self.config_model.set_field("input_file", self.attached_filepath if self.attached_filepath else "path/to/source.c")
+            self.config_model.set_field("platform", self.platform_var.get())
+            self.config_model.set_field("compiler", self.compiler_var.get())
         use_common_seed = self.common_seed_var.get()
         common_seed_str = self.common_seed_entry.get() if use_common_seed else None
-
         for key in self.pass_vars:
-            try:
-                is_enabled = self.pass_vars[key].get()
-                params = {}
-                
-                # Get cycles
-                params["cycles"] = int(self.loop_entries[key].get() or 1)
-                
-                # Get seed
-                seed_str = common_seed_str if use_common_seed and is_enabled else self.seed_entries[key].get()
-                if key == 'bcf':
-                    params["boguscfg-seed"] = int(seed_str) if seed_str else 0
-                elif key == 'mba':
-                    params["linearmba-seed"] = int(seed_str) if seed_str else 0
-                else: 
-                    params["seed"] = int(seed_str) if seed_str else 0
-                
-                # Get other properties
-                for prop_id, info in self.property_widgets.get(key, {}).items():
-                    widget = info["widget"]
-                    if info["type"] == "str": value = widget.get()
-                    elif info["type"] == "bool": value = widget.get()
-                    elif info["type"] == "int": value = int(widget.get() or "0")
-                    else: value = None
-                    if key == "bcf" and prop_id == "prob":
-                        params["boguscfg-prob"] = value
-                    else:
-                        params[prop_id] = value
-
-                final_config["passes"].append({
-                    "name": key,
-                    "enabled": is_enabled,
-                    "params": params
-                })
-            except (ValueError, KeyError):
-                # If a value is invalid during sync, skip this pass in the JSON
-                continue
-                
-        json_str = json.dumps(final_config, indent=4)
-        current_text = self.json_config_text.get(1.0, tk.END).strip()
-        # Only update if text is different to avoid cursor reset on every keypress
-        if current_text != json_str.strip():
-            self.json_config_text.delete(1.0, tk.END)
-            self.json_config_text.insert(tk.END, json_str)
+            if key in self._dirty_passes:
+                entry = self._read_pass_entry(key, common_seed_str)
+                if entry is not None:
+                    self.config_model.set_pass(key, entry)
+        self._dirty_passes.clear()
+        self._dirty_fields = False
+        self.json_text_sync.sync()
+
+    def _read_pass_entry(self, key, common_seed_str):
+        """Builds the JSON entry of one pass from its widgets, or None if a value is invalid."""
+        try:
+            is_enabled = self.pass_vars[key].get()
+            params = {}
+
+            if key not in self.properties_frames:
+                return self._default_pass_entry(key, is_enabled, common_seed_str)
+
+            # Get cycles
+            params["cycles"] = int(self.loop_entries[key].get() or 1)
+
+            # Get seed
+            seed_str = common_seed_str if common_seed_str is not None and is_enabled else self.seed_entries[key].get()
+            params[canonical_param(key, "seed")] = int(seed_str) if seed_str else 0
+
+            # Get other properties
+            for prop_id, info in self.property_widgets.get(key, {}).items():
+                widget = info["widget"]
+                if info["type"] == "str": value = widget.get()
+                elif info["type"] == "bool": value = widget.get()
+                elif info["type"] == "int": value = int(widget.get() or "0")
+                else: value = None
+                params[canonical_param(key, prop_id)] = value
+
+            return {"name": key, "enabled": is_enabled, "params": params}
+        except (ValueError, KeyError):
+            # While a value is invalid, the JSON keeps the last valid entry of this pass
+            return None
+
+    def _default_pass_entry(self, key, is_enabled, common_seed_str):
+        """JSON entry of a pass whose property panel was never expanded, from the panel defaults."""
+        seed_str = common_seed_str if common_seed_str is not None and is_enabled else DEFAULT_SEED
+        params = {"cycles": 1, canonical_param(key, "seed"): int(seed_str) if seed_str else 0}
+        for prop in pass_properties(key):
+            value = str(prop["default"]) if prop["type"] == "dropdown" else prop["default"]
+            params[canonical_param(key, prop["json_key"])] = value
+        return {"name": key, "enabled": is_enabled, "params": params}
 
     def toggle_pass_visibility(self, key, show=None):
         """Toggles visibility of pass details when checkbox is toggled."""
         if show is None: show = self.pass_vars[key].get()
-        frame = self.properties_frames[key]
-        
+        frame = self.properties_frames.get(key)
+        if frame is None and show:
+            frame = self.build_properties_frame(key) # Panels are built on first expand
+
         if show:
             frame.grid(row=1, column=0, sticky="ew", padx=0, pady=2) # Use padx=0 for alignment
             if not self.common_seed_var.get():
@@ -205,10 +275,10 @@ class ObfuscationApp:
             else:
                 self.seed_labels[key].grid_remove()
                 self.seed_entries[key].grid_remove()
-        else:
+        elif frame is not None:
             frame.grid_forget()
             
-        self.update_json_from_passes()
+        self.update_json_from_passes(key)
 
     def toggle_common_seed(self):
         """Toggles between common seed and individual seeds."""
@@ -226,13 +296,16 @@ class ObfuscationApp:
 
     # --- File Loading Helper Functions ---
     def load_code_file(self):
-        filepath = filedialog.askopenfilename(defaultextension=".cpp", filetypes=[("C/C++ files", "*.c *.cpp *.h *.hpp"), ("All files", "*.*")])
+        filepath = filedialog.askopenfilename(defaultextension=".cpp", filetypes=[("C/C++ files", "*.c *.cpp *.h *.hpp"), ("Compile database", "compile_commands.json"), ("All files", "*.*")])
         if filepath:
             self.attached_filepath = filepath
             filename = os.path.basename(filepath)
+            if self._is_project(filepath):
+                # Every unit of the database is obfuscated and merged; name the project by its directory.
+                filename = f"{Path(filepath).parent.name}/{filename} (project)"
             self.file_name_label.configure(text=filename, text_color=("#333333", "#D4D4D4"), font=ctk.CTkFont(family='Helvetica', size=12, slant='roman'))
             print(f"C/C++ code loaded from: {filename}")
-            self.update_json_from_passes() # Update JSON with new file path
+            self.update_json_fields() # Update JSON with new file path
 
     def load_json_file(self):
         filepath = filedialog.askopenfilename(defaultextension=".json", filetypes=[("JSON files", "*.json"), ("All files", "*.*")])
@@ -247,11 +320,17 @@ class ObfuscationApp:
             except json.JSONDecodeError: messagebox.showerror("File Error", "The selected file is not valid JSON.")
             except Exception as e: messagebox.showerror("File Error", f"Could not read file: {e}")
 
+    @staticmethod
+    def _is_project(filepath):
+        """Whether the attached file is a compile_commands.json rather than a single source."""
+        return filepath is not None and Path(filepath).suffix.lower() == ".json"
+
     # --- UI Toggle Function ---
     def toggle_config_mode(self, mode):
         if mode == self.config_mode: return
         is_dark = ctk.get_appearance_mode() == "Dark"
         if mode == "json":
+            self.flush_config_sync()
             self.pass_config_frame.grid_forget()
             self.json_config_frame.grid(row=0, column=0, sticky="nsew")
             self.tab_json.configure(fg_color=TAB_BG_ACTIVE[is_dark], hover_color=TAB_BG_ACTIVE[is_dark])
@@ -262,11 +341,15 @@ class ObfuscationApp:
             self.tab_passes.configure(fg_color=TAB_BG_ACTIVE[is_dark], hover_color=TAB_BG_ACTIVE[is_dark])
             self.tab_json.configure(fg_color=TAB_BG_INACTIVE[is_dark], hover_color=TAB_BG_INACTIVE[is_dark])
             self.update_json_from_passes()
+            self.flush_config_sync()
         self.config_mode = mode
 
     # --- Main Action and Placeholder Functions ---
     def start_obfuscation(self):
-        """Starts the obfuscation process using LLVM services."""
+        """Validates the configuration and starts the obfuscation in a background worker."""
+        if self.worker_thread is not None and self.worker_thread.is_alive():
+            return
+
         if not self.attached_filepath:
             messagebox.showerror("Input Error", "Please attach a C/C++ code file before starting.")
             return
@@ -274,6 +357,8 @@ class ObfuscationApp:
         self.start_button.configure(state="disabled", text="Obfuscating...")
         self.root.update_idletasks()
 
+        if self.config_mode == "passes":
+            self.flush_config_sync() # Don't start with edits still waiting for the debounce
         config_data = {}
         try:
             json_input = self.json_config_text.get("1.0", tk.END).strip()
@@ -288,48 +373,441 @@ class ObfuscationApp:
             self.reset_gui()
             return
 
-        enabled_passes = [p for p in config_data["passes"] if p.get("enabled")]
-        if not enabled_passes:
+        try:
+            plan = compile_config(config_data, fused=True)
+        except ConfigError as e:
+            messagebox.showerror("Configuration Error", "\n".join(e.errors))
+            self.reset_gui()
+            return
+        if not plan.stages:
             messagebox.showinfo("Info", "No passes are enabled. Process aborted.")
             self.reset_gui()
             return
+        from src.services.cost_model_service import parse_budget
+        from src.services.scheduler_service import ResourceLimits
+
+        try:
+            ResourceLimits.from_config(config_data)
+            parse_budget(config_data)
+        except ValueError as e:
+            messagebox.showerror("Configuration Error", str(e))
+            self.reset_gui()
+            return
+
+        self.cancel_requested.clear()
+        self.finished_stages = []
+        self.stage_output = None
+        self.stage_started_at = None
+        self.estimate = None
+        self.stage_times = {}
+        self.current_stage = None
+        self.cancel_button.configure(state="normal")
+        self.progress_label.configure(text="Compiling to bytecode...")
+
+        worker = self._project_worker if self._is_project(self.attached_filepath) else self._obfuscation_worker
+        self.worker_thread = threading.Thread(
+            target=worker, args=(config_data, self.attached_filepath), daemon=True
+        )
+        self.worker_thread.start()
+        self.root.after(100, self._poll_worker_queue)
+
+    def _obfuscation_worker(self, config_data, attached_filepath):
+        """Runs the LLVM pipeline off the UI thread. Talks to the UI only through worker_queue."""
+        from dotenv import load_dotenv
+        from src.services.artifact_cache import ArtifactCache
+        from src.services.cost_model_service import shared_cost_model
+        from src.services.distributed_service import DistributedPassService, parse_worker_urls
+        from src.services.llvm_pass_service import LLVMPassService, ObfuscationCancelled
+        from src.services.llvm_service import LLVMService
+        from src.services.runtime_profiler_service import RuntimeProfiler, TargetMismatch
+        from src.services.shard_service import ShardedPassService
+        from src.services.scheduler_service import INTERACTIVE, ResourceLimits, shared_scheduler
+        from src.services.size_analysis_service import SizeAnalyzer
 
         try:
             # 1. Initialize services
             load_dotenv()
             clang_path = os.getenv("CLANG_PATH")
-            print(clang_path)
-            llvm_service = LLVMService(clang_path)
-            llvm_pass_service = LLVMPassService(clang_path)
+            cache = ArtifactCache(os.getenv("CACHE_DIR"))
+            llvm_service = LLVMService(clang_path, cache=cache)
+            pass_options = dict(
+                backend=os.getenv("PASS_BACKEND", "clang"),
+                opt_path=os.getenv("OPT_PATH", "opt"),
+                pass_plugin=os.getenv("PASS_PLUGIN"),
+                time_passes=os.getenv("TIME_PASSES") == "1",
+                in_memory=os.getenv("PASS_IN_MEMORY") == "1",
+                keep_intermediates=os.getenv("KEEP_INTERMEDIATES"),
+                scheduler=shared_scheduler(),
+                priority=INTERACTIVE,
+                limits=ResourceLimits.from_config(config_data),
+                cost_model=shared_cost_model(),
+            )
+            sharding = config_data.get("sharding") or {}
+            workers = parse_worker_urls(os.getenv("WORKER_URLS"))
+            if workers:
+                llvm_pass_service = DistributedPassService(
+                    workers, shards=sharding.get("shards", 0) if sharding.get("enabled") else None
+                )
+            elif sharding.get("enabled"):
+                llvm_pass_service = ShardedPassService(
+                    clang_path, shards=sharding.get("shards"), fused=True, cache=cache, **pass_options
+                )
+            else:
+                llvm_pass_service = LLVMPassService(clang_path, fused=True, cache=cache, **pass_options)
+            self.active_services = [llvm_service, llvm_pass_service]
 
             # 2. Compile to bytecode
-            input_path = Path(self.attached_filepath)
+            input_path = Path(attached_filepath)
             bytecode_path = input_path.with_suffix(".bc")
             llvm_service.compile_to_bytecode(str(input_path), str(bytecode_path), config_data.get("compiler"))
+            if self.cancel_requested.is_set():
+                raise ObfuscationCancelled("Obfuscation cancelled.")
+
+            # Predict the cost from past runs; shards and remote workers run stages in parallel, so skip those.
+            if not workers and not sharding.get("enabled"):
+                estimate = shared_cost_model().estimate(config_data, os.path.getsize(bytecode_path))
+                self.worker_queue.put(("progress", {"event": "estimate", "estimate": estimate}))
+                if estimate is not None and estimate["warnings"]:
+                    answer = queue.Queue()
+                    self.worker_queue.put(("confirm", estimate["warnings"], answer))
+                    while True:
+                        if self.cancel_requested.is_set():
+                            raise ObfuscationCancelled("Obfuscation cancelled.")
+                        try:
+                            run_anyway = answer.get(timeout=0.1)
+                            break
+                        except queue.Empty:
+                            continue
+                    if not run_anyway:
+                        self.cancel_requested.set()
+                        raise ObfuscationCancelled("Obfuscation cancelled: over budget.")
 
             # 3. Apply passes
+            def on_progress(event):
+                # Also catches a Cancel pressed before apply_json_conf started.
+                if self.cancel_requested.is_set():
+                    raise ObfuscationCancelled("Obfuscation cancelled.")
+                self.worker_queue.put(("progress", event))
+
             obfuscated_path = input_path.with_name(f"{input_path.stem}_obf.bc")
-            llvm_pass_service.apply_json_conf(config_data, str(bytecode_path), str(obfuscated_path))
+            result = llvm_pass_service.apply_json_conf(
+                config_data, str(bytecode_path), str(obfuscated_path), on_progress=on_progress
+            )
+            if not result.success:
+                raise RuntimeError(result.error)
+
+            # 4. Optionally measure the runtime overhead against the original
+            runtime_overhead = None
+            profile_conf = config_data.get("runtime_profile") or {}
+            if profile_conf.get("enabled"):
+                self.worker_queue.put(("progress", {"event": "profiling"}))
+                profiler = RuntimeProfiler(
+                    clang_path, work_dir=str(input_path.parent), llvm_dis_path=os.getenv("LLVM_DIS_PATH", "llvm-dis")
+                )
+                self.active_services.append(profiler)
+                try:
+                    runtime_overhead = profiler.profile(
+                        str(bytecode_path),
+                        str(obfuscated_path),
+                        driver=profile_conf.get("driver"),
+                        runs=int(profile_conf.get("runs", 10)),
+                        warmup=int(profile_conf.get("warmup", 1)),
+                        link_flags=profile_conf.get("link_flags"),
+                    )
+                except TargetMismatch as e:
+                    print(f"[WARN] Runtime profiling skipped: {e}")
+
+            # 5. Optionally break the size growth down per function
+            stats, size_analysis = result.stats, None
+            size_conf = config_data.get("size_analysis") or {}
+            if size_conf.get("enabled"):
+                self.worker_queue.put(("progress", {"event": "analyzing"}))
+                analyzer = SizeAnalyzer(os.getenv("LLVM_DIS_PATH", "llvm-dis"), cache)
+                try:
+                    size_analysis = analyzer.compare(
+                        str(bytecode_path), str(obfuscated_path), int(size_conf.get("top", 25))
+                    )
+                    stats = {**stats, "size-analysis": size_analysis["summary"]}
+                except RuntimeError as e:
+                    print(f"[WARN] Size analysis skipped: {e}")
+
+            # 6. Hand results to the UI thread
+            self.worker_queue.put((
+                "done", stats, str(obfuscated_path),
+                result.resource_usage, runtime_overhead, size_analysis,
+            ))
+        except Exception as e:
+            if self.cancel_requested.is_set():
+                self.worker_queue.put(("cancelled",))
+            else:
+                self.worker_queue.put(("error", str(e)))
+        finally:
+            self.active_services = []
 
-            # 4. Store results
-            self.final_report_content = llvm_pass_service.stats
-            self.obfuscated_filepath = str(obfuscated_path)
+    def _project_worker(self, config_data, database_path):
+        """Obfuscates every unit of a compile_commands.json off the UI thread, merging them into one .bc."""
+        from dotenv import load_dotenv
+        from src.services.llvm_pass_service import ObfuscationCancelled
+        from src.services.project_service import ProjectService
 
-            print("Report available and obfuscated file generated. Ready to save.")
-            self.save_button.configure(state="normal")
-            self.save_report_button.configure(state="normal")
-            messagebox.showinfo("Success", f"File Obfuscation Completed Successfully")
+        try:
+            load_dotenv()
+            service = ProjectService(
+                os.getenv("CLANG_PATH") or "clang",
+                llvm_link_path=os.getenv("LLVM_LINK_PATH", "llvm-link"),
+                cache_dir=os.getenv("CACHE_DIR"),
+                pass_plugin=os.getenv("PASS_PLUGIN"),
+            )
+            self.active_services = [service]
+            if self.cancel_requested.is_set():
+                raise ObfuscationCancelled("Obfuscation cancelled.")
+            report = service.obfuscate_project(
+                database_path,
+                config_data,
+                out_dir=str(Path(database_path).parent / "obfuscated"),
+                on_progress=lambda event: self.worker_queue.put(("progress", event)),
+            )
+            if not report["outputs"]:
+                first_error = next(iter(report["failed"].values()), "no output was produced")
+                raise RuntimeError(f"No unit could be obfuscated: {first_error}")
+
+            # The stats of every unit added up, behind a summary of the project.
+            stats = {
+                "project": {
+                    "compile database": str(database_path),
+                    "units": report["units"],
+                    "obfuscated": report["units"] - len(report["failed"]),
+                    "failed": len(report["failed"]),
+                },
+                **report["stats"],
+            }
+            if report["failed"]:
+                stats["failed units"] = {Path(source).name: error for source, error in report["failed"].items()}
+            self.worker_queue.put(("done", stats, report["outputs"][0], report["resource_usage"], None, None))
         except Exception as e:
-            messagebox.showerror("Obfuscation Error", f"An error occurred: {e}")
+            if self.cancel_requested.is_set():
+                self.worker_queue.put(("cancelled",))
+            else:
+                self.worker_queue.put(("error", str(e)))
         finally:
-            self.start_button.configure(text="Start Obfuscation", state="normal")
+            self.active_services = []
+
+    def _poll_worker_queue(self):
+        """Applies worker events to the UI. Runs on the Tk main loop via root.after."""
+        while True:
+            try:
+                message = self.worker_queue.get_nowait()
+            except queue.Empty:
+                break
+
+            kind = message[0]
+            if kind == "progress":
+                event = message[1]
+                if event["event"] == "estimate":
+                    self.estimate = event["estimate"]
+                    if self.estimate is None:
+                        self.progress_label.configure(text="No cost history yet, running without an estimate...")
+                    else:
+                        self.progress_label.configure(text=(
+                            f"Estimated {self.estimate['seconds']:.0f}s "
+                            f"({self.estimate['seconds_low']:.0f}-{self.estimate['seconds_high']:.0f}s), "
+                            f"output ~{self.estimate['output_bytes'] / (1024 * 1024):.1f} MiB"
+                        ))
+                elif event["event"] == "profiling":
+                    self.stage_label = "Measuring runtime overhead"
+                    self.stage_started_at = time.monotonic()
+                elif event["event"] == "analyzing":
+                    self.stage_label = "Analysing size per function"
+                    self.stage_started_at = time.monotonic()
+                elif event["event"] == "stage_started":
+                    self.stage_label = f"Pass {event['stage']} (cycle {event['cycle']}, step {event['index'] + 1}/{event['total']})"
+                    if "shard" in event:
+                        self.stage_label += f" [shard {event['shard'] + 1}/{event['shards']}]"
+                    self.stage_started_at = time.monotonic()
+                    self.current_stage = event["index"]
+                elif event["event"] == "project_started":
+                    self.stage_label = f"Obfuscating {event['total']} units"
+                    self.stage_started_at = time.monotonic()
+                elif event["event"] == "unit_finished":
+                    self.stage_label = f"Obfuscating units ({event['done']}/{event['total']} done)"
+                    if event["error"] is not None:
+                        self.finished_stages.append(f"{Path(event['source']).name} failed")
+                elif event["event"] == "stage_output":
+                    self.stage_output = event["line"]
+                elif event["event"] == "stage_finished":
+                    self.stage_output = None
+                    self.stage_times[event["index"]] = event["elapsed"]
+                    self.current_stage = None
+                    shard = f"[{event['shard'] + 1}]" if "shard" in event else ""
+                    self.finished_stages.append(f"{event['stage']}{shard} {event['elapsed']:.1f}s")
+                    self.stage_started_at = None
+            elif kind == "done":
+                self.final_report_content = message[1]
+                self.obfuscated_filepath = message[2]
+                self.resource_usage = message[3]
+                self.runtime_overhead = message[4]
+                self.size_analysis = message[5]
+                print("Report available and obfuscated file generated. Ready to save.")
+                self.save_button.configure(state="normal")
+                self.save_report_button.configure(state="normal")
+                self._finish_obfuscation("Completed: " + ", ".join(self.finished_stages))
+                messagebox.showinfo("Success", f"File Obfuscation Completed Successfully")
+                return
+            elif kind == "confirm":
+                message[2].put(messagebox.askyesno(
+                    "Over Budget", "\n".join(message[1]) + "\n\nRun anyway?", icon="warning"
+                ))
+            elif kind == "cancelled":
+                self._finish_obfuscation("Obfuscation cancelled.")
+                return
+            elif kind == "error":
+                self._finish_obfuscation("Obfuscation failed.")
+                messagebox.showerror("Obfuscation Error", f"An error occurred: {message[1]}")
+                return
+
+        if self.stage_started_at is not None:
+            done = " | Done: " + ", ".join(self.finished_stages) if self.finished_stages else ""
+            elapsed = time.monotonic() - self.stage_started_at
+            eta = ""
+            if self.estimate is not None and self.current_stage is not None:
+                from src.services.cost_model_service import remaining_seconds
+
+                left = remaining_seconds(self.estimate, self.stage_times, self.current_stage, elapsed)
+                eta = f" | ETA ~{left:.0f}s"
+            output = f" | {self.stage_output}" if self.stage_output else ""
+            self.progress_label.configure(text=f"{self.stage_label} - {elapsed:.1f}s{eta}{output}{done}")
+        self.root.after(100, self._poll_worker_queue)
+
+    def toggle_watch(self):
+        """Starts or stops re-obfuscating the attached file whenever it or the configuration changes."""
+        if self.watcher is not None:
+            self.watcher.stop()
+            self.watcher = None
+            self.watch_button.configure(text="Watch")
+            self.start_button.configure(state="normal")
+            self.progress_label.configure(text="Stopped watching.")
+            return
+        if self.worker_thread is not None and self.worker_thread.is_alive():
+            return
+        if not self.attached_filepath:
+            messagebox.showerror("Input Error", "Please attach a C/C++ code file before watching.")
+            return
+        if self._is_project(self.attached_filepath):
+            messagebox.showerror("Input Error", "Watch mode works on a single source file, not on a compile database.")
+            return
+
+        if self.config_mode == "passes":
+            self.flush_config_sync()
+        config_text = self.json_config_text.get("1.0", tk.END).strip()
+        try:
+            config_data = json.loads(config_text)
+            compile_config(config_data)
+        except json.JSONDecodeError:
+            messagebox.showerror("Input Error", "Invalid JSON configuration provided.")
+            return
+        except ConfigError as e:
+            messagebox.showerror("Configuration Error", "\n".join(e.errors))
+            return
+
+        from dotenv import load_dotenv
+        from src.services.artifact_cache import ArtifactCache
+        from src.services.scheduler_service import INTERACTIVE, ResourceLimits, shared_scheduler
+        from src.services.watch_service import WatchService
+
+        load_dotenv()
+        try:
+            self.watcher = WatchService(
+                self.attached_filepath, config=config_data,
+                clang_path=os.getenv("CLANG_PATH") or "clang", cache=ArtifactCache(os.getenv("CACHE_DIR")),
+                scheduler=shared_scheduler(), priority=INTERACTIVE, limits=ResourceLimits.from_config(config_data),
+            )
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Watch Error", str(e))
+            self.watcher = None
+            return
+        self._watched_config_text = config_text
+        self.config_data = config_data
+        threading.Thread(
+            target=self.watcher.run,
+            kwargs={
+                "on_result": lambda source, result: self.watch_queue.put(("result", source, result)),
+                "on_error": lambda source, message: self.watch_queue.put(("error", source, message)),
+            },
+            daemon=True,
+        ).start()
+        self.watch_button.configure(text="Stop Watching")
+        self.start_button.configure(state="disabled")
+        self.progress_label.configure(text=f"Watching {Path(self.attached_filepath).name}...")
+        self.root.after(200, self._poll_watch_queue)
+
+    def _poll_watch_queue(self):
+        """Hands config edits to the watcher and shows its results. Runs on the Tk main loop via root.after."""
+        if self.watcher is None:
+            return
+
+        # Pass widget edits reach the JSON text through the debounced sync, so this covers both modes.
+        config_text = self.json_config_text.get("1.0", tk.END).strip()
+        if config_text != self._watched_config_text:
+            self._watched_config_text = config_text
+            try:
+                config_data = json.loads(config_text)
+            except json.JSONDecodeError:
+                config_data = None  # still being typed
+            if config_data is not None:
+                self.config_data = config_data
+                self.watcher.set_config(config_data)
+
+        while True:
+            try:
+                message = self.watch_queue.get_nowait()
+            except queue.Empty:
+                break
+            name = Path(message[1]).name if message[1] else "config"
+            stamp = time.strftime("%H:%M:%S")
+            if message[0] == "error":
+                self.progress_label.configure(text=f"[{stamp}] {name}: {message[2]}")
+                continue
+            result = message[2]
+            reused = sum(1 for usage in result.resource_usage if usage.get("cached"))
+            self.progress_label.configure(
+                text=f"[{stamp}] {name}: {result.status} in {result.elapsed:.1f}s "
+                     f"({reused}/{len(result.resource_usage)} stages reused). Watching..."
+            )
+            if result.success:
+                self.final_report_content = result.stats
+                self.obfuscated_filepath = result.output_file
+                self.resource_usage = result.resource_usage
+                self.runtime_overhead = None
+                self.size_analysis = None
+                self.save_button.configure(state="normal")
+                self.save_report_button.configure(state="normal")
+        self.root.after(200, self._poll_watch_queue)
+
+    def _finish_obfuscation(self, status_text):
+        self.cancel_button.configure(state="disabled", text="Cancel")
+        self.start_button.configure(text="Start Obfuscation", state="normal")
+        self.progress_label.configure(text=status_text)
 
+    def cancel_obfuscation(self):
+        """Stops the running obfuscation and kills its clang processes."""
+        self.cancel_requested.set()
+        self.cancel_button.configure(state="disabled", text="Cancelling...")
+        for service in list(self.active_services):
+            service.cancel()
 
     def save_report(self):
         """Saves the generated report content to a PDF file."""
         if not self.final_report_content:
             messagebox.showerror("Report Error", "No report content to save.")
             return
+        if self.report_thread is not None and self.report_thread.is_alive():
+            return
+
+        from src.services.pdf_fin_service import ask_report_path
+
+        save_path = ask_report_path(self.report_filepath)
+        if not save_path:
+            return
 
         self.save_report_button.configure(state="disabled", text="Saving...")
         self.root.update_idletasks()
@@ -337,8 +815,8 @@ class ObfuscationApp:
         # Create a new ordered dictionary for the report
         ordered_report_data = {}
 
-        # Add input file parameters first
-        if self.attached_filepath:
+        # Add input file parameters first; a project run reports its units in the stats instead
+        if self.attached_filepath and not self._is_project(self.attached_filepath):
             try:
                 file_size = str(os.path.getsize(self.attached_filepath))+" bytes"
                 file_name = os.path.basename(self.attached_filepath)
@@ -363,21 +841,53 @@ class ObfuscationApp:
             except Exception as e:
                 print(f"Could not add input file parameters: {e}")
 
-        # Deep copy the original report content to avoid modifying it
-        original_report_data = json.loads(json.dumps(self.final_report_content))
-
-        # Add the rest of the report data, excluding unwanted keys
-        for key, value in original_report_data.items():
+        # Add the rest of the report data, excluding unwanted keys. The PDF
+        # builder only reads the stats, so they are shared instead of copied.
+        for key, value in self.final_report_content.items():
             if key not in ["bitcode-reader", "file-search"]:
                 ordered_report_data[key] = value
 
-        if save_report_placeholder(ordered_report_data, config_data=self.config_data, default_path=self.report_filepath):
-            self.view_pdf_button.configure(state="normal")
-        
+        self.report_thread = threading.Thread(
+            target=self._report_worker,
+            args=(
+                save_path, ordered_report_data, self.config_data,
+                self.resource_usage, self.runtime_overhead, self.size_analysis,
+            ),
+            daemon=True,
+        )
+        self.report_thread.start()
+        self.root.after(100, self._poll_report_queue)
+
+    def _report_worker(self, save_path, report_data, config_data, resource_usage, runtime_overhead, size_analysis):
+        """Builds the PDF off the UI thread. Talks to the UI only through report_queue."""
+        try:
+            from src.services.pdf_fin_service import build_report_pdf
+
+            build_report_pdf(save_path, report_data, config_data, resource_usage, runtime_overhead, size_analysis)
+            self.report_queue.put(("saved", save_path))
+        except Exception as e:
+            self.report_queue.put(("error", str(e)))
+
+    def _poll_report_queue(self):
+        """Waits for the report worker on the Tk main loop."""
+        try:
+            message = self.report_queue.get_nowait()
+        except queue.Empty:
+            self.root.after(100, self._poll_report_queue)
+            return
+
         self.save_report_button.configure(state="normal", text="Save Report as PDF")
+        if message[0] == "saved":
+            self.report_filepath = message[1]
+            self.view_pdf_button.configure(state="normal")
+            messagebox.showinfo("Saved", f"Report saved to:\n{message[1]}")
+        else:
+            messagebox.showerror("Error saving report", f"An error occurred while saving the PDF:\n{message[1]}")
 
     def view_pdf(self):
         """Opens the saved PDF report using the system's default viewer."""
+        from src.services.pdf_fin_service import view_pdf
+
         view_pdf(self.report_filepath)
 
     def save_obfuscated_file(self):
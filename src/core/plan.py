@@ -0,0 +1,232 @@
+"""
+This file contains the config schema and the config compiler.
+
+compile_config() validates a config in the example.json format against
+PASS_SCHEMAS, normalises parameter names and values, and returns an immutable,
+hashable ExecutionPlan holding the exact -mllvm argument vector of every
+stage. All pass/flag naming rules live here:
+- bcf and mba options are passed without the pass prefix (-boguscfg-prob, -linearmba-extra)
+- every other option is -<pass>-<param>
+- "seed"/"prob"/"extra" are accepted as aliases of the bcf and mba parameters
+"""
+
+import functools
+import hashlib
+import json
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+# Passes whose parameters are already full LLVM option names.
+UNPREFIXED_PASSES = {"bcf", "mba"}
+
+
+@dataclass(frozen=True)
+class ParamSpec:
+    kind: type  # int or bool
+    minimum: Optional[int] = None
+    maximum: Optional[int] = None
+
+
+_SEED = ParamSpec(int)
+
+PASS_SCHEMAS: Dict[str, Dict[str, ParamSpec]] = {
+    "fla": {"seed": _SEED},
+    "gvenc": {"seed": _SEED, "keylen": ParamSpec(int, 1, 4), "process-arrays": ParamSpec(bool)},
+    "indcall": {"seed": _SEED},
+    "indbr": {"seed": _SEED, "cond-only": ParamSpec(bool)},
+    "alias": {"seed": _SEED, "branch-num": ParamSpec(int, 1), "reuse-getters": ParamSpec(bool)},
+    "bcf": {"boguscfg-seed": _SEED, "boguscfg-prob": ParamSpec(int, 1, 100)},
+    "sub": {"seed": _SEED},
+    "merge": {"seed": _SEED, "ratio": ParamSpec(int, 0, 100)},
+    "mba": {
+        "linearmba-seed": _SEED,
+        "linearmba-prob": ParamSpec(int, 0, 100),
+        "linearmba-extra": ParamSpec(int, 1),
+    },
+}
+
+PARAM_ALIASES: Dict[str, Dict[str, str]] = {
+    "bcf": {"seed": "boguscfg-seed", "prob": "boguscfg-prob"},
+    "mba": {"seed": "linearmba-seed", "prob": "linearmba-prob", "extra": "linearmba-extra"},
+}
+
+# Number of times a pass is run; 0 skips it.
+CYCLES = ParamSpec(int, 0)
+
+
+class ConfigError(ValueError):
+    """Raised for an invalid config. `errors` lists every problem found."""
+
+    def __init__(self, errors: List[str]):
+        super().__init__("Invalid config: " + "; ".join(errors))
+        self.errors = errors
+
+
+@dataclass(frozen=True)
+class PlanStage:
+    label: str  # pass name, or the comma-separated pipeline of a fused stage
+    pipeline: Tuple[str, ...]
+    options: Tuple[str, ...]  # "-<option>=<value>"
+    args: Tuple[str, ...]  # -mllvm arguments passed to clang
+
+
+@dataclass(frozen=True)
+class ExecutionPlan:
+    stages: Tuple[PlanStage, ...]
+    fused: bool
+
+    def __len__(self) -> int:
+        return len(self.stages)
+
+    def __iter__(self):
+        return iter(self.stages)
+
+    @property
+    def key(self) -> str:
+        """Stable digest of every stage's arguments, usable as a cache key."""
+        return hashlib.sha256(json.dumps([s.args for s in self.stages]).encode("utf-8")).hexdigest()
+
+
+def canonical_param(pass_name: str, param: str) -> str:
+    """Schema name of a parameter, resolving aliases such as bcf "prob"."""
+    return PARAM_ALIASES.get(pass_name, {}).get(param, param)
+
+
+def option_name(pass_name: str, param: str) -> str:
+    """LLVM option name (without "-") of a canonical parameter."""
+    return param if pass_name in UNPREFIXED_PASSES else f"{pass_name}-{param}"
+
+
+def _coerce(spec: ParamSpec, value: Any) -> Any:
+    """Return value as the type of spec, or raise ValueError."""
+    if spec.kind is bool:
+        if isinstance(value, bool):
+            return value
+        if isinstance(value, str) and value.lower() in ("true", "false"):
+            return value.lower() == "true"
+        raise ValueError(f"expected a boolean, got {value!r}")
+
+    if isinstance(value, bool):
+        raise ValueError(f"expected an integer, got {value!r}")
+    if isinstance(value, str) and value.strip().lstrip("-").isdigit():
+        value = int(value)
+    if not isinstance(value, int):
+        raise ValueError(f"expected an integer, got {value!r}")
+    if spec.minimum is not None and value < spec.minimum:
+        raise ValueError(f"must be >= {spec.minimum}, got {value}")
+    if spec.maximum is not None and value > spec.maximum:
+        raise ValueError(f"must be <= {spec.maximum}, got {value}")
+    return value
+
+
+def _format(value: Any) -> str:
+    return ("true" if value else "false") if isinstance(value, bool) else str(value)
+
+
+def normalize_passes(passes: Any) -> List[Tuple[str, int, Tuple[Tuple[str, str], ...]]]:
+    """
+    Validate the "passes" list and return (name, cycles, ((option, value), ...))
+    for every enabled pass. Raises ConfigError listing all problems.
+    """
+    errors = []
+    if not isinstance(passes, list):
+        raise ConfigError(['"passes" must be a list'])
+
+    normalized = []
+    for index, entry in enumerate(passes):
+        where = f"passes[{index}]"
+        if not isinstance(entry, dict):
+            errors.append(f"{where}: expected an object")
+            continue
+        name = entry.get("name")
+        schema = PASS_SCHEMAS.get(name)
+        if schema is None:
+            errors.append(f"{where}: unknown pass {name!r}")
+            continue
+        enabled = entry.get("enabled", False)
+        if not isinstance(enabled, bool):
+            errors.append(f"{where}.enabled: expected a boolean, got {enabled!r}")
+            continue
+        params = entry.get("params", {})
+        if not isinstance(params, dict):
+            errors.append(f"{where}.params: expected an object")
+            continue
+
+        cycles = 1
+        options = {}
+        for param, value in params.items():
+            try:
+                if param == "cycles":
+                    cycles = _coerce(CYCLES, value)
+                    continue
+                canonical = canonical_param(name, param)
+                if canonical not in schema:
+                    raise ValueError(f"unknown parameter for pass {name!r}")
+                options[option_name(name, canonical)] = _format(_coerce(schema[canonical], value))
+            except ValueError as e:
+                errors.append(f"{where}.params.{param}: {e}")
+
+        if enabled and cycles > 0:
+            normalized.append((name, cycles, tuple(options.items())))
+
+    if errors:
+        raise ConfigError(errors)
+    return normalized
+
+
+def _stage(label: str, pipeline: List[str], options: Dict[str, str]) -> PlanStage:
+    flags = tuple(f"-{option}={value}" for option, value in options.items())
+    args = ["-mllvm", f"-passes={','.join(pipeline)}"]
+    for flag in flags:
+        args.extend(["-mllvm", flag])
+    args.extend(["-mllvm", "-stats"])
+    return PlanStage(label, tuple(pipeline), flags, tuple(args))
+
+
+@functools.lru_cache(maxsize=256)
+def _compile(passes_json: str, fused: bool) -> ExecutionPlan:
+    normalized = normalize_passes(json.loads(passes_json))
+    stages = []
+
+    if not fused:
+        for name, cycles, options in normalized:
+            stage = _stage(name, [name], dict(options))
+            stages.extend([stage] * cycles)
+        return ExecutionPlan(tuple(stages), fused)
+
+    # Fold passes and cycles into as few stages as possible. Options are global
+    # to a clang invocation, so a new stage is started when a pass sets an
+    # option to a different value, or when a pass already in the stage comes
+    # back with other options: it would silently inherit the ones it left out.
+    pipeline: List[str] = []
+    current: Dict[str, str] = {}
+    pass_options: Dict[str, Dict[str, str]] = {}
+    for name, cycles, options in normalized:
+        conflict = any(current.get(option, value) != value for option, value in options)
+        if conflict or pass_options.get(name, dict(options)) != dict(options):
+            stages.append(_stage(",".join(pipeline), pipeline, current))
+            pipeline, current, pass_options = [], {}, {}
+        pipeline.extend([name] * cycles)
+        current.update(options)
+        pass_options[name] = dict(options)
+    if pipeline:
+        stages.append(_stage(",".join(pipeline), pipeline, current))
+    return ExecutionPlan(tuple(stages), fused)
+
+
+def compile_config(config: Dict[str, Any], fused: bool = False) -> ExecutionPlan:
+    """
+    Validate a config in the example.json format and return its execution plan.
+    Plans are memoised by the serialised "passes", so recompiling an unchanged
+    config costs one json.dumps and a dictionary lookup.
+    :param fused: Fold passes and cycles into as few clang invocations as possible.
+    """
+    if isinstance(config, ExecutionPlan):
+        return config
+    if not isinstance(config, dict):
+        raise ConfigError(["config must be an object"])
+    try:
+        passes_json = json.dumps(config.get("passes", []))
+    except (TypeError, ValueError) as e:
+        raise ConfigError([f"passes: {e}"])
+    return _compile(passes_json, fused)
@@ -0,0 +1,130 @@
+"""
+This file contains the immutable result of one obfuscation run.
+
+Every apply_json_conf call returns its own RunResult, so runs sharing a
+service instance never see each other's stats. Stats and resource usage
+are frozen into read-only dicts and tuples; they remain plain dict
+subclasses, so they serialise to JSON and pickle like the originals.
+"""
+
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from src.utils.stats_parser import merge_stats
+from src.utils.stats_store import StatsStore
+
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+
+class FrozenDict(dict):
+    """Read-only dict."""
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("RunResult data is read-only")
+
+    __setitem__ = __delitem__ = __ior__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+
+    def __reduce__(self):
+        return FrozenDict, (dict(self),)
+
+
+def freeze(value: Any) -> Any:
+    """Recursively turn dicts into FrozenDicts and lists into tuples."""
+    if isinstance(value, dict):
+        return FrozenDict((key, freeze(item)) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+def thaw(value: Any) -> Any:
+    """Mutable deep copy of frozen data."""
+    if isinstance(value, dict):
+        return {key: thaw(item) for key, item in value.items()}
+    if isinstance(value, tuple):
+        return [thaw(item) for item in value]
+    return value
+
+
+@dataclass(frozen=True)
+class RunResult:
+    run_id: str
+    input_file: str
+    output_file: str
+    status: str  # SUCCEEDED, FAILED or CANCELLED
+    stats: Mapping[str, Mapping[str, int]]
+    resource_usage: Tuple[Mapping[str, Any], ...]
+    started_at: float
+    finished_at: float = field(default_factory=time.time)
+    error: Optional[str] = None
+    # Per unit/stage/cycle records; must not be modified once the result exists.
+    stats_store: StatsStore = field(default_factory=StatsStore, compare=False, repr=False)
+
+    @classmethod
+    def create(cls, **kwargs) -> "RunResult":
+        """Build a result, freezing the stats and resource usage passed in."""
+        kwargs["stats"] = freeze(kwargs.get("stats") or {})
+        kwargs["resource_usage"] = freeze(kwargs.get("resource_usage") or [])
+        return cls(**kwargs)
+
+    @classmethod
+    def combine(
+        cls,
+        parts: List["RunResult"],
+        input_file: str,
+        output_file: str,
+        started_at: float,
+        shards: Optional[List[int]] = None,
+    ) -> "RunResult":
+        """
+        Merge the results of the partitions of one module. Resource usage
+        entries are tagged with their partition index as "shard".
+        :param shards: Partition index of every part, if not simply their position.
+        """
+        stats: Dict[str, dict] = {}
+        stats_store = StatsStore()
+        resource_usage = []
+        for index, part in zip(shards or range(len(parts)), parts):
+            merge_stats(stats, thaw(part.stats))
+            stats_store.extend(part.stats_store)
+            resource_usage.extend({**usage, "shard": index} for usage in part.resource_usage)
+        failed = [part for part in parts if not part.success]
+        return cls.create(
+            run_id=uuid.uuid4().hex,
+            input_file=input_file,
+            output_file=output_file,
+            status=failed[0].status if failed else SUCCEEDED,
+            stats=stats,
+            resource_usage=resource_usage,
+            started_at=started_at,
+            error=failed[0].error if failed else None,
+            stats_store=stats_store,
+        )
+
+    @property
+    def success(self) -> bool:
+        return self.status == SUCCEEDED
+
+    @property
+    def elapsed(self) -> float:
+        return self.finished_at - self.started_at
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-ready, mutable copy without the stats records."""
+        return {
+            "run_id": self.run_id,
+            "input_file": self.input_file,
+            "output_file": self.output_file,
+            "status": self.status,
+            "error": self.error,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "elapsed": self.elapsed,
+            "stats": thaw(self.stats),
+            "resource_usage": thaw(self.resource_usage),
+        }
@@ -0,0 +1,161 @@
+"""
+This file contains the HTTP backend for running obfuscation jobs.
+
+Run with:
+    uv run uvicorn src.server:app --port 8000
+"""
+
+import asyncio
+import json
+import os
+from contextlib import asynccontextmanager
+from typing import Any, Dict
+
+from dotenv import load_dotenv
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import FileResponse, StreamingResponse
+from pydantic import BaseModel
+
+from src.core.plan import ConfigError, compile_config
+from src.services.artifact_cache import ArtifactCache
+from src.services.distributed_service import parse_worker_urls
+from src.services.job_service import FINISHED_STATES, JobManager, JobQueueFull
+
+load_dotenv()
+
+job_manager = JobManager(
+    clang_path=os.getenv("CLANG_PATH"),
+    max_workers=int(os.getenv("MAX_WORKERS", "0")) or None,
+    cache=ArtifactCache(os.getenv("CACHE_DIR")),
+    workers=parse_worker_urls(os.getenv("WORKER_URLS")),
+    in_memory=os.getenv("PASS_IN_MEMORY") == "1",
+    max_finished=int(os.getenv("MAX_FINISHED_JOBS", "256")),
+    retention_s=float(os.getenv("JOB_RETENTION_S", str(24 * 3600))),
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    job_manager.shutdown()
+
+
+app = FastAPI(title="RMOR Obfuscation Service", lifespan=lifespan)
+
+
+class JobRequest(BaseModel):
+    filename: str
+    source: str
+    config: Dict[str, Any]
+    priority: str = "normal"
+
+
+def _get_job(job_id: str):
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return job
+
+
+@app.post("/jobs", status_code=202)
+def create_job(request: JobRequest):
+    """Queue a job for a C/C++ source and a config in the example.json format."""
+    try:
+        plan = compile_config(request.config)
+    except ConfigError as e:
+        raise HTTPException(status_code=400, detail=e.errors)
+    if not plan.stages:
+        raise HTTPException(status_code=400, detail="No passes are enabled.")
+    try:
+        job = job_manager.submit(
+            request.filename, request.source.encode("utf-8"), request.config, request.priority
+        )
+    except ConfigError as e:
+        raise HTTPException(status_code=400, detail=e.errors)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except JobQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return job.to_dict()
+
+
+@app.post("/estimate")
+def estimate_job(request: JobRequest):
+    """Predict the time and output size of a job from past runs, without queueing it."""
+    try:
+        estimate = job_manager.estimate(request.filename, request.source.encode("utf-8"), request.config)
+    except ConfigError as e:
+        raise HTTPException(status_code=400, detail=e.errors)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if estimate is None:
+        raise HTTPException(status_code=404, detail="No cost history yet; run some jobs first.")
+    return estimate
+
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    return _get_job(job_id).to_dict()
+
+
+@app.get("/jobs/{job_id}/stats")
+def get_job_stats(job_id: str):
+    return _get_job(job_id).stats
+
+
+@app.get("/jobs/{job_id}/size-analysis")
+def get_job_size_analysis(job_id: str):
+    job = _get_job(job_id)
+    if job.size_analysis is None:
+        raise HTTPException(status_code=404, detail="No size analysis for this job.")
+    return job.size_analysis
+
+
+@app.get("/jobs/{job_id}/result")
+def get_job_result(job_id: str):
+    job = _get_job(job_id)
+    if job.output_path is None:
+        raise HTTPException(status_code=409, detail=f"Job is {job.state}; no result available.")
+    return FileResponse(job.output_path, media_type="application/octet-stream", filename=job.output_path.name)
+
+
+@app.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str):
+    """Server-sent events with every progress event of the job, until it finishes."""
+    job = _get_job(job_id)
+
+    async def event_stream():
+        sent, last = 0, None
+        while True:
+            events, sent = job.events_since(sent)
+            for event in events:
+                yield f"data: {json.dumps(event)}\n\n"
+                last = event["event"]
+            # The final event is added right after the job's state changes.
+            if job.finished and last in FINISHED_STATES:
+                break
+            await asyncio.sleep(0.2)
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
+@app.post("/jobs/{job_id}/cancel")
+def cancel_job(job_id: str):
+    if not job_manager.cancel(_get_job(job_id).id):
+        raise HTTPException(status_code=409, detail="Job already finished.")
+    return {"id": job_id, "cancelled": True}
+
+
+@app.delete("/jobs/{job_id}")
+def delete_job(job_id: str):
+    if not job_manager.delete(_get_job(job_id).id):
+        raise HTTPException(status_code=409, detail="Only finished jobs can be deleted.")
+    return {"id": job_id, "deleted": True}
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -1,4 +1,5 @@
+from .artifact_cache import ArtifactCache
 from .llvm_pass_service import LLVMPassService
 from .llvm_service import LLVMService
 
-__all__ = [LLVMPassService, LLVMService]
+__all__ = [ArtifactCache, LLVMPassService, LLVMService]
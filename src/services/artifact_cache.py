@@ -0,0 +1,199 @@
+"""
+artifact_cache.py
+
+On-disk, content-addressed cache for bitcode artifacts.
+
+Every entry is keyed by a hash of the input bytes, the exact command-line
+flags, the target triple and the version of the tool that produced it, so a
+stage is only re-run when one of those actually changes. Entries are stored
+as <key>.bc together with a <key>.json side file holding the entry's metadata:
+the stats of a pass stage, or the digests of the files a frontend compile
+read. The cache is bounded in size and evicts the least recently used
+entries first.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import threading
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Iterable, Optional, Tuple
+
+DEFAULT_CACHE_DIR = os.path.join("artifacts", "cache")
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024  # 1 GiB
+
+
+@lru_cache(maxsize=None)
+def get_tool_version(tool: str) -> str:
+    """Return the first line of `<tool> --version`, or '' if it cannot be run."""
+    try:
+        result = subprocess.run(
+            [tool, "--version"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            check=False,
+        )
+        lines = result.stdout.strip().splitlines()
+        return lines[0] if lines else ""
+    except Exception:
+        return ""
+
+
+def hash_file(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """Return the sha256 hex digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hash_bytes(data: bytes) -> str:
+    """Return the sha256 hex digest of in-memory contents, matching hash_file."""
+    return hashlib.sha256(data).hexdigest()
+
+
+class ArtifactCache:
+    """
+    Size-bounded LRU cache of bitcode artifacts addressed by content hash.
+    """
+
+    def __init__(self, root: Optional[str] = None, max_bytes: int = DEFAULT_MAX_BYTES):
+        """
+        :param root: Directory holding the cache entries. Created on demand.
+        :param max_bytes: Upper bound on the total size of cached artifacts.
+        """
+        self.root = Path(root or DEFAULT_CACHE_DIR)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def make_key(
+        self,
+        input_digest: str,
+        flags: Iterable[str],
+        target: str = "",
+        tool_version: str = "",
+    ) -> str:
+        """
+        Build a cache key from the hashed input bytes, the exact flags,
+        the target triple and the tool version.
+        """
+        digest = hashlib.sha256()
+        for part in (input_digest, "\0".join(flags), target, tool_version):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\x1f")
+        return digest.hexdigest()
+
+    def _paths(self, key: str) -> Tuple[Path, Path]:
+        return self.root / f"{key}.bc", self.root / f"{key}.json"
+
+    def path(self, key: str) -> Optional[Path]:
+        """Path of the stored artifact for `key`, or None on a miss."""
+        artifact, _ = self._paths(key)
+        return artifact if artifact.exists() else None
+
+    def contains(self, key: str) -> bool:
+        artifact, _ = self._paths(key)
+        return artifact.exists()
+
+    def get(self, key: str, dest_path: str) -> Optional[dict]:
+        """
+        Copy the artifact for `key` to dest_path and return its metadata,
+        or None on a miss. A hit refreshes the entry's LRU position.
+        """
+        artifact, meta_file = self._paths(key)
+        try:
+            with open(meta_file, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            shutil.copyfile(artifact, dest_path)
+            os.utime(artifact)
+            os.utime(meta_file)
+        except (OSError, json.JSONDecodeError):
+            return None
+        print(f"[CACHE] hit {key[:12]}")
+        return meta
+
+    def get_bytes(self, key: str) -> Optional[Tuple[bytes, dict]]:
+        """Like get(), but return the artifact's contents instead of copying it."""
+        artifact, meta_file = self._paths(key)
+        try:
+            with open(meta_file, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            data = artifact.read_bytes()
+            os.utime(artifact)
+            os.utime(meta_file)
+        except (OSError, json.JSONDecodeError):
+            return None
+        print(f"[CACHE] hit {key[:12]}")
+        return data, meta
+
+    def put(self, key: str, src_path: str, meta: Optional[dict] = None):
+        """Store src_path under `key` and evict old entries if over budget."""
+        self._store(key, lambda tmp: shutil.copyfile(src_path, tmp), meta)
+
+    def put_bytes(self, key: str, data: bytes, meta: Optional[dict] = None):
+        """Store an in-memory artifact under `key`."""
+        self._store(key, lambda tmp: tmp.write_bytes(data), meta)
+
+    def _store(self, key: str, write_artifact: Callable[[Path], Any], meta: Optional[dict]):
+        self.root.mkdir(parents=True, exist_ok=True)
+        artifact, meta_file = self._paths(key)
+        tmp_artifact = artifact.with_name(f"{artifact.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp_meta = meta_file.with_name(f"{meta_file.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            write_artifact(tmp_artifact)
+            with open(tmp_meta, "w", encoding="utf-8") as f:
+                json.dump(meta or {}, f)
+            os.replace(tmp_artifact, artifact)
+            os.replace(tmp_meta, meta_file)
+        except OSError as e:
+            print(f"[WARN] Could not store cache entry {key[:12]}: {e}")
+            for tmp in (tmp_artifact, tmp_meta):
+                if tmp.exists():
+                    tmp.unlink()
+            return
+        self.evict()
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits max_bytes."""
+        with self._lock:
+            entries = []
+            total = 0
+            for artifact in self.root.glob("*.bc"):
+                try:
+                    st = artifact.stat()
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, artifact))
+                total += st.st_size
+
+            entries.sort()
+            for _, size, artifact in entries:
+                if total <= self.max_bytes:
+                    break
+                for path in (artifact, artifact.with_suffix(".json")):
+                    try:
+                        path.unlink()
+                    except OSError:
+                        pass
+                total -= size
+
+    def clear(self):
+        """
+        Remove every entry from the cache. Subdirectories other services keep
+        under the root (size-analysis/, thinlto/) are left alone.
+        """
+        with self._lock:
+            if not self.root.exists():
+                return
+            for pattern in ("*.bc", "*.json", "*.tmp"):
+                for path in self.root.glob(pattern):
+                    if path.is_file():
+                        try:
+                            path.unlink()
+                        except OSError:
+                            pass
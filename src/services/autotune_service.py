@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+autotune_service.py
+
+Usage:
+    python -m src.services.autotune_service <source.c|input.bc> template.json
+        [--space space.json] [--time-budget SECONDS] [--size-budget BYTES]
+        [--min-strength N] [--max-candidates N] [--jobs N] [--output result.json]
+
+Searches pass parameters for the cheapest config that is still strong enough:
+- Uses a config in the example.json format as the search template; only
+  passes enabled in it are tuned
+- Expands a search space of {pass: {param: [values]}} (DEFAULT_SPACE unless
+  given) into candidate configs, sampling when the grid is too large
+- Applies every candidate to the same frontend .bc on a process pool and
+  scores it on pass time, output size and the LLVM stats of the run
+- Returns every scored candidate, the Pareto front (fast, small, strong) and
+  the best candidate within the given time/size budget and strength target
+
+The strength of a candidate is the sum of the LLVM statistics reported by the
+obfuscation passes (debug types in IGNORED_STATS are left out).
+"""
+
+import argparse
+import copy
+import itertools
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from src.core.result import thaw
+from src.services.llvm_pass_service import LLVMPassService
+from src.services.llvm_service import LLVMService
+from src.utils.system import available_cores
+
+# Parameter values tried per pass when no search space is given.
+DEFAULT_SPACE: Dict[str, Dict[str, List[Any]]] = {
+    "fla": {"cycles": [1, 2]},
+    "bcf": {"boguscfg-prob": [10, 30, 60, 100], "cycles": [1, 2]},
+    "sub": {"cycles": [1, 2, 3]},
+    "merge": {"ratio": [25, 50, 100]},
+    "mba": {"linearmba-prob": [25, 50, 100], "linearmba-extra": [1, 3, 5], "cycles": [1, 2]},
+}
+
+# Stats that do not measure obfuscation.
+IGNORED_STATS = {"bitcode-reader", "file-search"}
+
+
+def strength_score(stats: Dict[str, dict]) -> int:
+    """Sum of all obfuscation stats of a run."""
+    return sum(
+        value
+        for debug_type, metrics in stats.items()
+        if debug_type not in IGNORED_STATS
+        for value in metrics.values()
+    )
+
+
+def expand_space(
+    template: Dict[str, Any],
+    space: Dict[str, Dict[str, List[Any]]],
+    max_candidates: Optional[int] = None,
+    seed: int = 0,
+) -> List[Dict[str, Any]]:
+    """
+    Return the parameter assignments {"<pass>.<param>": value} to try.
+    Dimensions of passes that are not enabled in the template are dropped. If
+    the grid is larger than max_candidates, a seeded random sample is returned.
+    """
+    enabled = {p.get("name") for p in template.get("passes", []) if p.get("enabled")}
+    dimensions = [
+        (f"{pass_name}.{param}", list(values))
+        for pass_name, params in space.items()
+        if pass_name in enabled
+        for param, values in params.items()
+        if values
+    ]
+    keys = [key for key, _ in dimensions]
+    grid = itertools.product(*(values for _, values in dimensions))
+
+    total = 1
+    for _, values in dimensions:
+        total *= len(values)
+    if max_candidates is None or total <= max_candidates:
+        return [dict(zip(keys, combo)) for combo in grid]
+
+    # Sample grid indices instead of materializing a huge grid.
+    rng = random.Random(seed)
+    assignments = []
+    for index in sorted(rng.sample(range(total), max_candidates)):
+        combo = []
+        for _, values in reversed(dimensions):
+            index, position = divmod(index, len(values))
+            combo.append(values[position])
+        assignments.append(dict(zip(keys, reversed(combo))))
+    return assignments
+
+
+def apply_assignment(template: Dict[str, Any], assignment: Dict[str, Any]) -> Dict[str, Any]:
+    """Return a copy of the template with the assigned pass parameters set."""
+    config = copy.deepcopy(template)
+    by_name = {p.get("name"): p for p in config.get("passes", [])}
+    for key, value in assignment.items():
+        pass_name, _, param = key.partition(".")
+        by_name[pass_name].setdefault("params", {})[param] = value
+    return config
+
+
+def _evaluate_candidate(
+    index: int,
+    assignment: Dict[str, Any],
+    config: Dict[str, Any],
+    input_bc: str,
+    clang_path: str,
+    out_dir: str,
+    fused: bool,
+) -> Dict[str, Any]:
+    """Apply one candidate config to the input .bc and measure it. Runs in a worker process."""
+    obf_path = Path(out_dir, f"candidate_{index}_obf.bc")
+    obf_path.unlink(missing_ok=True)
+    result = {"index": index, "params": assignment, "error": None}
+    try:
+        service = LLVMPassService(clang_path, work_dir=out_dir, fused=fused)
+        started = time.monotonic()
+        run = service.apply_json_conf(config, input_bc, str(obf_path))
+        elapsed = time.monotonic() - started
+        if not run.success or not obf_path.exists():
+            raise RuntimeError(run.error or "no obfuscated output was produced")
+        result.update({
+            "time_s": elapsed,
+            "size_bytes": obf_path.stat().st_size,
+            "strength": strength_score(run.stats),
+            "stats": thaw(run.stats),
+        })
+    except Exception as e:
+        result["error"] = str(e)
+    finally:
+        obf_path.unlink(missing_ok=True)
+    return result
+
+
+def _dominates(a: Dict[str, Any], b: Dict[str, Any]) -> bool:
+    no_worse = a["time_s"] <= b["time_s"] and a["size_bytes"] <= b["size_bytes"] and a["strength"] >= b["strength"]
+    better = a["time_s"] < b["time_s"] or a["size_bytes"] < b["size_bytes"] or a["strength"] > b["strength"]
+    return no_worse and better
+
+
+def pareto_front(candidates: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Candidates not dominated on (time, size, strength), ordered by time."""
+    front = [c for c in candidates if not any(_dominates(other, c) for other in candidates)]
+    return sorted(front, key=lambda c: (c["time_s"], c["size_bytes"]))
+
+
+def select_best(
+    candidates: List[Dict[str, Any]],
+    time_budget: Optional[float] = None,
+    size_budget: Optional[int] = None,
+    min_strength: Optional[int] = None,
+) -> Optional[Dict[str, Any]]:
+    """
+    Pick a candidate within the budgets. With min_strength, the cheapest one
+    reaching it; otherwise the strongest one (cheapest on ties).
+    """
+    feasible = [
+        c for c in candidates
+        if (time_budget is None or c["time_s"] <= time_budget)
+        and (size_budget is None or c["size_bytes"] <= size_budget)
+        and (min_strength is None or c["strength"] >= min_strength)
+    ]
+    if not feasible:
+        return None
+    if min_strength is not None:
+        return min(feasible, key=lambda c: (c["time_s"], c["size_bytes"], -c["strength"]))
+    return min(feasible, key=lambda c: (-c["strength"], c["time_s"], c["size_bytes"]))
+
+
+class AutotuneService:
+    """
+    Service for searching pass parameters on a process pool.
+    """
+
+    def __init__(self, clang_path: str = "clang", jobs: Optional[int] = None, fused: bool = True):
+        """
+        :param clang_path: Path to clang executable.
+        :param jobs: Number of worker processes. Defaults to the available cores.
+        :param fused: Run candidates in fused mode, as the GUI and the backend do.
+        """
+        self.clang_path = clang_path
+        self.jobs = jobs or available_cores()
+        self.fused = fused
+
+    def autotune(
+        self,
+        input_file: str,
+        template: Dict[str, Any],
+        space: Optional[Dict[str, Dict[str, List[Any]]]] = None,
+        time_budget: Optional[float] = None,
+        size_budget: Optional[int] = None,
+        min_strength: Optional[int] = None,
+        max_candidates: Optional[int] = 256,
+        out_dir: str = os.path.join("artifacts", "autotune"),
+        seed: int = 0,
+    ) -> Dict[str, Any]:
+        """
+        Score candidate configs derived from the template.
+        :param input_file: C/C++ source (compiled once) or a frontend .bc.
+        :param template: Pass configuration in the example.json format.
+        :param space: {pass: {param: [values]}}; defaults to DEFAULT_SPACE.
+        :param time_budget: Maximum pass time in seconds for the best candidate.
+        :param size_budget: Maximum output .bc size in bytes for the best candidate.
+        :param min_strength: Required strength score; the cheapest candidate reaching it is chosen.
+        :param max_candidates: Upper bound on evaluated candidates; larger grids are sampled.
+        :param out_dir: Directory for the frontend .bc and candidate outputs.
+        :param seed: Seed for sampling the grid.
+        :return: Dict with "candidates", "failed", "pareto_front", "best" and "best_config".
+        """
+        # Candidates run with out_dir as cwd, so paths must be absolute.
+        out_dir = str(Path(out_dir).resolve())
+        Path(out_dir).mkdir(parents=True, exist_ok=True)
+
+        input_path = Path(input_file).resolve()
+        if input_path.suffix == ".bc":
+            input_bc = str(input_path)
+        else:
+            input_bc = str(Path(out_dir, f"{input_path.stem}.bc"))
+            LLVMService(self.clang_path).compile_to_bytecode(str(input_path), input_bc, template.get("compiler"))
+
+        assignments = expand_space(template, space or DEFAULT_SPACE, max_candidates, seed)
+        if not assignments:
+            raise RuntimeError("Nothing to tune: no enabled pass of the template is in the search space.")
+        print(f"[AUTOTUNE] Evaluating {len(assignments)} candidates on {self.jobs} workers")
+
+        results = []
+        with ProcessPoolExecutor(max_workers=min(self.jobs, len(assignments))) as pool:
+            futures = [
+                pool.submit(
+                    _evaluate_candidate, index, assignment, apply_assignment(template, assignment),
+                    input_bc, self.clang_path, out_dir, self.fused,
+                )
+                for index, assignment in enumerate(assignments)
+            ]
+            for future in as_completed(futures):
+                results.append(future.result())
+
+        results.sort(key=lambda r: r["index"])
+        scored = [r for r in results if r["error"] is None]
+        best = select_best(scored, time_budget, size_budget, min_strength)
+        return {
+            "candidates": scored,
+            "failed": {json.dumps(r["params"]): r["error"] for r in results if r["error"] is not None},
+            "pareto_front": pareto_front(scored),
+            "best": best,
+            "best_config": apply_assignment(template, best["params"]) if best else None,
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Search pass parameters for the cheapest sufficient config.")
+    parser.add_argument("input_file")
+    parser.add_argument("template")
+    parser.add_argument("--space", help="JSON file with {pass: {param: [values]}}.")
+    parser.add_argument("--time-budget", type=float)
+    parser.add_argument("--size-budget", type=int)
+    parser.add_argument("--min-strength", type=int)
+    parser.add_argument("--max-candidates", type=int, default=256)
+    parser.add_argument("--jobs", type=int)
+    parser.add_argument("--output", help="Write the full result JSON here.")
+    args = parser.parse_args()
+
+    with open(args.template, "r", encoding="utf-8") as f:
+        template_config = json.load(f)
+    search_space = None
+    if args.space:
+        with open(args.space, "r", encoding="utf-8") as f:
+            search_space = json.load(f)
+
+    result = AutotuneService(os.getenv("CLANG_PATH", "clang"), jobs=args.jobs).autotune(
+        args.input_file, template_config, search_space,
+        args.time_budget, args.size_budget, args.min_strength, args.max_candidates,
+    )
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=4)
+
+    for candidate in result["pareto_front"]:
+        print(f"[PARETO] {candidate['time_s']:.3f}s {candidate['size_bytes']} bytes strength {candidate['strength']} {json.dumps(candidate['params'])}")
+    if result["best"] is None:
+        print("[WARN] No candidate meets the budget.")
+        sys.exit(1)
+    print(json.dumps(result["best_config"], indent=4))
@@ -0,0 +1,356 @@
+"""
+cost_model_service.py
+
+Predicts what a config will cost before it runs, from the stages of past runs:
+- LLVMPassService records every executed (not cached) stage: its pipeline
+  and options, input and output bitcode size, and wall time
+- Every pass is modelled by a size growth factor and a cost per input
+  megabyte, plus one per-invocation startup cost. A fused stage is the
+  chain of its passes, so both are fitted by least squares over fused and
+  unfused stages alike (growth in log space, time weighted by relative error)
+- Passes are modelled per cost-relevant parameter values (e.g. bcf with
+  prob=30) when those were observed, and per pass name otherwise; seeds
+  are ignored
+- Estimates give the total and per-stage time with a range from the fit's
+  spread, the output size, and warnings when a "budget" section of the
+  config would be exceeded
+
+History is kept in a JSON lines file of bounded length, so the model keeps
+learning across sessions and adapts when the toolchain gets faster.
+"""
+
+import json
+import math
+import os
+import threading
+from collections import deque
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional, Sequence, Tuple
+
+from src.core.plan import PASS_SCHEMAS, ExecutionPlan, PlanStage, compile_config, option_name
+
+DEFAULT_HISTORY_PATH = os.path.join("artifacts", "cost_history.jsonl")
+MAX_OBSERVATIONS = 5000
+BUDGET_FIELDS = ("seconds", "output_mb")
+
+# Observations a parameter-specific key needs before it is preferred over the pass name.
+_MIN_KEY_SAMPLES = 3
+_MB = 1024 * 1024
+
+
+def _cost_options() -> Dict[str, str]:
+    """Option name -> pass, for every option that is not a seed."""
+    options = {}
+    for name, schema in PASS_SCHEMAS.items():
+        for param in schema:
+            if not param.endswith("seed"):
+                options[option_name(name, param)] = name
+    return options
+
+
+_COST_OPTIONS = _cost_options()
+
+
+def pass_keys(pipeline: Sequence[str], options: Sequence[str]) -> Tuple[List[str], List[str]]:
+    """
+    The model keys of every pass application of a stage: by pass name, and by
+    pass name plus its cost-relevant options, e.g. "bcf[boguscfg-prob=30]".
+    """
+    params: Dict[str, List[str]] = {}
+    for flag in options:
+        option = flag.lstrip("-").split("=", 1)[0]
+        if option in _COST_OPTIONS:
+            params.setdefault(_COST_OPTIONS[option], []).append(flag.lstrip("-"))
+    detailed = [f"{name}[{','.join(sorted(params[name]))}]" if name in params else name for name in pipeline]
+    return list(pipeline), detailed
+
+
+def _solve(a: List[List[float]], b: List[float]) -> List[float]:
+    """Solve a small dense linear system by Gaussian elimination with partial pivoting."""
+    n = len(b)
+    m = [row[:] + [b[i]] for i, row in enumerate(a)]
+    for col in range(n):
+        pivot = max(range(col, n), key=lambda r: abs(m[r][col]))
+        if abs(m[pivot][col]) < 1e-12:
+            continue
+        m[col], m[pivot] = m[pivot], m[col]
+        for r in range(n):
+            if r != col and m[r][col]:
+                factor = m[r][col] / m[col][col]
+                for c in range(col, n + 1):
+                    m[r][c] -= factor * m[col][c]
+    return [m[i][n] / m[i][i] if abs(m[i][i]) >= 1e-12 else 0.0 for i in range(n)]
+
+
+def _ridge(rows: List[List[float]], ys: List[float], ridge: float) -> List[float]:
+    """Least squares with a small ridge penalty, so rarely seen keys stay near zero."""
+    dims = len(rows[0])
+    xtx = [[0.0] * dims for _ in range(dims)]
+    xty = [0.0] * dims
+    for row, y in zip(rows, ys):
+        for i, xi in enumerate(row):
+            if xi:
+                xty[i] += xi * y
+                for j, xj in enumerate(row):
+                    xtx[i][j] += xi * xj
+    for i in range(dims):
+        xtx[i][i] += ridge
+    return _solve(xtx, xty)
+
+
+class _Fit:
+    """Growth and time coefficients of one key level (pass names or detailed keys)."""
+
+    def __init__(self, observations: List[Dict[str, Any]], level: int):
+        self.level = level
+        self.counts: Dict[str, int] = {}
+        for obs in observations:
+            for key in set(obs["keys"][level]):
+                self.counts[key] = self.counts.get(key, 0) + 1
+        keys = sorted(self.counts)
+        index = {key: i for i, key in enumerate(keys)}
+
+        # log(output / input) = sum of the log growth of every pass application
+        rows, ys = [], []
+        for obs in observations:
+            row = [0.0] * len(keys)
+            for key in obs["keys"][level]:
+                row[index[key]] += 1
+            rows.append(row)
+            ys.append(math.log(max(obs["output_bytes"], 1) / max(obs["input_bytes"], 1)))
+        self.log_growth = dict(zip(keys, _ridge(rows, ys, 0.1))) if keys else {}
+
+        # wall_s = startup + sum of cost[key] * input MB of every application,
+        # each row scaled by 1 / wall_s so small runs count as much as large ones
+        rows, ys = [], []
+        for obs in observations:
+            row = [1.0] + [0.0] * len(keys)
+            for key, size in zip(obs["keys"][level], self._chain(obs["keys"][level], obs["input_bytes"])):
+                row[1 + index[key]] += size / _MB
+            scale = 1 / max(obs["wall_s"], 0.05)
+            rows.append([x * scale for x in row])
+            ys.append(obs["wall_s"] * scale)
+        coefficients = [max(c, 0.0) for c in _ridge(rows, ys, 1e-3)]
+        self.startup_s = coefficients[0]
+        self.cost_per_mb = dict(zip(keys, coefficients[1:]))
+
+        # Typical relative error of the time fit, in log space.
+        errors = [
+            math.log(max(self.stage_seconds(obs["keys"][level], obs["input_bytes"]), 1e-3) / max(obs["wall_s"], 1e-3))
+            for obs in observations
+        ]
+        self.log_spread = math.sqrt(sum(e * e for e in errors) / len(errors)) if errors else 0.0
+
+    def _chain(self, keys: Sequence[str], input_bytes: float) -> List[float]:
+        """Input size of every pass application of a stage."""
+        sizes, size = [], float(input_bytes)
+        for key in keys:
+            sizes.append(size)
+            size *= math.exp(self.log_growth.get(key, 0.0))
+        return sizes
+
+    def knows(self, keys: Sequence[str]) -> bool:
+        minimum = _MIN_KEY_SAMPLES if self.level else 1
+        return all(self.counts.get(key, 0) >= minimum for key in keys)
+
+    def stage_output(self, keys: Sequence[str], input_bytes: float) -> float:
+        return input_bytes * math.exp(sum(self.log_growth.get(key, 0.0) for key in keys))
+
+    def stage_seconds(self, keys: Sequence[str], input_bytes: float) -> float:
+        # Keys never seen cost the average known pass.
+        default = sum(self.cost_per_mb.values()) / len(self.cost_per_mb) if self.cost_per_mb else 0.0
+        return self.startup_s + sum(
+            self.cost_per_mb.get(key, default) * size / _MB
+            for key, size in zip(keys, self._chain(keys, input_bytes))
+        )
+
+
+def parse_budget(config: Dict[str, Any]) -> Dict[str, float]:
+    """
+    The limits of the "budget" section of a config ("seconds", "output_mb").
+    Raises ValueError for an unknown key or a limit that is not a positive number.
+    """
+    section = config.get("budget") or {}
+    if not isinstance(section, dict):
+        raise ValueError(f"budget must be an object, got {section!r}.")
+    budget = {}
+    for field, value in section.items():
+        if field not in BUDGET_FIELDS:
+            raise ValueError(f"Unknown budget field '{field}', expected one of {BUDGET_FIELDS}.")
+        if value is None:
+            continue
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not value > 0:
+            raise ValueError(f"budget.{field} must be a positive number, got {value!r}.")
+        budget[field] = value
+    return budget
+
+
+def check_budget(estimate: Dict[str, Any], budget: Dict[str, float]) -> List[str]:
+    """Warnings for every limit of a budget (see parse_budget) the estimate exceeds."""
+    warnings = []
+    seconds = budget.get("seconds")
+    if seconds and estimate["seconds"] > seconds:
+        warnings.append(
+            f"Predicted time {estimate['seconds']:.1f}s exceeds the budget of {seconds}s "
+            f"(likely {estimate['seconds_low']:.1f}-{estimate['seconds_high']:.1f}s)."
+        )
+    output_mb = budget.get("output_mb")
+    if output_mb and estimate["output_bytes"] / _MB > output_mb:
+        warnings.append(
+            f"Predicted output size {estimate['output_bytes'] / _MB:.1f} MiB exceeds the budget of {output_mb} MiB."
+        )
+    return warnings
+
+
+def remaining_seconds(
+    estimate: Dict[str, Any], finished: Dict[int, float], current: Optional[int], current_elapsed: float
+) -> float:
+    """
+    ETA of a running plan: the predicted time of the stages not finished
+    yet, corrected by how far off the predictions of finished stages were.
+    :param finished: Actual wall time of every finished stage by index.
+    :param current: Index of the running stage, if any.
+    """
+    predicted = [stage["seconds"] for stage in estimate["stages"]]
+    done_predicted = sum(predicted[i] for i in finished if i < len(predicted))
+    correction = sum(finished.values()) / done_predicted if finished and done_predicted > 0 else 1.0
+    left = sum(p for i, p in enumerate(predicted) if i not in finished) * correction
+    if current is not None and current not in finished:
+        left -= min(current_elapsed, predicted[current] * correction if current < len(predicted) else 0.0)
+    return max(left, 0.0)
+
+
+class CostModel:
+    """
+    Service predicting the time and output size of a config from past runs.
+    """
+
+    def __init__(self, history_path: Optional[str] = None, max_observations: int = MAX_OBSERVATIONS):
+        """
+        :param history_path: JSON lines file holding the observations. Defaults to artifacts/cost_history.jsonl.
+        :param max_observations: Most recent observations kept and fitted.
+        """
+        self.history_path = Path(history_path or DEFAULT_HISTORY_PATH)
+        self.max_observations = max_observations
+        self._observations: Optional[Deque[Dict[str, Any]]] = None
+        self._fits: Optional[Tuple[_Fit, _Fit]] = None
+        self._appended = 0
+        self._lock = threading.Lock()
+
+    def _load(self) -> Deque[Dict[str, Any]]:
+        if self._observations is None:
+            self._observations = deque(maxlen=self.max_observations)
+            try:
+                with open(self.history_path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        self._appended += 1
+                        try:
+                            self._observations.append(self._with_keys(json.loads(line)))
+                        except (json.JSONDecodeError, KeyError, TypeError):
+                            continue  # a line cut short by a crash
+            except OSError:
+                pass
+        return self._observations
+
+    @staticmethod
+    def _with_keys(record: Dict[str, Any]) -> Dict[str, Any]:
+        return {**record, "keys": pass_keys(record["pipeline"], record["options"])}
+
+    def observe(self, stage: PlanStage, input_bytes: int, output_bytes: int, wall_s: float):
+        """Record one executed stage. Called by LLVMPassService; safe from any thread."""
+        if input_bytes <= 0 or output_bytes <= 0 or wall_s <= 0:
+            return
+        record = {
+            "pipeline": list(stage.pipeline),
+            "options": list(stage.options),
+            "input_bytes": input_bytes,
+            "output_bytes": output_bytes,
+            "wall_s": wall_s,
+        }
+        with self._lock:
+            self._load().append(self._with_keys(record))
+            self._fits = None
+            try:
+                self.history_path.parent.mkdir(parents=True, exist_ok=True)
+                if self._appended >= self.max_observations:
+                    # Rewrite the file with the kept observations so it stays bounded.
+                    self._appended = 0
+                    tmp = self.history_path.with_suffix(".tmp")
+                    with open(tmp, "w", encoding="utf-8") as f:
+                        for obs in self._observations:
+                            f.write(json.dumps({k: v for k, v in obs.items() if k != "keys"}) + "\n")
+                    os.replace(tmp, self.history_path)
+                else:
+                    with open(self.history_path, "a", encoding="utf-8") as f:
+                        f.write(json.dumps(record) + "\n")
+                    self._appended += 1
+            except OSError as e:
+                print(f"[WARN] Could not record cost history: {e}")
+
+    @property
+    def samples(self) -> int:
+        with self._lock:
+            return len(self._load())
+
+    def _get_fits(self) -> Optional[Tuple[_Fit, _Fit]]:
+        with self._lock:
+            observations = list(self._load())
+            if self._fits is None and observations:
+                self._fits = (_Fit(observations, 0), _Fit(observations, 1))
+            return self._fits
+
+    def estimate(
+        self, config: Any, input_bytes: int, fused: bool = True
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Predict the cost of running a config (or precompiled plan) on bitcode of input_bytes.
+        Returns None without any history. Raises ConfigError for an invalid config
+        and ValueError for an invalid budget.
+        :return: Dict with "seconds" and its likely range "seconds_low"/"seconds_high",
+                 "output_bytes", per-stage "stages", "samples", "unknown_passes" and
+                 budget "warnings".
+        """
+        plan = config if isinstance(config, ExecutionPlan) else compile_config(config, fused=fused)
+        budget = parse_budget(config) if isinstance(config, dict) else {}
+        fits = self._get_fits()
+        if fits is None:
+            return None
+        by_name, detailed = fits
+
+        stages, size, spread = [], float(input_bytes), 0.0
+        unknown = set()
+        for stage in plan:
+            names, keys = pass_keys(stage.pipeline, stage.options)
+            fit, stage_keys = (detailed, keys) if detailed.knows(keys) else (by_name, names)
+            unknown.update(name for name in names if name not in by_name.counts)
+            seconds = fit.stage_seconds(stage_keys, size)
+            size = fit.stage_output(stage_keys, size)
+            spread = max(spread, fit.log_spread)
+            stages.append({"stage": stage.label, "seconds": seconds, "output_bytes": int(size)})
+
+        total = sum(stage["seconds"] for stage in stages)
+        estimate = {
+            "seconds": total,
+            "seconds_low": total / math.exp(spread),
+            "seconds_high": total * math.exp(spread),
+            "input_bytes": input_bytes,
+            "output_bytes": int(size),
+            "stages": stages,
+            "samples": len(self._load()),
+            "unknown_passes": sorted(unknown),
+        }
+        estimate["warnings"] = check_budget(estimate, budget)
+        return estimate
+
+
+_shared: Optional[CostModel] = None
+_shared_lock = threading.Lock()
+
+
+def shared_cost_model() -> CostModel:
+    """The cost model shared by every service of this process, stored at COST_HISTORY."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = CostModel(os.getenv("COST_HISTORY"))
+        return _shared
@@ -0,0 +1,572 @@
+#!/usr/bin/env python3
+"""
+distributed_service.py
+
+Usage:
+    python -m src.services.distributed_service input.bc config.json http://worker1:8100 [http://worker2:8100 ...]
+(set SHARDS=N to split the module into N partitions, 0 for one per worker slot)
+
+Runs obfuscation on remote workers that have their own clang:
+- A worker stores artifacts by sha256 and runs the configured passes on a
+  stored input, returning the digest of the output with its stats
+- LocalWorker runs in-process; HTTPWorker talks to a LocalWorker served by
+  src/worker_server.py over a small JSON/HTTP protocol:
+      GET  /health                  -> {"name", "slots", "clang", "running"}
+      HEAD /artifacts/<digest>      -> 200 if held, 404 otherwise
+      GET  /artifacts/<digest>      -> artifact bytes
+      PUT  /artifacts/<digest>      <- artifact bytes (verified against the digest)
+      POST /tasks                   <- {"task_id", "input", "config"} -> result
+      POST /tasks/<task_id>/cancel
+- The Coordinator health-checks workers, gives every task a free slot,
+  preferring workers that already hold its input so it is not sent again,
+  retries a task on another worker when its worker is lost and probes lost
+  workers again after recheck_interval seconds
+- DistributedPassService is a drop-in replacement for LLVMPassService that
+  sends a whole job, or the llvm-split partitions of it, to the workers
+"""
+
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from src.core.plan import ConfigError, compile_config
+from src.core.result import RunResult
+from src.services.artifact_cache import ArtifactCache, DEFAULT_MAX_BYTES, get_tool_version, hash_file
+from src.services.llvm_pass_service import LLVMPassService, ObfuscationCancelled, ProgressCallback
+from src.services.shard_service import ShardedPassService, shard_config
+from src.utils.stats_store import StatsStore
+from src.utils.system import available_cores
+
+DEFAULT_STORE_DIR = os.path.join("artifacts", "worker")
+DIGEST_RE = re.compile(r"[0-9a-f]{64}")
+
+
+def check_digest(digest: str) -> str:
+    """Return digest if it is a sha256 hex digest, else raise ValueError (it names a file in the store)."""
+    if not isinstance(digest, str) or not DIGEST_RE.fullmatch(digest):
+        raise ValueError(f"Invalid artifact digest: {str(digest)[:80]!r}")
+    return digest
+
+
+class WorkerLost(RuntimeError):
+    """The worker could not be reached; the task may be retried elsewhere."""
+
+
+class ArtifactMissing(KeyError):
+    """The worker does not hold the requested artifact (never sent, or evicted)."""
+
+
+class LocalWorker:
+    """
+    In-process worker. Also the implementation behind the worker HTTP API.
+    """
+
+    def __init__(
+        self,
+        clang_path: str = "clang",
+        store_dir: Optional[str] = None,
+        slots: Optional[int] = None,
+        name: str = "local",
+        cache: Optional[ArtifactCache] = None,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+    ):
+        """
+        :param clang_path: Path to the worker's clang executable.
+        :param store_dir: Directory of the artifact store. Defaults to artifacts/worker.
+        :param slots: Number of tasks run at once. Defaults to the available cores.
+        :param name: Name reported by health().
+        :param cache: Optional ArtifactCache for the pass stages.
+        :param max_bytes: Upper bound on the size of the artifact store.
+        """
+        self.clang_path = clang_path
+        self.name = name
+        self.slots = slots or available_cores()
+        self.store = ArtifactCache(store_dir or DEFAULT_STORE_DIR, max_bytes)
+        # One service for every task; it keeps their runs and results apart.
+        self.pass_service = LLVMPassService(clang_path, fused=True, cache=cache)
+        self._tasks: Dict[str, Optional[str]] = {}  # task id -> run id, once the run started
+        self._cancelled_tasks: set = set()
+        self._lock = threading.Lock()
+
+    def health(self) -> Dict[str, Any]:
+        with self._lock:
+            running = len(self._tasks)
+        clang = shutil.which(self.clang_path) or self.clang_path
+        return {"name": self.name, "slots": self.slots, "clang": get_tool_version(clang), "running": running}
+
+    def has_artifact(self, digest: str) -> bool:
+        return self.store.contains(check_digest(digest))
+
+    def artifact_path(self, digest: str) -> Optional[Path]:
+        return self.store.path(check_digest(digest))
+
+    def put_artifact(self, path: str, digest: Optional[str] = None) -> str:
+        """Store a file and return its digest."""
+        digest = check_digest(digest) if digest else hash_file(path)
+        if not self.store.contains(digest):
+            self.store.put(digest, path)
+        return digest
+
+    def get_artifact(self, digest: str, dest_path: str):
+        if self.store.get(check_digest(digest), dest_path) is None:
+            raise ArtifactMissing(digest)
+
+    def run_task(self, task_id: str, input_digest: str, config: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Obfuscate a stored input and store the output.
+        :return: RunResult.to_dict() with "output" replaced by the output digest and the stats store "records".
+        """
+        check_digest(input_digest)
+        with tempfile.TemporaryDirectory(prefix="worker-task-") as tmp_dir:
+            input_file = str(Path(tmp_dir, "input.bc"))
+            output_file = str(Path(tmp_dir, "output.bc"))
+            if self.store.get(input_digest, input_file) is None:
+                raise ArtifactMissing(input_digest)
+
+            def on_progress(event):
+                with self._lock:
+                    if task_id in self._cancelled_tasks:
+                        raise ObfuscationCancelled("Obfuscation cancelled.")
+                    self._tasks[task_id] = event["run_id"]
+
+            with self._lock:
+                self._tasks[task_id] = None
+            try:
+                # Inputs are absolute paths, so the service's work_dir does not matter.
+                result = self.pass_service.apply_json_conf(config, input_file, output_file, on_progress)
+            finally:
+                with self._lock:
+                    self._tasks.pop(task_id, None)
+                    self._cancelled_tasks.discard(task_id)
+
+            if not result.success:
+                raise RuntimeError(result.error)
+            if not Path(output_file).exists():
+                raise RuntimeError("No obfuscated output was produced.")
+            return {
+                **result.to_dict(),
+                "output": self.put_artifact(output_file),
+                "records": [list(record) for record in result.stats_store.records()],
+            }
+
+    def cancel_task(self, task_id: str) -> bool:
+        with self._lock:
+            if task_id not in self._tasks:
+                return False
+            self._cancelled_tasks.add(task_id)
+            run_id = self._tasks[task_id]
+        if run_id is not None:
+            self.pass_service.cancel(run_id)
+        return True
+
+
+class HTTPWorker:
+    """
+    Client of a worker served by src/worker_server.py.
+    """
+
+    def __init__(self, url: str, timeout: float = 10.0, task_timeout: Optional[float] = None):
+        """
+        :param url: Base URL of the worker, e.g. http://build-7:8100.
+        :param timeout: Timeout of health checks and artifact transfers, in seconds.
+        :param task_timeout: Timeout of one task, in seconds. None waits for as long as the task runs.
+        """
+        self.url = url.rstrip("/")
+        self.name = self.url
+        self.timeout = timeout
+        self.task_timeout = task_timeout
+
+    def _open(self, method: str, path: str, data=None, headers=None, task: bool = False):
+        request = urllib.request.Request(self.url + path, data=data, method=method, headers=headers or {})
+        try:
+            return urllib.request.urlopen(request, timeout=self.task_timeout if task else self.timeout)
+        except urllib.error.HTTPError as e:
+            return e
+        except (urllib.error.URLError, OSError) as e:
+            raise WorkerLost(f"Worker {self.url} is unreachable: {e}")
+
+    def _json(self, method: str, path: str, body: Optional[dict] = None, task: bool = False) -> Tuple[int, Any]:
+        data = json.dumps(body).encode("utf-8") if body is not None else None
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        try:
+            with self._open(method, path, data, headers, task) as response:
+                payload = response.read()
+                return response.status, json.loads(payload) if payload else None
+        except (OSError, json.JSONDecodeError) as e:
+            raise WorkerLost(f"Worker {self.url} dropped the connection: {e}")
+
+    def health(self) -> Dict[str, Any]:
+        status, payload = self._json("GET", "/health")
+        if status != 200:
+            raise WorkerLost(f"Worker {self.url} is unhealthy (HTTP {status}).")
+        return payload
+
+    def has_artifact(self, digest: str) -> bool:
+        with self._open("HEAD", f"/artifacts/{digest}") as response:
+            return response.status == 200
+
+    def put_artifact(self, path: str, digest: Optional[str] = None) -> str:
+        digest = digest or hash_file(path)
+        headers = {"Content-Type": "application/octet-stream", "Content-Length": str(os.path.getsize(path))}
+        with open(path, "rb") as f, self._open("PUT", f"/artifacts/{digest}", f, headers) as response:
+            if response.status not in (200, 201):
+                raise RuntimeError(f"Worker {self.url} rejected artifact {digest[:12]} (HTTP {response.status}).")
+        return digest
+
+    def get_artifact(self, digest: str, dest_path: str):
+        tmp_path = f"{dest_path}.download"
+        try:
+            with self._open("GET", f"/artifacts/{digest}") as response:
+                if response.status == 404:
+                    raise ArtifactMissing(digest)
+                if response.status != 200:
+                    raise RuntimeError(f"Worker {self.url} could not send {digest[:12]} (HTTP {response.status}).")
+                with open(tmp_path, "wb") as f:
+                    shutil.copyfileobj(response, f)
+            os.replace(tmp_path, dest_path)
+        except OSError as e:
+            raise WorkerLost(f"Worker {self.url} dropped the connection: {e}")
+        finally:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+
+    def run_task(self, task_id: str, input_digest: str, config: Dict[str, Any]) -> Dict[str, Any]:
+        body = {"task_id": task_id, "input": input_digest, "config": config}
+        status, payload = self._json("POST", "/tasks", body, task=True)
+        if status == 200:
+            return payload
+        detail = (payload or {}).get("detail", f"HTTP {status}")
+        if status == 404:
+            raise ArtifactMissing(input_digest)
+        if status == 409:
+            raise ObfuscationCancelled("Obfuscation cancelled.")
+        if status == 400:
+            raise ConfigError(detail) if isinstance(detail, list) else ValueError(detail)
+        raise RuntimeError(f"Task failed on worker {self.url}: {detail}")
+
+    def cancel_task(self, task_id: str) -> bool:
+        status, _ = self._json("POST", f"/tasks/{task_id}/cancel")
+        return status == 200
+
+
+def parse_worker_urls(value: Optional[str]) -> List[HTTPWorker]:
+    """Workers of a comma-separated list of URLs, e.g. the WORKER_URLS variable."""
+    return [HTTPWorker(url.strip()) for url in (value or "").split(",") if url.strip()]
+
+
+@dataclass(frozen=True)
+class RemoteTask:
+    label: str
+    input_file: str
+    config: Dict[str, Any]
+    output_file: str
+
+
+class Coordinator:
+    """
+    Schedules tasks on a set of workers (LocalWorker, HTTPWorker or anything
+    with the same methods).
+    """
+
+    def __init__(self, workers: List[Any], max_retries: int = 2, recheck_interval: float = 30.0):
+        """
+        :param workers: The workers to use.
+        :param max_retries: How many times a task is moved to another worker after losing one.
+        :param recheck_interval: Seconds before a lost worker is health-checked again.
+        """
+        if not workers:
+            raise ValueError("At least one worker is required.")
+        self.workers = list(workers)
+        self.max_retries = max_retries
+        self.recheck_interval = recheck_interval
+        self._cond = threading.Condition()
+        self._slots: Dict[Any, int] = {}  # healthy workers only
+        self._active: Dict[Any, int] = {worker: 0 for worker in self.workers}
+        self._lost_at: Dict[Any, float] = {}
+        self._holdings: Dict[Any, set] = {worker: set() for worker in self.workers}
+        self._running: Dict[str, Any] = {}
+        self._cancelled = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    @property
+    def total_slots(self) -> int:
+        with self._cond:
+            return sum(self._slots.values())
+
+    def _probe(self, worker) -> bool:
+        try:
+            info = worker.health()
+        except WorkerLost as e:
+            print(f"[WARN] {e}")
+            self._mark_lost(worker)
+            return False
+        with self._cond:
+            self._slots[worker] = max(1, int(info.get("slots", 1)))
+            self._lost_at.pop(worker, None)
+            self._cond.notify_all()
+        return True
+
+    def check_health(self) -> Dict[str, bool]:
+        """Health-check every worker and return {name: healthy}."""
+        return {worker.name: self._probe(worker) for worker in self.workers}
+
+    def _mark_lost(self, worker):
+        with self._cond:
+            self._slots.pop(worker, None)
+            self._lost_at[worker] = time.monotonic()
+            self._holdings[worker].clear()
+            self._cond.notify_all()
+
+    def _recheck_lost(self):
+        now = time.monotonic()
+        with self._cond:
+            due = [w for w, lost_at in self._lost_at.items() if now - lost_at >= self.recheck_interval]
+        for worker in due:
+            self._probe(worker)
+
+    def _acquire(self, digest: str):
+        """Block until a healthy worker has a free slot, preferring one that holds digest."""
+        while True:
+            self._recheck_lost()
+            with self._cond:
+                if self._cancelled.is_set():
+                    raise ObfuscationCancelled("Obfuscation cancelled.")
+                if not self._slots:
+                    raise RuntimeError("No healthy workers available.")
+                free = [w for w, slots in self._slots.items() if self._active[w] < slots]
+                if free:
+                    worker = max(free, key=lambda w: (digest in self._holdings[w], self._slots[w] - self._active[w]))
+                    self._active[worker] += 1
+                    return worker
+                self._cond.wait(timeout=1.0)
+
+    def _release(self, worker):
+        with self._cond:
+            self._active[worker] -= 1
+            self._cond.notify_all()
+
+    def _run_on(self, worker, task: RemoteTask, digest: str) -> Dict[str, Any]:
+        with self._cond:
+            held = digest in self._holdings[worker]
+        if not held and not worker.has_artifact(digest):
+            worker.put_artifact(task.input_file, digest)
+        with self._cond:
+            self._holdings[worker].add(digest)
+
+        task_id = uuid.uuid4().hex
+        with self._cond:
+            self._running[task_id] = worker
+        try:
+            result = worker.run_task(task_id, digest, task.config)
+        finally:
+            with self._cond:
+                self._running.pop(task_id, None)
+        worker.get_artifact(result["output"], task.output_file)
+        with self._cond:
+            self._holdings[worker].add(result["output"])
+        return result
+
+    def _execute(self, index: int, total: int, task: RemoteTask, on_progress: Optional[ProgressCallback]):
+        digest = hash_file(task.input_file)
+        attempts = 0
+        while True:
+            worker = self._acquire(digest)
+            event = {"stage": task.label, "cycle": 1, "index": index, "total": total, "worker": worker.name}
+            started = time.monotonic()
+            try:
+                if on_progress is not None:
+                    on_progress({"event": "stage_started", **event})
+                result = self._run_on(worker, task, digest)
+            except (WorkerLost, ArtifactMissing) as e:
+                if isinstance(e, WorkerLost):
+                    self._mark_lost(worker)
+                else:
+                    with self._cond:
+                        self._holdings[worker].discard(digest)
+                attempts += 1
+                if self._cancelled.is_set():
+                    raise ObfuscationCancelled("Obfuscation cancelled.")
+                if attempts > self.max_retries:
+                    raise RuntimeError(f"Task '{task.label}' failed after {attempts} attempts: {e}")
+                print(f"[WARN] {e} Retrying task '{task.label}'.")
+                continue
+            finally:
+                self._release(worker)
+
+            if on_progress is not None:
+                on_progress({
+                    "event": "stage_finished", **event, "success": True, "elapsed": time.monotonic() - started,
+                })
+            result["worker"] = worker.name
+            return result
+
+    def run(self, tasks: List[RemoteTask], on_progress: Optional[ProgressCallback] = None) -> List[Dict[str, Any]]:
+        """Run every task and return their results in order. The first task error is raised."""
+        self._cancelled.clear()
+        if not self.total_slots:
+            self.check_health()
+        parallel = max(1, min(len(tasks), self.total_slots))
+        with ThreadPoolExecutor(max_workers=parallel) as pool:
+            futures = [
+                pool.submit(self._execute, index, len(tasks), task, on_progress)
+                for index, task in enumerate(tasks)
+            ]
+            try:
+                return [future.result() for future in futures]
+            except BaseException:
+                self.cancel()  # stop the other tasks instead of waiting for them
+                raise
+
+    def cancel(self):
+        """Stop dispatching tasks and cancel the running ones on their workers."""
+        self._cancelled.set()
+        with self._cond:
+            running = list(self._running.items())
+            self._cond.notify_all()
+        for task_id, worker in running:
+            try:
+                worker.cancel_task(task_id)
+            except WorkerLost:
+                pass
+
+
+class DistributedPassService:
+    """
+    Drop-in replacement for LLVMPassService that runs the passes on remote
+    workers, either on the whole module or on its llvm-split partitions.
+    """
+
+    def __init__(
+        self,
+        workers: List[Any],
+        shards: Optional[int] = None,
+        work_dir: Optional[str] = None,
+        max_retries: int = 2,
+        llvm_split_path: str = "llvm-split",
+        llvm_link_path: str = "llvm-link",
+        llvm_nm_path: str = "llvm-nm",
+        history_size: int = 32,
+    ):
+        """
+        :param workers: The workers to use.
+        :param shards: Number of partitions. None or 1 sends the whole module; 0 uses one per worker slot.
+        :param work_dir: Working directory of llvm-split and llvm-link.
+        :param max_retries: How many times a task is moved to another worker after losing one.
+        """
+        self.coordinator = Coordinator(workers, max_retries=max_retries)
+        self.shards = shards
+        self.work_dir = work_dir
+        self.llvm_split_path = llvm_split_path
+        self.llvm_link_path = llvm_link_path
+        self.llvm_nm_path = llvm_nm_path
+        self.history: Deque[RunResult] = deque(maxlen=history_size)
+
+    def cancel(self):
+        self.coordinator.cancel()
+
+    @property
+    def cancelled(self) -> bool:
+        return self.coordinator.cancelled
+
+    def apply_json_conf(
+        self,
+        config: Dict[str, Any],
+        input_file: str,
+        output_file: str,
+        on_progress: Optional[ProgressCallback] = None,
+    ) -> RunResult:
+        """Run the passes on the workers and return the (merged) RunResult."""
+        compile_config(config, fused=True)  # reject an invalid config before sending anything
+        self.coordinator.check_health()
+        shards = self.coordinator.total_slots if self.shards == 0 else (self.shards or 1)
+        started_at = time.time()
+
+        if shards <= 1:
+            return self._run_whole(config, input_file, output_file, on_progress)
+
+        splitter = ShardedPassService(
+            shards=shards, work_dir=self.work_dir, llvm_split_path=self.llvm_split_path,
+            llvm_link_path=self.llvm_link_path, llvm_nm_path=self.llvm_nm_path,
+        )
+        with tempfile.TemporaryDirectory(prefix="llvm-shards-") as tmp_dir:
+            shard_files = splitter.split(input_file, tmp_dir)
+            # Partitions without functions are not worth a remote task; they are linked as they are.
+            work = [(index, f) for index, f in enumerate(shard_files) if splitter.has_functions(f)]
+            if not work:
+                return self._run_whole(config, input_file, output_file, on_progress)
+            tasks = [
+                RemoteTask(f"shard{index}", shard_file, shard_config(config, index), f"{shard_file}_obf.bc")
+                for index, shard_file in work
+            ]
+
+            def shard_progress(event):
+                if on_progress is not None:
+                    on_progress({**event, "shard": work[event["index"]][0], "shards": len(shard_files)})
+
+            results = self.coordinator.run(tasks, shard_progress)
+            parts = [self._task_result(task, remote) for task, remote in zip(tasks, results)]
+            obfuscated = {task.input_file: task.output_file for task in tasks}
+            splitter.link([obfuscated.get(f, f) for f in shard_files], output_file)
+        result = RunResult.combine(parts, input_file, output_file, started_at, shards=[i for i, _ in work])
+        self.history.append(result)
+        return result
+
+    def _run_whole(
+        self, config: Dict[str, Any], input_file: str, output_file: str, on_progress: Optional[ProgressCallback]
+    ) -> RunResult:
+        """Run the whole module as one task."""
+        task = RemoteTask(Path(input_file).stem, input_file, config, output_file)
+        result = self._task_result(task, self.coordinator.run([task], on_progress)[0])
+        self.history.append(result)
+        return result
+
+    def _task_result(self, task: RemoteTask, remote: Dict[str, Any]) -> RunResult:
+        """RunResult of a task from the dict a worker returned."""
+        stats_store = StatsStore()
+        for _, stage, cycle, debug_type, metric, value in remote["records"]:
+            stats_store.add(task.label, stage, cycle, {debug_type: {metric: value}})
+        return RunResult.create(
+            run_id=remote["run_id"],
+            input_file=task.input_file,
+            output_file=task.output_file,
+            status=remote["status"],
+            stats=remote["stats"],
+            resource_usage=[{**usage, "worker": remote["worker"]} for usage in remote["resource_usage"]],
+            started_at=remote["started_at"],
+            finished_at=remote["finished_at"],
+            error=remote["error"],
+            stats_store=stats_store,
+        )
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 4:
+        print(__doc__)
+        sys.exit(1)
+    with open(sys.argv[2], "r", encoding="utf-8") as f:
+        distributed_conf = json.load(f)
+    shards_env = os.getenv("SHARDS")
+    distributed = DistributedPassService(
+        [HTTPWorker(url) for url in sys.argv[3:]], shards=int(shards_env) if shards_env else None
+    )
+    input_path = Path(sys.argv[1])
+    result = distributed.apply_json_conf(
+        distributed_conf, str(input_path), str(input_path.with_name(f"{input_path.stem}_obf.bc"))
+    )
+    print(json.dumps(result.to_dict()["stats"], indent=4))
@@ -0,0 +1,375 @@
+"""
+job_service.py
+
+Queue of obfuscation jobs executed on a bounded worker pool.
+
+Each job owns a working directory holding the uploaded source, the frontend
+.bc and the obfuscated .bc. Progress events from LLVMPassService are kept on
+the job so clients can follow a run while it is executing; only the most
+recent `MAX_EVENTS` are kept. Finished jobs are forgotten, and their
+directories removed, once they are older than the retention time or
+outnumber the retention count.
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.core.plan import compile_config
+from src.services.artifact_cache import ArtifactCache
+from src.services.cost_model_service import CostModel, parse_budget, shared_cost_model
+from src.services.distributed_service import DistributedPassService
+from src.services.llvm_pass_service import LLVMPassService, ObfuscationCancelled
+from src.services.llvm_service import LLVMService
+from src.services.shard_service import ShardedPassService
+from src.services.scheduler_service import (
+    NORMAL,
+    ResourceLimits,
+    ResourceScheduler,
+    parse_priority,
+    shared_scheduler,
+)
+from src.services.size_analysis_service import SizeAnalyzer
+from src.utils.system import available_cores
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATES = {SUCCEEDED, FAILED, CANCELLED}
+SOURCE_SUFFIXES = {".c", ".cc", ".cpp", ".cxx"}
+MAX_EVENTS = 1000
+
+
+class JobQueueFull(RuntimeError):
+    pass
+
+
+class ObfuscationJob:
+    def __init__(self, job_id: str, source_path: Path, config: Dict[str, Any], priority: int = NORMAL):
+        self.id = job_id
+        self.source_path = source_path
+        self.config = config
+        self.priority = priority
+        self.state = QUEUED
+        self.error: Optional[str] = None
+        self.stats: Dict[str, dict] = {}
+        self.size_analysis: Optional[Dict[str, Any]] = None
+        self.estimate: Optional[Dict[str, Any]] = None
+        self.output_path: Optional[Path] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.events: List[Dict[str, Any]] = []
+        self.events_dropped = 0  # events trimmed from the front of `events`
+        self._events_lock = threading.Lock()
+        self.future: Optional[Future] = None
+        self.services: List[Any] = []
+        self.cancel_requested = False
+        self.timed_out = False  # set when the job ran past limits.job_s
+
+    @property
+    def stopping(self) -> bool:
+        return self.cancel_requested or self.timed_out
+
+    @property
+    def finished(self) -> bool:
+        return self.state in FINISHED_STATES
+
+    def add_event(self, event: Dict[str, Any]):
+        with self._events_lock:
+            self.events.append({"time": time.time(), **event})
+            if len(self.events) > MAX_EVENTS:
+                drop = len(self.events) - MAX_EVENTS
+                del self.events[:drop]
+                self.events_dropped += drop
+
+    def events_since(self, index: int) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Events from position `index` on (counting every event ever added) and
+        the position after them. Events already trimmed are skipped.
+        """
+        with self._events_lock:
+            start = max(index - self.events_dropped, 0)
+            return self.events[start:], self.events_dropped + len(self.events)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "state": self.state,
+            "error": self.error,
+            "source": self.source_path.name,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "has_result": self.output_path is not None,
+            "estimate": self.estimate,
+        }
+
+
+class JobManager:
+    """
+    Accepts obfuscation jobs and runs at most `max_workers` of them at once.
+    """
+
+    def __init__(
+        self,
+        clang_path: Optional[str] = None,
+        jobs_dir: str = os.path.join("artifacts", "jobs"),
+        max_workers: Optional[int] = None,
+        max_pending: int = 64,
+        cache: Optional[ArtifactCache] = None,
+        workers: Optional[List[Any]] = None,
+        in_memory: bool = False,
+        scheduler: Optional[ResourceScheduler] = None,
+        cost_model: Optional[CostModel] = None,
+        max_finished: int = 256,
+        retention_s: Optional[float] = 24 * 3600,
+    ):
+        """
+        :param clang_path: Path to clang executable. Defaults to CLANG_PATH or "clang".
+        :param jobs_dir: Directory receiving one working directory per job.
+        :param max_workers: Number of jobs running concurrently. Defaults to the CPU count.
+        :param max_pending: Maximum number of queued plus running jobs before submissions are rejected.
+        :param cache: Optional artifact cache shared by all jobs.
+        :param workers: Optional remote workers (see distributed_service). When given, passes run on them.
+        :param in_memory: Pipe the bitcode between pass stages instead of writing it to the job directory.
+        :param scheduler: Admits the pass processes of all jobs. Defaults to the process-wide scheduler.
+        :param cost_model: Learns from every run and predicts the cost of new ones. Defaults to the process-wide model.
+        :param max_finished: Finished jobs kept; the oldest ones beyond this are removed.
+        :param retention_s: Seconds a finished job is kept after it finished. None keeps them until max_finished.
+        """
+        self.clang_path = clang_path or os.getenv("CLANG_PATH") or "clang"
+        self.jobs_dir = Path(jobs_dir).resolve()  # passes run with the job directory as cwd
+        self.max_pending = max_pending
+        self.cache = cache
+        self.workers = workers or []
+        self.in_memory = in_memory
+        self.scheduler = scheduler or shared_scheduler()
+        self.cost_model = cost_model or shared_cost_model()
+        self.max_finished = max_finished
+        self.retention_s = retention_s
+        self.executor = ThreadPoolExecutor(max_workers=max_workers or available_cores())
+        self.jobs: Dict[str, ObfuscationJob] = {}
+        self._lock = threading.Lock()
+
+    def submit(
+        self, filename: str, source: bytes, config: Dict[str, Any], priority: Any = NORMAL
+    ) -> ObfuscationJob:
+        """
+        Store the uploaded source and queue a job for it.
+        :param priority: Priority class of the job's pass processes ("interactive", "normal" or "batch").
+        """
+        name = Path(filename).name
+        if Path(name).suffix.lower() not in SOURCE_SUFFIXES:
+            raise ValueError(f"Unsupported source file name: {filename!r}")
+        compile_config(config)  # raises ConfigError before anything is stored
+        priority = parse_priority(priority)
+        ResourceLimits.from_config(config)  # raises ValueError for invalid limits
+        parse_budget(config)  # and for an invalid budget
+
+        self.prune()
+        with self._lock:
+            pending = sum(1 for job in self.jobs.values() if not job.finished)
+            if pending >= self.max_pending:
+                raise JobQueueFull(f"Too many pending jobs ({pending}).")
+
+            job_id = uuid.uuid4().hex
+            job_dir = self.jobs_dir / job_id
+            job_dir.mkdir(parents=True, exist_ok=True)
+            source_path = job_dir / name
+            source_path.write_bytes(source)
+
+            job = ObfuscationJob(job_id, source_path, config, priority)
+            job.add_event({"event": "queued"})
+            self.jobs[job_id] = job
+            job.future = self.executor.submit(self._run, job)
+        return job
+
+    def estimate(self, filename: str, source: bytes, config: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Compile a source to bitcode and predict the cost of obfuscating it
+        with config, without queueing a job. Returns None without any history.
+        """
+        name = Path(filename).name
+        if Path(name).suffix.lower() not in SOURCE_SUFFIXES:
+            raise ValueError(f"Unsupported source file name: {filename!r}")
+        compile_config(config, fused=True)  # raises ConfigError before compiling
+        parse_budget(config)  # raises ValueError before compiling
+        self.jobs_dir.mkdir(parents=True, exist_ok=True)
+        with tempfile.TemporaryDirectory(dir=self.jobs_dir) as tmp:
+            source_path = Path(tmp) / name
+            source_path.write_bytes(source)
+            bytecode_path = source_path.with_suffix(".bc")
+            LLVMService(self.clang_path, cache=self.cache).compile_to_bytecode(
+                str(source_path), str(bytecode_path), config.get("compiler")
+            )
+            return self.cost_model.estimate(config, bytecode_path.stat().st_size)
+
+    def get(self, job_id: str) -> Optional[ObfuscationJob]:
+        return self.jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a queued or running job. Returns False if it already finished."""
+        job = self.jobs.get(job_id)
+        if job is None or job.finished:
+            return False
+        job.cancel_requested = True
+        if job.future is not None and job.future.cancel():
+            job.state = CANCELLED
+            job.finished_at = time.time()
+            job.add_event({"event": CANCELLED})
+            return True
+        for service in list(job.services):
+            service.cancel()
+        return True
+
+    def delete(self, job_id: str) -> bool:
+        """Forget a finished job and remove its working directory."""
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is None or not job.finished:
+                return False
+            del self.jobs[job_id]
+        shutil.rmtree(job.source_path.parent, ignore_errors=True)
+        return True
+
+    def prune(self):
+        """Remove finished jobs past the retention time, then the oldest beyond max_finished."""
+        now = time.time()
+        with self._lock:
+            finished = sorted(
+                (job for job in self.jobs.values() if job.finished), key=lambda job: job.finished_at or 0
+            )
+            expired = [
+                job for job in finished
+                if self.retention_s is not None and now - (job.finished_at or now) > self.retention_s
+            ]
+            kept = [job for job in finished if job not in expired]
+            expired.extend(kept[:max(len(kept) - self.max_finished, 0)])
+            for job in expired:
+                del self.jobs[job.id]
+        for job in expired:
+            shutil.rmtree(job.source_path.parent, ignore_errors=True)
+
+    def shutdown(self):
+        for job_id in list(self.jobs):
+            self.cancel(job_id)
+        self.executor.shutdown(wait=True)
+
+    def _run(self, job: ObfuscationJob):
+        if job.cancel_requested:
+            # Cancelled after the executor picked the job up, but before it started.
+            job.state = CANCELLED
+            job.finished_at = time.time()
+            job.add_event({"event": CANCELLED})
+            return
+        job.state = RUNNING
+        job.started_at = time.time()
+        job.add_event({"event": RUNNING})
+
+        job_s = ResourceLimits.from_config(job.config).job_s
+        timer = None
+        if job_s:
+            def expire():
+                job.timed_out = True
+                for service in list(job.services):
+                    service.cancel()
+
+            timer = threading.Timer(job_s, expire)
+            timer.daemon = True
+            timer.start()
+
+        try:
+            llvm_service = LLVMService(self.clang_path, cache=self.cache)
+            sharding = job.config.get("sharding") or {}
+            if self.workers:
+                llvm_pass_service = DistributedPassService(
+                    self.workers, work_dir=str(job.source_path.parent),
+                    shards=sharding.get("shards", 0) if sharding.get("enabled") else None,
+                )
+            else:
+                pass_options = dict(
+                    in_memory=self.in_memory,
+                    scheduler=self.scheduler,
+                    priority=job.priority,
+                    limits=ResourceLimits.from_config(job.config),
+                    cost_model=self.cost_model,
+                )
+                if sharding.get("enabled"):
+                    llvm_pass_service = ShardedPassService(
+                        self.clang_path, work_dir=str(job.source_path.parent),
+                        shards=sharding.get("shards"), fused=True, cache=self.cache, **pass_options,
+                    )
+                else:
+                    llvm_pass_service = LLVMPassService(
+                        self.clang_path, work_dir=str(job.source_path.parent), fused=True, cache=self.cache,
+                        **pass_options,
+                    )
+            job.services = [llvm_service, llvm_pass_service]
+
+            bytecode_path = job.source_path.with_suffix(".bc")
+            llvm_service.compile_to_bytecode(
+                str(job.source_path), str(bytecode_path), job.config.get("compiler")
+            )
+            if job.stopping:
+                raise ObfuscationCancelled("Obfuscation cancelled.")
+            job.add_event({"event": "compiled"})
+            if not self.workers and not sharding.get("enabled"):
+                job.estimate = self.cost_model.estimate(job.config, bytecode_path.stat().st_size)
+                if job.estimate is not None:
+                    job.add_event({"event": "estimate", "seconds": job.estimate["seconds"],
+                                   "output_bytes": job.estimate["output_bytes"],
+                                   "warnings": job.estimate["warnings"]})
+
+            def on_progress(event):
+                # Also catches a cancel or timeout that arrived before apply_json_conf started.
+                if job.stopping:
+                    raise ObfuscationCancelled("Obfuscation cancelled.")
+                job.add_event(event)
+
+            output_path = job.source_path.with_name(f"{job.source_path.stem}_obf.bc")
+            result = llvm_pass_service.apply_json_conf(
+                job.config, str(bytecode_path), str(output_path), on_progress=on_progress
+            )
+            if not result.success:
+                raise RuntimeError(result.error)
+            if not output_path.exists():
+                raise RuntimeError("No obfuscated output was produced.")
+
+            job.stats = result.stats
+            size_conf = job.config.get("size_analysis") or {}
+            if size_conf.get("enabled"):
+                job.add_event({"event": "analyzing"})
+                analyzer = SizeAnalyzer(os.getenv("LLVM_DIS_PATH", "llvm-dis"), self.cache)
+                try:
+                    job.size_analysis = analyzer.compare(
+                        str(bytecode_path), str(output_path), int(size_conf.get("top", 25))
+                    )
+                    job.stats = {**job.stats, "size-analysis": job.size_analysis["summary"]}
+                except RuntimeError as e:
+                    print(f"[WARN] Size analysis skipped for job {job.id}: {e}")
+            job.output_path = output_path
+            job.state = SUCCEEDED
+        except Exception as e:
+            if job.timed_out:
+                job.state = FAILED
+                job.error = f"The job exceeded its time limit of {job_s}s."
+            elif job.cancel_requested:
+                job.state = CANCELLED
+            else:
+                job.state = FAILED
+                job.error = str(e)
+        finally:
+            if timer is not None:
+                timer.cancel()
+            job.services = []
+            job.finished_at = time.time()
+            job.add_event({"event": job.state, "error": job.error})
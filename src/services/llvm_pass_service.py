@@ -7,18 +7,102 @@ Usage:
 or import LLVMPassService from this file and call apply_passes_from_json()
 
 The script:
-- Builds -mllvm -passes=... and per-pass -mllvm flags from JSON config
+- Compiles the JSON config into a validated execution plan (src.core.plan)
+  holding the -mllvm -passes=... and per-pass flags of every stage
 - Runs clang again to apply passes and produce an obfuscated .bc output
+- In fused mode, folds all enabled passes and their cycles into as few
+  clang invocations as possible (one, unless pass options conflict)
+- With an ArtifactCache, every stage output is cached by content hash so
+  unchanged leading stages are restored instead of re-run
+- Requests LLVM's machine-readable -stats-json report for every run and
+  records it in a StatsStore (one record per stage, cycle and metric)
+- With backend="opt", applies the passes with opt (optionally loading a
+  pass plugin) directly on the bitcode, skipping clang driver startup; the
+  clang driver stays as the fallback
+- Records wall time, user/system CPU time and peak RSS of every pass
+  subprocess (via wait4), optionally with LLVM's -time-passes breakdown
+- With in_memory=True, streams the bitcode between stages through pipes
+  (-o - into stdin) so only the final output touches the disk; the
+  intermediates can still be kept in a directory for debugging
+- With a ResourceScheduler, every pass process waits for a free slot and
+  memory reservation by priority class; with ResourceLimits it runs under
+  address-space and CPU-time rlimits, is killed after its wall-clock
+  timeout and is reported when it exceeds any of them
+- Records the input/output size of every stage and, with a CostModel,
+  feeds executed stages to it so later runs can be estimated
+- Reports per-stage progress through an optional callback and can be
+  cancelled from another thread, killing the running clang process
+- Returns an immutable RunResult per apply_json_conf call and keeps the
+  last `history_size` of them in a ring buffer, so one instance can serve
+  many (also concurrent) runs without mixing their stats or growing
 """
 
 import json
+import os
+import re
 import shutil
+import signal
 import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import deque
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Callable, Deque, Dict, List, Optional, Set, Tuple, Union
 
+from src.core.plan import ExecutionPlan, compile_config
+from src.core.result import CANCELLED, FAILED, SUCCEEDED, RunResult
+from src.services.artifact_cache import ArtifactCache, get_tool_version, hash_bytes, hash_file
+from src.services.cost_model_service import CostModel
 from src.services.llvm_service import LLVMService
-from src.utils.stats_parser import parse_llvm_stats
+from src.services.scheduler_service import NORMAL, ResourceLimits, ResourceScheduler
+from src.utils.stats_parser import (
+    merge_stats,
+    parse_llvm_stats,
+    parse_llvm_stats_json,
+    parse_llvm_time_passes_json,
+)
+from src.utils.stats_store import StatsStore
+
+
+BACKENDS = ("clang", "opt")
+
+# stderr markers meaning opt does not know the obfuscation passes or their options.
+_OPT_UNSUPPORTED_MARKERS = ("unknown pass name", "Unknown command line argument")
+
+# Called with a dict describing each stage as it starts and finishes, and with
+# every line the stage writes to stderr ("stage_output") as it is written.
+ProgressCallback = Callable[[Dict[str, Any]], None]
+
+
+class ObfuscationCancelled(RuntimeError):
+    pass
+
+
+def kill_process_group(proc):
+    """Kill a subprocess (Popen or asyncio) and every child it spawned."""
+    if proc.returncode is not None:
+        return
+    try:
+        if os.name == "posix":
+            os.killpg(proc.pid, signal.SIGKILL)
+        else:
+            proc.kill()
+    except ProcessLookupError:
+        pass
+
+
+class _ActiveRun:
+    """Cancellation state and running processes of one apply_json_conf call."""
+
+    def __init__(self, run_id: str):
+        self.run_id = run_id
+        self.cancelled = threading.Event()
+        self.procs: Set[subprocess.Popen] = set()
+        # Called with every stderr line of the running stage, as it is written.
+        self.on_output: Optional[Callable[[str], None]] = None
 
 
 class LLVMPassService:
@@ -26,95 +110,586 @@ class LLVMPassService:
         self,
         clang_path: str = "clang",
         work_dir: Optional[str] = None,
+        fused: bool = False,
+        cache: Optional[ArtifactCache] = None,
+        backend: str = "clang",
+        opt_path: str = "opt",
+        pass_plugin: Optional[str] = None,
+        time_passes: bool = False,
+        history_size: int = 32,
+        in_memory: bool = False,
+        keep_intermediates: Optional[str] = None,
+        scheduler: Optional[ResourceScheduler] = None,
+        priority: int = NORMAL,
+        limits: Optional[ResourceLimits] = None,
+        cost_model: Optional[CostModel] = None,
     ):
+        """
+        :param in_memory: Stream the bitcode between stages through pipes; only the final
+                          output is written to disk.
+        :param keep_intermediates: Directory receiving a copy of every intermediate stage
+                                   output, for debugging.
+        :param scheduler: Admits every pass process by free slots and memory budget.
+        :param priority: Priority class (scheduler_service.INTERACTIVE, NORMAL or BATCH).
+        :param limits: Memory, CPU time and wall-clock limits of every pass process.
+        :param cost_model: Learns from the size and time of every executed stage.
+        """
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown pass backend '{backend}', expected one of {BACKENDS}.")
         self.clang = shutil.which(clang_path) or clang_path
+        self.opt = shutil.which(opt_path) or opt_path
+        self.pass_plugin = pass_plugin
+        self.backend = backend
         self.work_dir = Path(work_dir) if work_dir else Path.cwd()
-        self.stats = {}
+        self.fused = fused
+        self.cache = cache
+        self.time_passes = time_passes
+        self.in_memory = in_memory
+        self.keep_intermediates = keep_intermediates
+        self.scheduler = scheduler
+        self.priority = priority
+        self.limits = limits
+        self.cost_model = cost_model
+        # Results of the most recent runs, oldest first.
+        self.history: Deque[RunResult] = deque(maxlen=history_size)
+        self._runs: Dict[str, _ActiveRun] = {}
+        # One run per run_command call made outside apply_json_conf.
+        self._adhoc: Set[_ActiveRun] = set()
+        self._local = threading.local()
+        self._proc_lock = threading.Lock()
         if not shutil.which(self.clang):
             print(
                 f"[WARN] clang binary '{clang_path}' not found in PATH. Will try to run '{self.clang}' anyway."
             )
+        if backend == "opt" and not shutil.which(self.opt):
+            print(f"[WARN] opt binary '{opt_path}' not found in PATH. Falling back to the clang driver.")
+            self.backend = "clang"
+
+    def cancel(self, run_id: Optional[str] = None):
+        """
+        Stop a running apply_json_conf call, or every one (and every running
+        run_command) if run_id is None, from any thread. Their clang processes
+        are killed; the calls then raise ObfuscationCancelled.
+        """
+        with self._proc_lock:
+            if run_id is None:
+                runs = [*self._adhoc, *self._runs.values()]
+            else:
+                runs = [self._runs[run_id]] if run_id in self._runs else []
+            procs = []
+            for run in runs:
+                run.cancelled.set()
+                procs.extend(run.procs)
+        for proc in procs:
+            kill_process_group(proc)
+
+    @property
+    def cancelled(self) -> bool:
+        """Whether the apply_json_conf run of the calling thread was cancelled."""
+        run = getattr(self._local, "run", None)
+        return run is not None and run.cancelled.is_set()
+
+    @property
+    def active_runs(self) -> List[str]:
+        with self._proc_lock:
+            return list(self._runs)
+
+    @property
+    def last_result(self) -> Optional[RunResult]:
+        return self.history[-1] if self.history else None
 
     def _load_json_config(self, json_path: str) -> dict:
         with open(json_path, "r", encoding="utf-8") as f:
             data = json.load(f)
         return data
 
-    def _run_cmd(self, params: List[str]) -> Tuple[bool, str, str]:
+    def run_command(
+        self, params: List[str], input_data: Optional[bytes] = None, binary_stdout: bool = False
+    ) -> Tuple[bool, Union[str, bytes], str, Dict[str, Any]]:
+        """
+        Run a command with the process handling of the pass stages (scheduler,
+        limits, process-group kill) and return (success, stdout, stderr, usage),
+        usage holding its wall time, CPU time and peak RSS. Outside
+        apply_json_conf every call is a run of its own, stopped by cancel().
+        """
+        if getattr(self._local, "run", None) is not None:
+            return self._run_cmd_with_usage(params, input_data, binary_stdout)
+        run = _ActiveRun("")
+        with self._proc_lock:
+            self._adhoc.add(run)
+        self._local.run = run
+        try:
+            return self._run_cmd_with_usage(params, input_data, binary_stdout)
+        finally:
+            self._local.run = None
+            with self._proc_lock:
+                self._adhoc.discard(run)
+
+    def _wait_with_usage(self, proc: subprocess.Popen) -> Optional[Dict[str, float]]:
+        """Reap proc with wait4 and return its CPU time and peak RSS, or None if unavailable."""
+        if not hasattr(os, "wait4"):
+            proc.wait()
+            return None
+        try:
+            _, status, rusage = os.wait4(proc.pid, 0)
+        except ChildProcessError:
+            proc.wait()  # already reaped elsewhere
+            return None
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        # ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+        max_rss_kb = rusage.ru_maxrss // 1024 if sys.platform == "darwin" else rusage.ru_maxrss
+        return {"user_s": rusage.ru_utime, "sys_s": rusage.ru_stime, "max_rss_kb": max_rss_kb}
+
+    def _run_cmd_with_usage(
+        self, params: List[str], input_data: Optional[bytes] = None, binary_stdout: bool = False
+    ) -> Tuple[bool, Union[str, bytes], str, Dict[str, Any]]:
+        """
+        See run_command; must be called within a run.
+        :param input_data: Bytes fed to the process on stdin.
+        :param binary_stdout: Return stdout as raw bytes (e.g. bitcode written with -o -).
+        """
+        started = time.monotonic()
+        run = self._local.run
+        text = input_data is None and not binary_stdout
+        empty = b"" if binary_stdout else ""
+        reservation = 0
+        if self.scheduler is not None:
+            reservation = self.scheduler.reservation(self.limits)
+            if not self.scheduler.acquire(self.priority, reservation, run.cancelled):
+                return False, empty, "cancelled", {"wall_s": time.monotonic() - started}
+        queued_s = time.monotonic() - started
         try:
             print("[CMD]", " ".join(params))
 
-            result = subprocess.run(
-                params,
-                cwd=self.work_dir,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                check=False,
-            )
+            with self._proc_lock:
+                if run.cancelled.is_set():
+                    return False, empty, "cancelled", {"wall_s": 0.0}
+                proc = subprocess.Popen(
+                    ResourceLimits.command(params, self.priority),
+                    cwd=self.work_dir,
+                    stdin=subprocess.PIPE if input_data is not None else None,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    text=text,
+                    start_new_session=(os.name == "posix"),
+                )
+                run.procs.add(proc)
+            timed_out = threading.Event()
+            timer = None
+            if self.limits is not None and self.limits.wall_s:
+                def expire():
+                    timed_out.set()
+                    kill_process_group(proc)
+
+                timer = threading.Timer(self.limits.wall_s, expire)
+                timer.daemon = True
+                timer.start()
+            try:
+                if self.limits is not None:
+                    self.limits.apply(proc.pid)
+                # Drain both pipes ourselves so the child can be reaped with wait4.
+                # stdout may be bitcode and is read whole; stderr is passed on line by line.
+                output = {}
+                threads = [
+                    threading.Thread(target=lambda: output.__setitem__("stdout", proc.stdout.read())),
+                    threading.Thread(
+                        target=self._read_stderr, args=(proc.stderr, "" if text else b"", run.on_output, output)
+                    ),
+                ]
+                if input_data is not None:
+                    threads.append(threading.Thread(target=self._feed_stdin, args=(proc.stdin, input_data)))
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+                proc.stdout.close()
+                proc.stderr.close()
+                usage = self._wait_with_usage(proc) or {}
+            finally:
+                if timer is not None:
+                    timer.cancel()
+                if proc.returncode is None:
+                    # Failed before the child was reaped (e.g. prlimit raised); do not leave it running.
+                    kill_process_group(proc)
+                    proc.wait()
+                with self._proc_lock:
+                    run.procs.discard(proc)
 
-            return result.returncode == 0, result.stdout.strip(), result.stderr.strip()
+            usage["wall_s"] = time.monotonic() - started - queued_s
+            if self.scheduler is not None:
+                usage["queued_s"] = queued_s
+            stdout, stderr = output["stdout"], output["stderr"]
+            if not text:
+                stderr = stderr.decode(errors="replace")
+                if not binary_stdout:
+                    stdout = stdout.decode(errors="replace").strip()
+            else:
+                stdout = stdout.strip()
+            if timed_out.is_set():
+                usage["limit_exceeded"] = f"wall-clock limit of {self.limits.wall_s}s"
+            elif self.limits is not None:
+                exceeded = self.limits.exceeded(proc.returncode, stderr, usage)
+                if exceeded:
+                    usage["limit_exceeded"] = exceeded
+            return proc.returncode == 0, stdout, stderr.strip(), usage
 
         except Exception as e:
             print(f"[ERROR] Failed to execute command: {e}")
+            return False, empty, str(e), {"wall_s": time.monotonic() - started}
+        finally:
+            if self.scheduler is not None:
+                self.scheduler.release(reservation)
+
+    @staticmethod
+    def _read_stderr(
+        stream, empty: Union[str, bytes], on_output: Optional[Callable[[str], None]], output: Dict[str, Any]
+    ):
+        """Read stderr line by line into output["stderr"], handing every line to on_output."""
+        lines = []
+        for line in stream:
+            lines.append(line)
+            if on_output is None:
+                continue
+            try:
+                on_output((line if isinstance(line, str) else line.decode(errors="replace")).rstrip("\r\n"))
+            except Exception as e:
+                # Keep draining the pipe, or the process blocks on a full one.
+                if not isinstance(e, ObfuscationCancelled):
+                    print(f"[WARN] Progress callback failed: {e}")
+                on_output = None
+        output["stderr"] = empty.join(lines)
+
+    @staticmethod
+    def _feed_stdin(stdin, data: bytes):
+        try:
+            stdin.write(data)
+        except (BrokenPipeError, OSError):
+            pass  # the process exited (or was killed) without reading everything
+        finally:
+            try:
+                stdin.close()
+            except OSError:
+                pass
+
+    def _build_stage_cmd(
+        self,
+        tags: List[str],
+        input_file: str,
+        output_file: str,
+        stats_file: Optional[str] = None,
+    ) -> List[str]:
+        # The stats file flags are kept out of `tags` so they never reach the cache key.
+        stats_tags = []
+        if stats_file:
+            stats_tags = ["-mllvm", "-stats-json", "-mllvm", f"-info-output-file={stats_file}"]
+            if self.time_passes:
+                stats_tags.extend(["-mllvm", "-time-passes"])
+
+        # "-" reads the input from stdin or writes the output to stdout.
+        if self.backend == "opt":
+            # opt takes the same LLVM options directly, without the -mllvm wrapper.
+            cmd = [self.opt]
+            if self.pass_plugin:
+                cmd.append(f"-load-pass-plugin={self.pass_plugin}")
+            cmd.extend(t for t in [*tags, *stats_tags] if t != "-mllvm")
+            cmd.extend([input_file, "-o", output_file])
+            return cmd
+
+        return [
+            self.clang,
+            "-c",
+            "-emit-llvm",
+            *tags,
+            *stats_tags,
+            # clang cannot guess the language of stdin; "ir" also accepts bitcode.
+            *(["-x", "ir"] if input_file == "-" else []),
+            input_file,
+            "-o",
+            output_file,
+        ]
+
+    def new_stats_file(self) -> str:
+        """Temporary file for a -stats-json report, read back with read_stats_report."""
+        fd, path = tempfile.mkstemp(prefix="llvm-stats-", suffix=".json")
+        os.close(fd)
+        return path
+
+    def read_stats_report(
+        self, stats_file: str, stderr: str
+    ) -> Tuple[Dict[str, dict], Dict[str, dict]]:
+        """
+        Parse the -stats-json report of a finished run and remove the file.
+        Returns (stats, time_passes), keyed by LLVM's statistic names. Tools
+        that do not write the JSON report still print the textual -stats
+        report to stderr; its metrics are then keyed by their descriptions.
+        """
+        try:
+            with open(stats_file, "r", encoding="utf-8") as f:
+                text = f.read()
+            os.unlink(stats_file)
+        except OSError:
+            text = ""
+        if text.strip():
+            try:
+                return parse_llvm_stats_json(text), parse_llvm_time_passes_json(text)
+            except json.JSONDecodeError as e:
+                print(f"[WARN] Could not parse -stats-json output: {e}")
+        return parse_llvm_stats(stderr), {}
+
+    @staticmethod
+    def _cached_stats(meta: Optional[dict]) -> Optional[Dict[str, dict]]:
+        """Stats of a cache hit, or None for an entry stored without a -stats-json report."""
+        if meta is None or "stats" not in meta:
+            return None
+        return meta["stats"]
+
+    def _fall_back_to_clang(self, stderr: str) -> bool:
+        """
+        Switch this service to the clang driver if opt failed because it does
+        not provide the passes, so later stages do not fail with opt first.
+        Returns True if the failed stage should be retried; the retry looks
+        up the cache again, under the clang key.
+        """
+        if self.backend != "opt" or not any(marker in stderr for marker in _OPT_UNSUPPORTED_MARKERS):
             return False
+        print("[WARN] opt does not provide these passes. Using the clang driver from now on.")
+        self.backend = "clang"
+        return True
+
+    def _stage_cache_key(self, tags: List[str], input_digest: str) -> str:
+        if self.backend == "opt":
+            tool_version = f"{get_tool_version(self.opt)}|opt|{self.pass_plugin or ''}"
+        else:
+            tool_version = get_tool_version(self.clang)
+        return self.cache.make_key(input_digest, tags, tool_version=tool_version)
+
+    def _lookup_stage(
+        self, tags: List[str], input_file: str, output_file: str
+    ) -> Tuple[Optional[str], Optional[dict]]:
+        """
+        Return (cache_key, meta) for a stage. meta is not None on a cache hit,
+        in which case the cached artifact has been restored to output_file.
+        """
+        if self.cache is None:
+            return None, None
+        cache_key = self._stage_cache_key(tags, hash_file(input_file))
+        meta = self.cache.get(cache_key, output_file)
+        # Entries from before -stats-json hold only stderr; re-run those so stats keep one naming scheme.
+        return cache_key, meta if self._cached_stats(meta) is not None else None
+
+    def _run_stage(
+        self, tags: List[str], input_file: str, output_file: str
+    ) -> Tuple[bool, str, Dict[str, dict], Dict[str, Any]]:
+        """
+        Run one clang invocation applying `tags` to input_file and return
+        (success, stderr, stats, usage). When a cache is configured, a previous
+        result for the same input bytes, flags and clang version is restored
+        instead.
+        """
+        started = time.monotonic()
+        cache_key, meta = self._lookup_stage(tags, input_file, output_file)
+        if meta is not None:
+            return True, "", meta["stats"], {"wall_s": time.monotonic() - started, "cached": True}
+
+        stats_file = self.new_stats_file()
+        success, stdout, stderr, usage = self._run_cmd_with_usage(
+            self._build_stage_cmd(tags, input_file, output_file, stats_file)
+        )
+        if not success and self._fall_back_to_clang(stderr):
+            self.read_stats_report(stats_file, "")  # removes the file
+            return self._run_stage(tags, input_file, output_file)
+        run_stats, time_passes = self.read_stats_report(stats_file, stderr)
+        if time_passes:
+            usage["time_passes"] = time_passes
+
+        if success and cache_key is not None:
+            self.cache.put(cache_key, output_file, {"stats": run_stats})
+        return success, stderr, run_stats, usage
+
+    def _run_piped_stage(
+        self, tags: List[str], source: Union[str, bytes], output_file: Optional[str]
+    ) -> Tuple[bool, str, Dict[str, dict], Dict[str, Any], Optional[bytes]]:
+        """
+        In-memory variant of _run_stage. `source` is the input file path or
+        the bitcode of the previous stage, which is piped to stdin. With
+        output_file None the result is read back from stdout and returned as
+        the last element instead of being written anywhere.
+        """
+        started = time.monotonic()
+        input_data = source if isinstance(source, bytes) else None
+        cache_key = None
+        if self.cache is not None:
+            digest = hash_bytes(input_data) if input_data is not None else hash_file(source)
+            cache_key = self._stage_cache_key(tags, digest)
+            if output_file is None:
+                hit = self.cache.get_bytes(cache_key)
+                data, meta = hit if hit is not None else (None, None)
+            else:
+                data, meta = None, self.cache.get(cache_key, output_file)
+            if self._cached_stats(meta) is not None:
+                usage = {"wall_s": time.monotonic() - started, "cached": True, "piped": True}
+                return True, "", meta["stats"], usage, data
 
-    def _build_mllvm_tags(self, pass_name: str, params: Dict[str, Any]) -> List[str]:
-        tags = ["-mllvm", f"-passes={pass_name}"]
-        if params:
-            for key, value in params.items():
-                if key != "cycles":
-                    if pass_name in ["mba", "bcf"]:
-                        tags.extend(["-mllvm", f"-{key}={value}"])
-                    else:
-                        tags.extend(["-mllvm", f"-{pass_name}-{key}={value}"])
-        tags.extend(["-mllvm", "-stats"])
-        return tags
+        stage_input = "-" if input_data is not None else source
+        stage_output = output_file or "-"
+        stats_file = self.new_stats_file()
+        success, stdout, stderr, usage = self._run_cmd_with_usage(
+            self._build_stage_cmd(tags, stage_input, stage_output, stats_file),
+            input_data=input_data,
+            binary_stdout=True,
+        )
+        if not success and self._fall_back_to_clang(stderr):
+            self.read_stats_report(stats_file, "")  # removes the file
+            return self._run_piped_stage(tags, source, output_file)
+        run_stats, time_passes = self.read_stats_report(stats_file, stderr)
+        usage["piped"] = True
+        if time_passes:
+            usage["time_passes"] = time_passes
+
+        data = stdout if output_file is None else None
+        if success and output_file is None and not data:
+            success, stderr = False, f"{stderr}\nThe stage wrote no bitcode to stdout.".strip()
+        if success and cache_key is not None:
+            if data is not None:
+                self.cache.put_bytes(cache_key, data, {"stats": run_stats})
+            else:
+                self.cache.put(cache_key, output_file, {"stats": run_stats})
+        return success, stderr, run_stats, usage, data
+
+    def _keep_intermediate(self, unit: str, index: int, label: str, source: Union[str, bytes]):
+        """Copy the output of stage `index` to keep_intermediates for debugging."""
+        name = re.sub(r"[^\w.-]+", "_", label)
+        path = Path(self.keep_intermediates, f"{unit}.{index + 1:02d}.{name}.bc")
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            if isinstance(source, bytes):
+                path.write_bytes(source)
+            else:
+                shutil.copyfile(source, path)
+        except OSError as e:
+            print(f"[WARN] Could not keep intermediate {path}: {e}")
+
+    def _plan_stages(self, config: Union[Dict[str, Any], ExecutionPlan]) -> ExecutionPlan:
+        """
+        Return the execution plan of a config or precompiled plan: one stage
+        per pass and cycle, or the fused stages when fused mode is on.
+        Raises ConfigError before anything runs if the config is invalid.
+        """
+        plan = compile_config(config, fused=self.fused)
+        if plan.fused != self.fused:
+            raise ValueError("The execution plan was compiled for a different fused mode.")
+        return plan
+
+    def _record(self, result: RunResult) -> RunResult:
+        self.history.append(result)
+        return result
 
     def apply_json_conf(
-        self, config: Dict[str, Any], input_file: str, output_file: str
-    ):
-        passes = config.get("passes", [])
+        self,
+        config: Union[Dict[str, Any], ExecutionPlan],
+        input_file: str,
+        output_file: str,
+        on_progress: Optional[ProgressCallback] = None,
+    ) -> RunResult:
+        """
+        Apply the passes of a config or precompiled plan to input_file.
+        Returns this run's RunResult, whose status is FAILED if a pass failed.
+        Raises ObfuscationCancelled when cancelled and ConfigError for an
+        invalid config; the result is recorded in the history either way.
+        """
+        run = _ActiveRun(uuid.uuid4().hex)
+        with self._proc_lock:
+            self._runs[run.run_id] = run
+        self._local.run = run
 
-        for obfpass in passes:
-            if not obfpass.get("enabled"):
-                continue
+        original_input = input_file
+        started_at = time.time()
+        stats: Dict[str, dict] = {}
+        stats_store = StatsStore()
+        # One entry per stage run: wall/CPU time, peak RSS and optional -time-passes breakdown.
+        resource_usage: List[Dict[str, Any]] = []
+        status, error = SUCCEEDED, None
+        try:
+            stages = self._plan_stages(config).stages
+            unit = Path(input_file).stem
+            # Input of the next stage: a file path, or bitcode held in memory.
+            source: Union[str, bytes] = input_file
+            cycles: Dict[str, int] = {}
+            for index, stage in enumerate(stages):
+                label, tags = stage.label, list(stage.args)
+                if run.cancelled.is_set():
+                    raise ObfuscationCancelled("Obfuscation cancelled.")
+
+                cycles[label] = cycles.get(label, 0) + 1
+                event = {"stage": label, "cycle": cycles[label], "index": index, "total": len(stages)}
+                if on_progress is not None:
+                    on_progress({"event": "stage_started", "run_id": run.run_id, **event})
+                    run.on_output = lambda line, e=event: on_progress(
+                        {"event": "stage_output", "run_id": run.run_id, **e, "line": line}
+                    )
+
+                started = time.monotonic()
+                input_bytes = len(source) if isinstance(source, bytes) else os.path.getsize(source)
+                if self.in_memory:
+                    stage_output = output_file if index == len(stages) - 1 else None
+                    success, stderr, run_stats, usage, data = self._run_piped_stage(tags, source, stage_output)
+                else:
+                    success, stderr, run_stats, usage = self._run_stage(tags, source, output_file)
+                    data = None
 
-            pass_name = obfpass.get("name")
-            params = obfpass.get("params", {})
-
-            cycles = int(params.get("cycles", 1))
-
-            cmd = [
-                self.clang,
-                "-c",
-                "-emit-llvm",
-                *self._build_mllvm_tags(pass_name, params),
-                input_file,
-                "-o",
-                output_file,
-            ]
-
-            for _ in range(cycles):
-                success, stdout, stderr = self._run_cmd(cmd)
-
-                if stderr:
-                    run_stats = parse_llvm_stats(stderr)
-                    if not hasattr(self, "stats") or self.stats is None:
-                        self.stats = {}
-                    for key, metrics in run_stats.items():
-                        if key not in self.stats:
-                            self.stats[key] = {}
-                        for metric_name, value in metrics.items():
-                            if metric_name in self.stats[key]:
-                                self.stats[key][metric_name] += value
-                            else:
-                                self.stats[key][metric_name] = value
+                if run.cancelled.is_set():
+                    raise ObfuscationCancelled("Obfuscation cancelled.")
+                if on_progress is not None:
+                    on_progress({
+                        "event": "stage_finished",
+                        "run_id": run.run_id,
+                        **event,
+                        "success": success,
+                        "elapsed": time.monotonic() - started,
+                    })
+
+                if success:
+                    usage["input_bytes"] = input_bytes
+                    usage["output_bytes"] = len(data) if data is not None else os.path.getsize(output_file)
+                    if self.cost_model is not None and not usage.get("cached"):
+                        self.cost_model.observe(stage, input_bytes, usage["output_bytes"], usage["wall_s"])
+
+                stats_store.add(unit, label, cycles[label], run_stats)
+                merge_stats(stats, run_stats)
+                resource_usage.append({"stage": label, "cycle": cycles[label], "success": success, **usage})
 
                 if not success:
-                    print(f"[ERROR] Pass '{pass_name}' failed.")
+                    error = f"Pass '{label}' failed."
+                    if "limit_exceeded" in usage:
+                        error = f"Pass '{label}' was aborted: it exceeded its {usage['limit_exceeded']}."
+                    print(f"[ERROR] {error}")
+                    status = FAILED
                     break
-            input_file = output_file
+                source = data if data is not None else output_file
+                if self.keep_intermediates and index < len(stages) - 1:
+                    self._keep_intermediate(unit, index, label, source)
+        except ObfuscationCancelled as e:
+            status, error = CANCELLED, str(e)
+            raise
+        except Exception as e:
+            status, error = FAILED, str(e)
+            raise
+        finally:
+            self._local.run = None
+            with self._proc_lock:
+                self._runs.pop(run.run_id, None)
+            result = self._record(RunResult.create(
+                run_id=run.run_id,
+                input_file=original_input,
+                output_file=output_file,
+                status=status,
+                stats=stats,
+                resource_usage=resource_usage,
+                started_at=started_at,
+                error=error,
+                stats_store=stats_store,
+            ))
+        return result
 
     def apply_passes(
         self, input_file: str, json_file: str, output_file: Optional[str] = None
@@ -1,5 +1,45 @@
+import os
+import re
 import subprocess
+import tempfile
+import threading
 from pathlib import Path
+from typing import Dict, List, Optional
+
+from src.services.artifact_cache import ArtifactCache, get_tool_version, hash_file
+
+# Target triples of the "compiler" config choices; anything else builds for the host.
+TARGETS = {
+    "visual studio": "x86_64-pc-windows-msvc",
+    "mingw/gnu": "x86_64-w64-mingw32",
+}
+
+
+def parse_depfile(text: str) -> List[str]:
+    """
+    Return the prerequisites of a make-style depfile as written by -MD -MF:
+    the source followed by every header it included.
+    """
+    text = text.replace("\\\r\n", " ").replace("\\\n", " ")
+    parts = re.split(r":(?:[ \t]|$)", text, maxsplit=1)
+    if len(parts) < 2:
+        return []
+    deps = []
+    current = ""
+    chars = iter(parts[1])
+    for char in chars:
+        if char == "\\":
+            escaped = next(chars, "")
+            current += escaped if escaped in (" ", "#") else char + escaped
+        elif char.isspace():
+            if current:
+                deps.append(current)
+            current = ""
+        else:
+            current += char
+    if current:
+        deps.append(current)
+    return deps
 
 
 class LLVMService:
@@ -7,19 +47,39 @@ class LLVMService:
     Service for compiling C files to LLVM bytecode.
     """
 
-    def __init__(self, clang_path: str = "clang"):
+    def __init__(self, clang_path: str = "clang", cache: Optional[ArtifactCache] = None):
         """
         Initialize the service with the path to clang.
         :param clang_path: Path to clang executable. Default assumes it's in PATH.
+        :param cache: Optional artifact cache; when set, unchanged sources are not recompiled.
         """
         self.clang_path = clang_path
+        self.cache = cache
+        self._proc_lock = threading.Lock()
+        self._proc = None
+
+    def cancel(self):
+        """Kill a compile_to_bytecode call running in another thread."""
+        with self._proc_lock:
+            proc = self._proc
+        if proc is not None and proc.poll() is None:
+            proc.kill()
 
-    def compile_to_bytecode(self, c_file_path: str, output_bc_path: str = None, compiler: str = "visual studio") -> str:
+    def compile_to_bytecode(
+        self,
+        c_file_path: str,
+        output_bc_path: str = None,
+        compiler: str = "visual studio",
+        extra_flags: Optional[List[str]] = None,
+        cwd: Optional[str] = None,
+    ) -> str:
         """
         Compile a C file to LLVM bytecode (.bc).
         :param c_file_path: Path to the input C file.
         :param output_bc_path: Optional path for output .bc file. Defaults to same as input with .bc extension.
         :param compiler: The target compiler, e.g., "visual studio" or "mingw/gnu".
+        :param extra_flags: Additional frontend flags such as -I/-D taken from a compile database.
+        :param cwd: Directory to run clang in, so relative include paths resolve.
         :return: Path to the generated .bc file.
         """
         c_file = Path(c_file_path)
@@ -29,23 +89,85 @@ class LLVMService:
         if output_bc_path is None:
             output_bc_path = c_file.with_suffix(".bc")
 
-        cmd = [
-            self.clang_path,
+        flags = [
             "-c",
             "-emit-llvm",
         ]
 
-        if compiler == "visual studio":
-            cmd.append("--target=x86_64-pc-windows-msvc")
-        elif compiler == "mingw/gnu":
-            cmd.append("--target=x86_64-w64-mingw32")
+        target = TARGETS.get(compiler, "")
+        if target:
+            flags.append(f"--target={target}")
+        if extra_flags:
+            flags.extend(extra_flags)
 
-        cmd.extend([str(c_file), "-o", str(output_bc_path)])
-        try:
-            subprocess.run(cmd, check=True)
-        except subprocess.CalledProcessError as e:
-            raise RuntimeError(
-                f"Failed to compile {c_file_path} to bytecode. Error: {e}"
+        # The key covers the main source and the working directory include paths
+        # resolve against; the headers are only known after a compile, so their
+        # digests are stored with the entry and checked on a hit.
+        cache_key = None
+        depfile = None
+        workdir = Path(cwd or ".").resolve()
+        dep_flags = []
+        if self.cache is not None:
+            cache_key = self.cache.make_key(
+                hash_file(str(c_file)),
+                [c_file.suffix, str(workdir), *flags],
+                target,
+                get_tool_version(self.clang_path),
             )
+            if self._restore(cache_key, str(output_bc_path)):
+                return str(output_bc_path)
+            fd, depfile = tempfile.mkstemp(suffix=".d")
+            os.close(fd)
+            dep_flags = ["-MD", "-MF", depfile]
+
+        cmd = [self.clang_path, *flags, *dep_flags, str(c_file), "-o", str(output_bc_path)]
+        try:
+            with self._proc_lock:
+                self._proc = subprocess.Popen(cmd, cwd=cwd)
+            try:
+                returncode = self._proc.wait()
+            finally:
+                with self._proc_lock:
+                    self._proc = None
+            if returncode != 0:
+                error = subprocess.CalledProcessError(returncode, cmd)
+                raise RuntimeError(
+                    f"Failed to compile {c_file_path} to bytecode. Error: {error}"
+                )
+
+            if cache_key is not None:
+                deps = self._hash_deps(depfile, workdir)
+                if deps is not None:
+                    self.cache.put(cache_key, str(output_bc_path), {"deps": deps})
+        finally:
+            if depfile is not None:
+                os.unlink(depfile)
 
         return str(output_bc_path)
+
+    @staticmethod
+    def _hash_deps(depfile: str, workdir: Path) -> Optional[Dict[str, str]]:
+        """Digest of every file the compile read, or None if the depfile is unusable."""
+        try:
+            with open(depfile, "r", encoding="utf-8") as f:
+                paths = parse_depfile(f.read())
+            return {str(workdir / path): hash_file(str(workdir / path)) for path in paths} or None
+        except OSError as e:
+            print(f"[WARN] Not caching the frontend output, could not read its dependencies: {e}")
+            return None
+
+    def _restore(self, cache_key: str, output_bc_path: str) -> bool:
+        """Restore a cached compile if none of the files it read changed since."""
+        meta = self.cache.get(cache_key, output_bc_path)
+        if meta is None or not meta.get("deps"):
+            return False
+        for path, digest in meta["deps"].items():
+            try:
+                if hash_file(path) != digest:
+                    break
+            except OSError:
+                break
+        else:
+            return True
+        print(f"[CACHE] stale {cache_key[:12]}, a dependency changed")
+        return False
@@ -1,8 +1,10 @@
+import functools
 import json
 import os
 import subprocess
 import sys
 from tkinter import filedialog, messagebox
+from xml.sax.saxutils import escape
 
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import A4
@@ -17,6 +19,97 @@ from reportlab.platypus import (
     PageBreak,
 )
 
+# Rows per Table flowable. reportlab measures a whole table again every time
+# it splits it across a page, so long sections are emitted as several tables.
+MAX_TABLE_ROWS = 200
+
+# Flowables kept ahead of the layout engine while the story is generated.
+STORY_LOOKAHEAD = 16
+
+_HEADER_COLOR = colors.HexColor("#2E7AB7")
+_GRID_COLOR = colors.HexColor("#444444")
+
+# Table styles are shared by every table of a report instead of being rebuilt per section.
+SECTION_TABLE_STYLE = TableStyle(
+    [
+        ("BACKGROUND", (0, 0), (-1, 0), _HEADER_COLOR),  # header
+        ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
+        ("FONTNAME", (0, 0), (-1, -1), "Helvetica"),
+        ("FONTSIZE", (0, 0), (-1, -1), 9),
+        ("GRID", (0, 0), (-1, -1), 0.25, _GRID_COLOR),
+        ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
+        ("LEFTPADDING", (0, 0), (-1, -1), 6),
+        ("RIGHTPADDING", (0, 0), (-1, -1), 6),
+        ("BOTTOMPADDING", (0, 0), (-1, -1), 4),
+        ("TOPPADDING", (0, 0), (-1, -1), 4),
+    ]
+)
+PASSES_TABLE_STYLE = TableStyle(
+    [
+        ("BACKGROUND", (0, 0), (-1, 0), _HEADER_COLOR),
+        ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
+        ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+        ("FONTNAME", (0, 1), (-1, -1), "Helvetica"),
+        ("FONTSIZE", (0, 0), (-1, -1), 9),
+        ("GRID", (0, 0), (-1, -1), 0.25, _GRID_COLOR),
+        ("VALIGN", (0, 0), (-1, -1), "TOP"),
+        ("LEFTPADDING", (0, 0), (-1, -1), 6),
+        ("RIGHTPADDING", (0, 0), (-1, -1), 6),
+    ]
+)
+RESOURCE_TABLE_STYLE = TableStyle(
+    [
+        ("BACKGROUND", (0, 0), (-1, 0), _HEADER_COLOR),
+        ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
+        ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+        ("FONTNAME", (0, 1), (-1, -1), "Helvetica"),
+        ("FONTSIZE", (0, 0), (-1, -1), 9),
+        ("GRID", (0, 0), (-1, -1), 0.25, _GRID_COLOR),
+        ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
+        ("ALIGN", (1, 1), (-1, -1), "RIGHT"),
+    ]
+)
+
+
+@functools.lru_cache(maxsize=None)
+def _report_styles():
+    """Paragraph styles of the report, created once per process."""
+    base_styles = getSampleStyleSheet()
+    return {
+        "title": ParagraphStyle(
+            "title", parent=base_styles["h1"], fontName="Helvetica-Bold", fontSize=16, spaceAfter=8
+        ),
+        "heading": ParagraphStyle(
+            "heading", parent=base_styles["h2"], fontName="Helvetica-Bold", fontSize=12,
+            textColor=_HEADER_COLOR, spaceAfter=6,
+        ),
+        "normal": base_styles["BodyText"],
+        "code": ParagraphStyle(
+            "code", parent=base_styles["Normal"], fontName="Courier", fontSize=8, leading=10,
+        ),
+    }
+
+
+class _StreamingStory(list):
+    """
+    Story list that is filled from a generator while the document is built.
+    doc.build() consumes flowables from the front and checks len() before
+    each one, so only a few sections exist as flowables at any time.
+    """
+
+    def __init__(self, flowables, lookahead=STORY_LOOKAHEAD):
+        super().__init__()
+        self._source = iter(flowables)
+        self._lookahead = lookahead
+
+    def __len__(self):
+        while self._source is not None and super().__len__() < self._lookahead:
+            try:
+                self.append(next(self._source))
+            except StopIteration:
+                self._source = None
+        return super().__len__()
+
 
 def _format_value(v):
     """Format basic types for printable PDF cells."""
@@ -31,173 +124,256 @@ def _format_value(v):
     return str(v)
 
 
-def _add_section_table(story, title, data_dict, styles):
-    """Add a section header and a two-column table for data_dict to the story."""
-
-    story.append(Paragraph(title.replace("_", " ").title(), styles["heading"]))
-    story.append(Spacer(1, 4))
-
-    table_data = [["Metric", "Value"]]
-    for k, v in data_dict.items():
-        table_data.append([str(k), _format_value(v)])
-
-    col_widths = [90 * mm, 90 * mm]
-    tbl = Table(table_data, colWidths=col_widths, hAlign="LEFT")
-    tbl_style = TableStyle(
-        [
-            ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#2E7AB7")),  # header
-            ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
-            ("FONTNAME", (0, 0), (-1, -1), "Helvetica"),
-            ("FONTSIZE", (0, 0), (-1, -1), 9),
-            ("GRID", (0, 0), (-1, -1), 0.25, colors.HexColor("#444444")),
-            ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
-            ("LEFTPADDING", (0, 0), (-1, -1), 6),
-            ("RIGHTPADDING", (0, 0), (-1, -1), 6),
-            ("BOTTOMPADDING", (0, 0), (-1, -1), 4),
-            ("TOPPADDING", (0, 0), (-1, -1), 4),
-        ]
-    )
-    tbl.setStyle(tbl_style)
-    story.append(tbl)
-    story.append(Spacer(1, 10))
-
-
-def _add_passes_table(story, title, passes_list, styles):
-    """Add a detailed table for the list of obfuscation passes."""
-    story.append(Paragraph(title, styles["heading"]))
-    story.append(Spacer(1, 4 * mm))
-
-    table_data = [["Pass Name", "Enabled", "Parameters"]]
-    for p in passes_list:
-        # Format params dict into a readable pre-formatted string
-        params_str = json.dumps(p.get("params", {}), indent=2)
-        # Use a specific 'code' style for monospaced font
-        params_paragraph = Paragraph(
-            params_str.replace(" ", "&nbsp;").replace("\n", "<br/>"), styles["code"]
-        )
-        table_data.append(
-            [
-                p.get("name", "N/A"),
-                str(p.get("enabled", "N/A")),
-                params_paragraph,
+def _chunked_tables(header, rows, col_widths, style):
+    """Yield the rows as tables of at most MAX_TABLE_ROWS rows, each repeating the header."""
+    rows = iter(rows)
+    while True:
+        chunk = [header]
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) > MAX_TABLE_ROWS:
+                break
+        if len(chunk) == 1:
+            return
+        tbl = Table(chunk, colWidths=col_widths, hAlign="LEFT", repeatRows=1)
+        tbl.setStyle(style)
+        yield tbl
+
+
+def _section_table(title, data_dict, styles):
+    """Yield a section header and a two-column table for data_dict."""
+    yield Paragraph(title.replace("_", " ").title(), styles["heading"])
+    yield Spacer(1, 4)
+
+    rows = ([str(k), _format_value(v)] for k, v in data_dict.items())
+    yield from _chunked_tables(["Metric", "Value"], rows, [90 * mm, 90 * mm], SECTION_TABLE_STYLE)
+    yield Spacer(1, 10)
+
+
+def _passes_table(title, passes_list, styles):
+    """Yield a detailed table for the list of obfuscation passes."""
+    yield Paragraph(title, styles["heading"])
+    yield Spacer(1, 4 * mm)
+
+    def rows():
+        for p in passes_list:
+            # Format params dict into a readable pre-formatted string
+            params_str = json.dumps(p.get("params", {}), indent=2)
+            # Use a specific 'code' style for monospaced font
+            params_paragraph = Paragraph(
+                params_str.replace(" ", "&nbsp;").replace("\n", "<br/>"), styles["code"]
+            )
+            yield [p.get("name", "N/A"), str(p.get("enabled", "N/A")), params_paragraph]
+
+    col_widths = [30 * mm, 25 * mm, 115 * mm]
+    yield from _chunked_tables(["Pass Name", "Enabled", "Parameters"], rows(), col_widths, PASSES_TABLE_STYLE)
+    yield Spacer(1, 8 * mm)
+
+
+def _resource_table(title, resource_usage, styles):
+    """Yield per-stage wall/CPU time and peak RSS, plus the -time-passes breakdown if recorded."""
+    yield Paragraph(title, styles["heading"])
+    yield Spacer(1, 4)
+
+    def seconds(entry, key):
+        return f"{entry[key]:.3f}" if key in entry else "-"
+
+    timers = {}
+
+    def rows():
+        for entry in resource_usage:
+            stage = entry.get("stage", "N/A")
+            if "unit" in entry:
+                stage = f"{entry['unit']}: {stage}"
+            if entry.get("cached"):
+                stage += " (cached)"
+            elif not entry.get("success", True):
+                stage += " (failed)"
+            rss = f"{entry['max_rss_kb'] / 1024:.1f}" if "max_rss_kb" in entry else "-"
+            for timer, values in entry.get("time_passes", {}).items():
+                timers[timer] = timers.get(timer, 0.0) + values.get("wall", 0.0)
+            yield [
+                Paragraph(stage, styles["code"]),
+                str(entry.get("cycle", "")),
+                seconds(entry, "wall_s"),
+                seconds(entry, "user_s"),
+                seconds(entry, "sys_s"),
+                rss,
             ]
+
+    header = ["Stage", "Cycle", "Wall (s)", "User (s)", "Sys (s)", "Peak RSS (MiB)"]
+    col_widths = [60 * mm, 15 * mm, 25 * mm, 25 * mm, 25 * mm, 30 * mm]
+    yield from _chunked_tables(header, rows(), col_widths, RESOURCE_TABLE_STYLE)
+    yield Spacer(1, 10)
+
+    if timers:
+        top = sorted(timers.items(), key=lambda item: item[1], reverse=True)[:25]
+        yield from _section_table(
+            "LLVM Pass Timings (wall seconds, top 25)", {name: wall for name, wall in top}, styles
         )
 
-    # Adjusted column widths for the new content
-    col_widths = [30 * mm, 25 * mm, 115 * mm]
-    tbl = Table(table_data, colWidths=col_widths, hAlign="LEFT")
-    tbl_style = TableStyle(
-        [
-            ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#2E7AB7")),
-            ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
-            ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
-            ("FONTNAME", (0, 1), (-1, -1), "Helvetica"),
-            ("FONTSIZE", (0, 0), (-1, -1), 9),
-            ("GRID", (0, 0), (-1, -1), 0.25, colors.HexColor("#444444")),
-            ("VALIGN", (0, 0), (-1, -1), "TOP"),
-            ("LEFTPADDING", (0, 0), (-1, -1), 6),
-            ("RIGHTPADDING", (0, 0), (-1, -1), 6),
-        ]
-    )
-    tbl.setStyle(tbl_style)
-    story.append(tbl)
-    story.append(Spacer(1, 8 * mm))
 
+def _ratio(value):
+    """A time ratio such as x1.250, or n/a when the original ran too fast to measure."""
+    if value is None or value != value:  # None, or NaN from older profiles
+        return "n/a"
+    return f"x{value:.3f}"
 
-def save_report_placeholder(report_content, config_data=None, default_path=None):
-    """
-    Prompts user to save a PDF report from statistics (report_content)
-    and optional configuration (config_data). Returns True if saved.
-    """
-    try:
-        # --- Process Statistics Data ---
-        if report_content is None:
-            messagebox.showerror("Save Error", "No report statistics available to save.")
-            return False
-        if isinstance(report_content, str):
-            report = json.loads(report_content)
-        elif isinstance(report_content, dict):
-            report = report_content
-        else:
-            report = {"report_data": str(report_content)}
-            
-        # --- Process Configuration Data ---
-        config = None
-        if config_data:
-            if isinstance(config_data, str):
-                config = json.loads(config_data)
-            elif isinstance(config_data, dict):
-                config = config_data
-
-        initialfile = os.path.basename(default_path) if default_path else "obfuscation_report.pdf"
-        save_path = filedialog.asksaveasfilename(
-            defaultextension=".pdf",
-            filetypes=[("PDF files", "*.pdf")],
-            initialfile=initialfile,
+
+def _runtime_overhead_table(title, overhead, styles):
+    """Yield the runtime comparison of the original and the obfuscated executable."""
+    original, obfuscated = overhead["original"], overhead["obfuscated"]
+    confidence = round(overhead["confidence"] * 100)
+    ci = [_ratio(overhead.get("slowdown_ci_low")), _ratio(overhead.get("slowdown_ci_high"))]
+    summary = {
+        "Driver": overhead["driver"],
+        "Measured runs per program": overhead["runs"],
+        "Slowdown (mean time ratio)": _ratio(overhead.get("slowdown")),
+        f"Slowdown {confidence}% CI": "n/a" if "n/a" in ci else " - ".join(ci),
+        "Mean time original / obfuscated (s)": f"{original['mean_s']:.4f} / {obfuscated['mean_s']:.4f}",
+        "Stdev original / obfuscated (s)": f"{original['stdev_s']:.4f} / {obfuscated['stdev_s']:.4f}",
+        "Binary size original / obfuscated": f"{overhead['binary_size_original']} / {overhead['binary_size_obfuscated']} bytes",
+        "Binary size delta": f"{overhead['binary_size_delta']:+d} bytes",
+        "Outputs match": "yes" if overhead["outputs_match"] else "NO",
+    }
+    if "peak_rss_delta_kb" in overhead:
+        summary["Peak RSS original / obfuscated (MiB)"] = (
+            f"{original['peak_rss_kb'] / 1024:.1f} / {obfuscated['peak_rss_kb'] / 1024:.1f}"
         )
-        if not save_path:
-            return False
-
-        doc = SimpleDocTemplate(
-            save_path,
-            pagesize=A4,
-            rightMargin=18 * mm,
-            leftMargin=18 * mm,
-            topMargin=18 * mm,
-            bottomMargin=18 * mm,
+        summary["Peak RSS delta"] = f"{overhead['peak_rss_delta_kb']:+d} KiB"
+    yield from _section_table(title, summary, styles)
+
+
+def _size_analysis_tables(title, size_analysis, styles):
+    """Yield the functions and globals that grew most, original / obfuscated side by side."""
+    yield Paragraph(title, styles["heading"])
+    yield Spacer(1, 4)
+
+    def pair(values):
+        return " / ".join("-" if v is None else str(v) for v in values)
+
+    def function_rows():
+        for row in size_analysis["functions"]:
+            growth = f"x{row['growth']:.1f}" if row.get("growth") is not None else row["status"]
+            yield [
+                Paragraph(escape(row["name"]), styles["code"]),
+                pair(row["instructions"]),
+                pair(row["blocks"]),
+                pair(row["ir_bytes"]),
+                growth,
+            ]
+
+    header = ["Function", "Instructions", "Blocks", "IR bytes", "Growth"]
+    col_widths = [60 * mm, 30 * mm, 25 * mm, 35 * mm, 20 * mm]
+    yield from _chunked_tables(header, function_rows(), col_widths, RESOURCE_TABLE_STYLE)
+    yield Spacer(1, 10)
+
+    if size_analysis.get("globals"):
+        rows = (
+            [Paragraph(escape(row["name"]), styles["code"]), pair(row["data_bytes"]), pair(row["ir_bytes"]), row["status"]]
+            for row in size_analysis["globals"]
         )
+        header = ["Global", "Data bytes", "IR bytes", "Status"]
+        yield from _chunked_tables(header, rows, [70 * mm, 35 * mm, 40 * mm, 25 * mm], RESOURCE_TABLE_STYLE)
+        yield Spacer(1, 10)
+
+    if size_analysis.get("removed"):
+        removed = escape(", ".join(size_analysis["removed"]))
+        yield Paragraph(f"<b>Functions removed:</b> {removed}", styles["normal"])
+        yield Spacer(1, 6)
 
-        base_styles = getSampleStyleSheet()
-        styles = {
-            "title": ParagraphStyle(
-                "title", parent=base_styles["h1"], fontName="Helvetica-Bold", fontSize=16, spaceAfter=8
-            ),
-            "heading": ParagraphStyle(
-                "heading", parent=base_styles["h2"], fontName="Helvetica-Bold", fontSize=12,
-                textColor=colors.HexColor("#2E7AB7"), spaceAfter=6,
-            ),
-            "normal": base_styles["BodyText"],
-            "code": ParagraphStyle(
-                "code", parent=base_styles["Normal"], fontName="Courier", fontSize=8, leading=10,
-            ),
+
+def _report_story(report, config, resource_usage, runtime_overhead, size_analysis, styles):
+    """Yield the flowables of the whole report, section by section."""
+    yield Paragraph("Obfuscation Report", styles["title"])
+    yield Spacer(1, 6 * mm)
+
+    # --- Add Configuration Section if available ---
+    if config:
+        config_details = {
+            k: v for k, v in config.items() if k != "passes"
         }
+        if config_details:
+            yield from _section_table("Configuration Details", config_details, styles)
 
-        story = []
-        story.append(Paragraph("Obfuscation Report", styles["title"]))
-        story.append(Spacer(1, 6 * mm))
-
-        # --- Add Configuration Section if available ---
-        if config:
-            config_details = {
-                k: v for k, v in config.items() if k != "passes"
-            }
-            if config_details:
-                 _add_section_table(story, "Configuration Details", config_details, styles)
-            
-            if "passes" in config and isinstance(config["passes"], list):
-                _add_passes_table(story, "Obfuscation Passes Applied", config["passes"], styles)
-            
-            story.append(PageBreak())
-            story.append(Paragraph("Obfuscation Statistics", styles["title"]))
-            story.append(Spacer(1, 6 * mm))
-
-
-        # --- Add Statistics Section ---
-        for section_name, section_value in report.items():
-            if isinstance(section_value, dict):
-                _add_section_table(story, section_name, section_value, styles)
-            else:
-                story.append(Paragraph(f"<b>{section_name}:</b> {_format_value(section_value)}", styles["normal"]))
-                story.append(Spacer(1, 6))
-
-        doc.build(story)
-
-        messagebox.showinfo("Saved", f"Report saved to:\n{save_path}")
-        return True
+        if "passes" in config and isinstance(config["passes"], list):
+            yield from _passes_table("Obfuscation Passes Applied", config["passes"], styles)
 
-    except Exception as e:
-        messagebox.showerror("Error saving report", f"An error occurred while saving the PDF:\n{e}")
-        return False
+        yield PageBreak()
+        yield Paragraph("Obfuscation Statistics", styles["title"])
+        yield Spacer(1, 6 * mm)
+
+    # --- Add Statistics Section ---
+    for section_name, section_value in report.items():
+        if isinstance(section_value, dict):
+            yield from _section_table(section_name, section_value, styles)
+        else:
+            yield Paragraph(f"<b>{section_name}:</b> {_format_value(section_value)}", styles["normal"])
+            yield Spacer(1, 6)
+
+    # --- Add Resource Usage Section ---
+    if resource_usage:
+        yield PageBreak()
+        yield from _resource_table("Resource Usage per Pass", resource_usage, styles)
+
+    # --- Add Runtime Overhead Section ---
+    if runtime_overhead:
+        yield from _runtime_overhead_table("Runtime Overhead", runtime_overhead, styles)
+
+    # --- Add Size Growth Section ---
+    if size_analysis:
+        yield PageBreak()
+        yield from _size_analysis_tables(
+            "Size Growth per Function (original / obfuscated)", size_analysis, styles
+        )
+
+
+def build_report_pdf(
+    save_path, report_content, config_data=None, resource_usage=None, runtime_overhead=None, size_analysis=None
+):
+    """
+    Write the PDF report to save_path. Does not touch the UI, so it can run in
+    a background thread; raises on failure.
+    :param report_content: Statistics as a dict or JSON string. It is only read, never modified.
+    :param size_analysis: Optional per-function growth from SizeAnalyzer.compare.
+    """
+    if isinstance(report_content, str):
+        report = json.loads(report_content)
+    elif isinstance(report_content, dict):
+        report = report_content
+    else:
+        report = {"report_data": str(report_content)}
+
+    config = None
+    if config_data:
+        if isinstance(config_data, str):
+            config = json.loads(config_data)
+        elif isinstance(config_data, dict):
+            config = config_data
+
+    doc = SimpleDocTemplate(
+        save_path,
+        pagesize=A4,
+        rightMargin=18 * mm,
+        leftMargin=18 * mm,
+        topMargin=18 * mm,
+        bottomMargin=18 * mm,
+    )
+    story = _StreamingStory(
+        _report_story(report, config, resource_usage, runtime_overhead, size_analysis, _report_styles())
+    )
+    doc.build(story)
+
+
+def ask_report_path(default_path=None):
+    """Ask the user where to save the report. Returns the path, or None if cancelled."""
+    initialfile = os.path.basename(default_path) if default_path else "obfuscation_report.pdf"
+    save_path = filedialog.asksaveasfilename(
+        defaultextension=".pdf",
+        filetypes=[("PDF files", "*.pdf")],
+        initialfile=initialfile,
+    )
+    return save_path or None
 
 
 def view_pdf(path):
@@ -214,4 +390,4 @@ def view_pdf(path):
         else:
             subprocess.call(["xdg-open", path])
     except Exception as e:
-        messagebox.showerror("Open Error", f"Unable to open file:\n{e}")
\ No newline at end of file
+        messagebox.showerror("Open Error", f"Unable to open file:\n{e}")
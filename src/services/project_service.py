@@ -0,0 +1,448 @@
+#!/usr/bin/env python3
+"""
+project_service.py
+
+Usage:
+    python -m src.services.project_service <compile_commands.json|source_dir> config.json
+
+Obfuscates a whole project instead of a single file:
+- Reads translation units from a compile_commands.json or a source directory
+- Compiles and obfuscates every unit on a bounded process pool
+- Either merges the obfuscated units with llvm-link or keeps per-unit objects
+- Aggregates the stats and resource usage of every unit into one report
+  dict, which the app turns into the PDF report
+- In ThinLTO mode (a "thinlto" config section), compiles every unit with a
+  ThinLTO summary instead and runs the passes inside the parallel ThinLTO
+  backend of lld, so cross-module passes see imported functions while the
+  backends still use every core; the ThinLTO cache is kept between builds
+"""
+
+import hashlib
+import json
+import os
+import shlex
+import shutil
+import subprocess
+import sys
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.core.plan import compile_config
+from src.services.artifact_cache import DEFAULT_CACHE_DIR, ArtifactCache
+from src.services.llvm_pass_service import LLVMPassService, ObfuscationCancelled, ProgressCallback
+from src.services.llvm_service import TARGETS, LLVMService
+from src.services.scheduler_service import BATCH, ResourceLimits
+from src.utils.stats_store import StatsStore
+from src.utils.system import available_cores
+
+SOURCE_SUFFIXES = {".c", ".cc", ".cpp", ".cxx"}
+
+# Flags from a compile database that must not reach the -emit-llvm compile.
+_DROPPED_FLAGS = {"-c", "-S", "-E", "-emit-llvm"}
+_DROPPED_FLAGS_WITH_VALUE = {"-o", "-MF", "-MT", "-MQ"}
+
+
+@dataclass(frozen=True)
+class TranslationUnit:
+    source: str
+    directory: str
+    flags: Tuple[str, ...] = field(default_factory=tuple)
+
+
+def _frontend_flags(arguments: List[str], source: str, directory: str = ".") -> Tuple[str, ...]:
+    """Keep the preprocessor/language flags of a compile command, drop driver/output ones."""
+    source_path = Path(directory, source).resolve()
+    flags = []
+    skip_next = False
+    for arg in arguments[1:]:
+        if skip_next:
+            skip_next = False
+            continue
+        if arg in _DROPPED_FLAGS_WITH_VALUE:
+            skip_next = True
+            continue
+        if arg in _DROPPED_FLAGS or arg.startswith("-o") or arg.startswith("-M"):
+            continue
+        if not arg.startswith("-") and Path(directory, arg).resolve() == source_path:
+            continue
+        flags.append(arg)
+    return tuple(flags)
+
+
+def discover_units(path: str) -> List[TranslationUnit]:
+    """
+    Return the translation units of a project.
+    :param path: A compile_commands.json, a directory containing one, or a plain source directory.
+    """
+    root = Path(path)
+    database = root if root.is_file() else root / "compile_commands.json"
+
+    if database.is_file():
+        with open(database, "r", encoding="utf-8") as f:
+            entries = json.load(f)
+        units = []
+        for entry in entries:
+            directory = entry.get("directory", str(database.parent))
+            source = str(Path(directory, entry["file"]).resolve())
+            if "arguments" in entry:
+                arguments = list(entry["arguments"])
+            else:
+                arguments = shlex.split(entry.get("command", ""))
+            units.append(TranslationUnit(source, directory, _frontend_flags(arguments, entry["file"], directory)))
+        return units
+
+    if not root.is_dir():
+        raise FileNotFoundError(f"No compile_commands.json or source directory at: {path}")
+
+    return [
+        TranslationUnit(str(p.resolve()), str(p.parent.resolve()))
+        for p in sorted(root.rglob("*"))
+        if p.suffix.lower() in SOURCE_SUFFIXES and p.is_file()
+    ]
+
+
+def _unit_stem(unit: TranslationUnit) -> str:
+    # Units in different directories may share a file name.
+    digest = hashlib.sha1(unit.source.encode("utf-8")).hexdigest()[:8]
+    return f"{Path(unit.source).stem}_{digest}"
+
+
+def thin_lto_link_args(
+    llvm_options: List[str],
+    jobs: int,
+    cache_dir: str,
+    coff: bool = False,
+    pass_plugin: Optional[str] = None,
+) -> List[str]:
+    """
+    Clang driver arguments that make lld run the ThinLTO backends on `jobs`
+    threads with the given LLVM options, caching backend results in cache_dir.
+    -Xlinker is used rather than -Wl, which would split pass pipelines at commas.
+    :param coff: Use the lld-link spelling (MSVC targets) instead of the ELF/MinGW one.
+    """
+    if coff:
+        linker_args = [f"/opt:lldltojobs={jobs}", f"/lldltocache:{cache_dir}"]
+        linker_args.extend(f"/mllvm:{option}" for option in llvm_options)
+        if pass_plugin:
+            print("[WARN] lld-link cannot load pass plugins; the passes must be built into lld.")
+    else:
+        linker_args = [f"--thinlto-jobs={jobs}", f"--thinlto-cache-dir={cache_dir}"]
+        if pass_plugin:
+            linker_args.append(f"--load-pass-plugin={pass_plugin}")
+        for option in llvm_options:
+            linker_args.extend(["-mllvm", option])
+    args = []
+    for arg in linker_args:
+        args.extend(["-Xlinker", arg])
+    return args
+
+
+def _compile_unit(
+    unit: TranslationUnit,
+    clang_path: str,
+    out_dir: str,
+    cache_dir: Optional[str],
+    compiler: Optional[str],
+    extra_flags: List[str],
+) -> Dict[str, Any]:
+    """Compile one translation unit to bitcode without obfuscating it. Runs in a worker process."""
+    bc_path = str(Path(out_dir, f"{_unit_stem(unit)}.bc"))
+    cache = ArtifactCache(cache_dir) if cache_dir else None
+    try:
+        LLVMService(clang_path, cache=cache).compile_to_bytecode(
+            unit.source, bc_path, compiler, [*unit.flags, *extra_flags], unit.directory
+        )
+        return {"source": unit.source, "output": bc_path, "error": None}
+    except Exception as e:
+        return {"source": unit.source, "output": None, "error": str(e)}
+
+
+def _process_unit(
+    unit: TranslationUnit,
+    config: Dict[str, Any],
+    clang_path: str,
+    out_dir: str,
+    cache_dir: Optional[str],
+    emit_object: bool = False,
+) -> Dict[str, Any]:
+    """Compile and obfuscate one translation unit. Runs in a worker process."""
+    stem = _unit_stem(unit)
+    bc_path = str(Path(out_dir, f"{stem}.bc"))
+    obf_path = str(Path(out_dir, f"{stem}_obf.bc"))
+    cache = ArtifactCache(cache_dir) if cache_dir else None
+
+    try:
+        LLVMService(clang_path, cache=cache).compile_to_bytecode(
+            unit.source, bc_path, config.get("compiler"), list(unit.flags), unit.directory
+        )
+        Path(obf_path).unlink(missing_ok=True)  # never report a stale output as success
+        pass_service = LLVMPassService(
+            clang_path, work_dir=unit.directory, fused=True, cache=cache,
+            priority=BATCH, limits=ResourceLimits.from_config(config),
+        )
+        run = pass_service.apply_json_conf(config, bc_path, obf_path)
+        if not run.success or not Path(obf_path).exists():
+            raise RuntimeError(run.error or "no obfuscated output was produced")
+        output = obf_path
+        if emit_object:
+            output = str(Path(obf_path).with_suffix(".o"))
+            target = TARGETS.get(config.get("compiler"), "")
+            subprocess.run(
+                [clang_path, *([f"--target={target}"] if target else []), "-c", obf_path, "-o", output],
+                check=True,
+            )
+        usage = [{"unit": Path(unit.source).name, **entry} for entry in run.resource_usage]
+        return {"source": unit.source, "output": output, "stats": run.stats_store, "usage": usage, "error": None}
+    except Exception as e:
+        return {"source": unit.source, "output": None, "stats": StatsStore(), "usage": [], "error": str(e)}
+
+
+class ProjectService:
+    """
+    Service for obfuscating every translation unit of a project in parallel.
+    """
+
+    def __init__(
+        self,
+        clang_path: str = "clang",
+        llvm_link_path: str = "llvm-link",
+        jobs: Optional[int] = None,
+        cache_dir: Optional[str] = None,
+        pass_plugin: Optional[str] = None,
+    ):
+        """
+        :param clang_path: Path to clang executable.
+        :param llvm_link_path: Path to llvm-link, used when merging units.
+        :param jobs: Number of worker processes. Defaults to the available cores.
+        :param cache_dir: Optional ArtifactCache directory shared by all workers.
+        :param pass_plugin: Pass plugin loaded into lld in ThinLTO mode.
+        """
+        self.clang_path = clang_path
+        self.llvm_link = shutil.which(llvm_link_path) or llvm_link_path
+        self.jobs = jobs or available_cores()
+        self.cache_dir = cache_dir
+        self.pass_plugin = pass_plugin
+        self._cancelled = threading.Event()
+        self._futures: List[Future] = []
+
+    def cancel(self):
+        """Stop a running build from another thread: units not started yet are dropped, running ones finish."""
+        self._cancelled.set()
+        for future in list(self._futures):
+            future.cancel()
+
+    def _run_units(
+        self,
+        units: List[TranslationUnit],
+        submit: Callable[[ProcessPoolExecutor, TranslationUnit], Future],
+        on_progress: Optional[ProgressCallback],
+    ) -> List[Dict[str, Any]]:
+        """Run every unit on the process pool and return their results, sorted by source."""
+        self._cancelled.clear()
+        results = []
+        with ProcessPoolExecutor(max_workers=min(self.jobs, len(units))) as pool:
+            self._futures = [submit(pool, unit) for unit in units]
+            if self._cancelled.is_set():
+                self.cancel()
+            if on_progress is not None:
+                on_progress({"event": "project_started", "total": len(units)})
+            for future in as_completed(self._futures):
+                if future.cancelled():
+                    continue
+                result = future.result()
+                status = "ok" if result["error"] is None else f"failed: {result['error']}"
+                print(f"[UNIT] {result['source']} {status}")
+                results.append(result)
+                if on_progress is not None:
+                    on_progress({
+                        "event": "unit_finished",
+                        "source": result["source"],
+                        "error": result["error"],
+                        "done": len(results),
+                        "total": len(units),
+                    })
+        self._futures = []
+        if self._cancelled.is_set():
+            raise ObfuscationCancelled("Obfuscation cancelled.")
+        results.sort(key=lambda r: r["source"])
+        return results
+
+    def _link(self, inputs: List[str], output_file: str):
+        cmd = [self.llvm_link, *inputs, "-o", output_file]
+        print("[CMD]", " ".join(cmd))
+        try:
+            subprocess.run(cmd, check=True)
+        except subprocess.CalledProcessError as e:
+            raise RuntimeError(f"Failed to link obfuscated units. Error: {e}")
+
+    def obfuscate_project(
+        self,
+        project_path: str,
+        config: Dict[str, Any],
+        out_dir: str = os.path.join("artifacts", "project"),
+        merge: bool = True,
+        on_progress: Optional[ProgressCallback] = None,
+    ) -> Dict[str, Any]:
+        """
+        Compile and obfuscate every unit of a project.
+        :param project_path: compile_commands.json, a directory containing one, or a source directory.
+        :param config: Pass configuration in the example.json format.
+        :param out_dir: Directory receiving per-unit and merged artifacts.
+        :param merge: Link all obfuscated units into one .bc; otherwise emit one object per unit.
+        :param on_progress: Called with "project_started" and one "unit_finished" event per unit.
+        :return: Dict with "stats" (aggregated), "stats_store" (per unit/stage/cycle records),
+                 "resource_usage" (per unit and stage), "units", "failed" and "outputs".
+        """
+        units = discover_units(project_path)
+        if not units:
+            raise RuntimeError(f"No translation units found in: {project_path}")
+        # Units compile in their own directories, so artifact paths must be absolute.
+        out_dir = str(Path(out_dir).resolve())
+        Path(out_dir).mkdir(parents=True, exist_ok=True)
+
+        results = self._run_units(
+            units,
+            lambda pool, unit: pool.submit(
+                _process_unit, unit, config, self.clang_path, out_dir, self.cache_dir, not merge
+            ),
+            on_progress,
+        )
+        store = StatsStore()
+        for result in results:
+            store.extend(result["stats"])
+
+        succeeded = [r["output"] for r in results if r["error"] is None]
+        outputs = succeeded
+        if succeeded and merge:
+            merged = str(Path(out_dir, "project_obf.bc"))
+            self._link(succeeded, merged)
+            outputs = [merged]
+
+        return {
+            "stats": store.total(),
+            "stats_store": store,
+            "resource_usage": [entry for r in results for entry in r["usage"]],
+            "units": len(units),
+            "failed": {r["source"]: r["error"] for r in results if r["error"] is not None},
+            "outputs": outputs,
+        }
+
+    def obfuscate_project_thinlto(
+        self,
+        project_path: str,
+        config: Dict[str, Any],
+        out_dir: str = os.path.join("artifacts", "project"),
+        output_name: Optional[str] = None,
+        lto_jobs: Optional[int] = None,
+        link_flags: Optional[List[str]] = None,
+        lto_cache_dir: Optional[str] = None,
+        on_progress: Optional[ProgressCallback] = None,
+    ) -> Dict[str, Any]:
+        """
+        Compile every unit with a ThinLTO summary and link them with lld,
+        running the obfuscation passes in the ThinLTO backends.
+        :param output_name: File name of the linked program. Defaults to project_obf(.exe).
+        :param lto_jobs: ThinLTO backend threads. Defaults to the number of worker processes.
+        :param link_flags: Extra link flags, e.g. ["-shared"] or libraries.
+        :param lto_cache_dir: ThinLTO cache, reused between builds. Defaults to <cache_dir>/thinlto/<plan key>.
+        :param on_progress: Called with "project_started" and one "unit_finished" event per compiled unit.
+        :return: Same keys as obfuscate_project; "resource_usage" is that of the link.
+        """
+        plan = compile_config(config, fused=True)  # raises ConfigError
+        if len(plan) > 1:
+            raise ValueError(
+                "In ThinLTO mode all passes run in one backend pipeline, but these pass options "
+                "conflict and need separate stages: " + " | ".join(stage.label for stage in plan)
+            )
+        units = discover_units(project_path)
+        if not units:
+            raise RuntimeError(f"No translation units found in: {project_path}")
+        out_dir = str(Path(out_dir).resolve())
+        Path(out_dir).mkdir(parents=True, exist_ok=True)
+        target = TARGETS.get(config.get("compiler"), "")
+
+        results = self._run_units(
+            units,
+            lambda pool, unit: pool.submit(
+                _compile_unit, unit, self.clang_path, out_dir, self.cache_dir, config.get("compiler"), ["-flto=thin"]
+            ),
+            on_progress,
+        )
+
+        report = {
+            "stats": {},
+            "stats_store": StatsStore(),
+            "units": len(units),
+            "failed": {r["source"]: r["error"] for r in results if r["error"] is not None},
+            "outputs": [],
+            "resource_usage": [],
+        }
+        if report["failed"]:
+            return report  # a program missing units would not link
+
+        if output_name is None:
+            output_name = "project_obf.exe" if "windows" in target or "mingw" in target else "project_obf"
+        output = str(Path(out_dir, output_name))
+        # lld's cache key ignores the -mllvm pass options, so each plan gets its own directory.
+        lto_cache_dir = lto_cache_dir or str(
+            Path(self.cache_dir or DEFAULT_CACHE_DIR, "thinlto", plan.key).resolve()
+        )
+        Path(lto_cache_dir).mkdir(parents=True, exist_ok=True)
+
+        runner = LLVMPassService(self.clang_path, work_dir=out_dir)
+        stats_file = runner.new_stats_file()
+        llvm_options = [tag for stage in plan for tag in stage.args if tag != "-mllvm"]
+        llvm_options.extend(["-stats-json", f"-info-output-file={stats_file}"])
+        cmd = [
+            runner.clang,
+            "-flto=thin",
+            "-fuse-ld=lld",
+            *([f"--target={target}"] if target else []),
+            *(r["output"] for r in results),
+            "-o",
+            output,
+            *thin_lto_link_args(
+                llvm_options, lto_jobs or self.jobs, lto_cache_dir, target.endswith("msvc"), self.pass_plugin
+            ),
+            *(link_flags or []),
+        ]
+        success, _, stderr, usage = runner.run_command(cmd)
+        stats, time_passes = runner.read_stats_report(stats_file, stderr)
+        if not success:
+            raise RuntimeError(f"ThinLTO link failed: {stderr}")
+        if time_passes:
+            usage["time_passes"] = time_passes
+
+        label = plan.stages[0].label if plan.stages else "link"
+        report["stats_store"].add("project", label, 1, stats)
+        report["stats"] = report["stats_store"].total()
+        report["outputs"] = [output]
+        report["resource_usage"] = [{"stage": label, "cycle": 1, "success": True, **usage}]
+        return report
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print(__doc__)
+        sys.exit(1)
+    with open(sys.argv[2], "r", encoding="utf-8") as f:
+        project_config = json.load(f)
+    service = ProjectService(
+        os.getenv("CLANG_PATH", "clang"), cache_dir=os.getenv("CACHE_DIR"), pass_plugin=os.getenv("PASS_PLUGIN")
+    )
+    thinlto = project_config.get("thinlto") or {}
+    if thinlto.get("enabled"):
+        report = service.obfuscate_project_thinlto(
+            sys.argv[1], project_config,
+            output_name=thinlto.get("output"),
+            lto_jobs=thinlto.get("jobs"),
+            link_flags=thinlto.get("link_flags"),
+            lto_cache_dir=thinlto.get("cache_dir"),
+        )
+    else:
+        report = service.obfuscate_project(sys.argv[1], project_config)
+    report.pop("stats_store")
+    print(json.dumps(report, indent=4))
@@ -0,0 +1,262 @@
+"""
+runtime_profiler_service.py
+
+Usage:
+    python -m src.services.runtime_profiler_service original.bc obfuscated.bc [--driver "{exe} input.txt"] [--runs 20]
+
+Measures what obfuscation costs at runtime:
+- Links the original and the obfuscated .bc into native executables with clang
+- Runs both repeatedly (interleaved, after warm-up runs) under a driver
+  command, recording wall time and peak RSS of every run (via wait4)
+- Reports the slowdown of the obfuscated program with a bootstrap confidence
+  interval, plus binary-size and peak-memory deltas
+
+The bitcode must target the host so the executables can run here; bitcode
+built for another target (e.g. the "visual studio" compiler setting on Linux)
+is rejected with TargetMismatch before anything is linked. The driver
+is a command line in which "{exe}" is replaced by the executable path; when it
+is omitted the executable is run without arguments. Peak RSS is that of the
+driver process, so drivers that wrap the program should exec it.
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import shlex
+import statistics
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from src.services.llvm_pass_service import LLVMPassService, ObfuscationCancelled
+
+BOOTSTRAP_SAMPLES = 2000
+
+_TRIPLE_RE = re.compile(r'^target triple = "([^"]*)"', re.MULTILINE)
+
+
+class TargetMismatch(RuntimeError):
+    """The bitcode is built for a target whose executables cannot run on this host."""
+
+
+def _same_platform(triple: str, host: str) -> bool:
+    """Compare the arch, OS and environment of two triples; the vendor does not matter."""
+    parts = triple.split("-")
+    host_parts = host.split("-")
+    if parts[0] != host_parts[0]:
+        return False
+    # arch-vendor-os[-env]; the OS may carry a version (macosx14.0, darwin23.1.0).
+    os_name = re.sub(r"[\d.]+$", "", parts[2]) if len(parts) > 2 else ""
+    host_os = re.sub(r"[\d.]+$", "", host_parts[2]) if len(host_parts) > 2 else ""
+    if {os_name, host_os} <= {"darwin", "macosx", "macos"}:
+        return True
+    if os_name != host_os:
+        return False
+    env = parts[3] if len(parts) > 3 else ""
+    host_env = host_parts[3] if len(host_parts) > 3 else ""
+    return not env or not host_env or env == host_env
+
+
+def _bootstrap_ratio_ci(
+    baseline: Sequence[float], candidate: Sequence[float], confidence: float, seed: int
+) -> Tuple[Optional[float], Optional[float]]:
+    """
+    Percentile bootstrap interval of mean(candidate) / mean(baseline), or
+    (None, None) if the baseline times are all zero (like the slowdown itself).
+    """
+    rng = random.Random(seed)
+    ratios = []
+    for _ in range(BOOTSTRAP_SAMPLES):
+        base = statistics.fmean(rng.choices(baseline, k=len(baseline)))
+        cand = statistics.fmean(rng.choices(candidate, k=len(candidate)))
+        if base > 0:
+            ratios.append(cand / base)
+    if not ratios:
+        return None, None
+    ratios.sort()
+    tail = (1 - confidence) / 2
+    low = ratios[int(tail * (len(ratios) - 1))]
+    high = ratios[int((1 - tail) * (len(ratios) - 1))]
+    return low, high
+
+
+def _summarize_runs(runs: List[Dict[str, float]]) -> Dict[str, float]:
+    times = [run["wall_s"] for run in runs]
+    rss = [run["max_rss_kb"] for run in runs if "max_rss_kb" in run]
+    return {
+        "runs": len(times),
+        "mean_s": statistics.fmean(times),
+        "median_s": statistics.median(times),
+        "stdev_s": statistics.stdev(times) if len(times) > 1 else 0.0,
+        "min_s": min(times),
+        "peak_rss_kb": max(rss) if rss else None,
+    }
+
+
+class RuntimeProfiler:
+    def __init__(self, clang_path: str = "clang", work_dir: Optional[str] = None, llvm_dis_path: str = "llvm-dis"):
+        """
+        :param clang_path: Path to clang executable used to link the executables.
+        :param work_dir: Working directory for the driver command.
+        :param llvm_dis_path: Path to llvm-dis, used to read the target triple of the bitcode.
+        """
+        self.clang_path = clang_path or "clang"
+        self.llvm_dis_path = llvm_dis_path
+        self.work_dir = work_dir or os.getcwd()
+        # Reuses the pass service's subprocess handling (wait4 usage, process-group kill).
+        self._runner = LLVMPassService(self.clang_path, work_dir=self.work_dir)
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        self._cancelled.set()
+        self._runner.cancel()
+
+    def _check_cancelled(self):
+        if self._cancelled.is_set():
+            raise ObfuscationCancelled("Profiling cancelled.")
+
+    def host_triple(self) -> str:
+        """The triple clang builds for when no --target is given."""
+        success, stdout, stderr, _ = self._runner.run_command([self.clang_path, "-print-target-triple"])
+        if not success:
+            raise RuntimeError(f"Could not determine the host target: {stderr}")
+        return stdout.strip()
+
+    def bitcode_triple(self, bc_file: str) -> Optional[str]:
+        """The target triple of a .bc ('' if it has none), or None if llvm-dis cannot read it."""
+        success, stdout, stderr, _ = self._runner.run_command([self.llvm_dis_path, str(bc_file), "-o", "-"])
+        self._check_cancelled()
+        if not success:
+            print(f"[WARN] Could not read the target of {bc_file}: {stderr.strip()}")
+            return None
+        match = _TRIPLE_RE.search(stdout)
+        return match.group(1) if match else ""
+
+    def check_target(self, bc_file: str):
+        """Raise TargetMismatch if the executable built from bc_file could not run on this host."""
+        triple = self.bitcode_triple(bc_file)
+        if not triple:
+            return  # no triple (built for the host), or unknown: linking will tell
+        host = self.host_triple()
+        if not _same_platform(triple, host):
+            raise TargetMismatch(
+                f"{Path(bc_file).name} is built for {triple}, but this host runs {host}. "
+                "Compile for the host to profile the runtime."
+            )
+
+    def build_executable(self, bc_file: str, exe_file: str, link_flags: Optional[List[str]] = None) -> str:
+        """Compile and link a .bc into a native executable. Returns exe_file. See check_target()."""
+        params = [self.clang_path, str(bc_file), "-o", str(exe_file)] + list(link_flags or [])
+        success, _, stderr, _ = self._runner.run_command(params)
+        self._check_cancelled()
+        if not success:
+            raise RuntimeError(f"Linking {bc_file} failed: {stderr}")
+        return str(exe_file)
+
+    def _driver_cmd(self, exe_file: str, driver: Optional[str]) -> List[str]:
+        if not driver:
+            return [exe_file]
+        if "{exe}" not in driver:
+            raise ValueError('The driver command must contain "{exe}".')
+        return [part.replace("{exe}", exe_file) for part in shlex.split(driver)]
+
+    def _run_once(self, exe_file: str, driver: Optional[str]) -> Tuple[str, Dict[str, float]]:
+        self._check_cancelled()
+        success, stdout, stderr, usage = self._runner.run_command(self._driver_cmd(exe_file, driver))
+        self._check_cancelled()
+        if not success:
+            raise RuntimeError(f"Driver failed for {exe_file}: {stderr}")
+        return stdout, usage
+
+    def profile(
+        self,
+        original_bc: str,
+        obfuscated_bc: str,
+        driver: Optional[str] = None,
+        runs: int = 10,
+        warmup: int = 1,
+        link_flags: Optional[List[str]] = None,
+        confidence: float = 0.95,
+        seed: int = 0,
+    ) -> Dict[str, Any]:
+        """
+        Build both programs and compare their runtime under the driver.
+        :param driver: Command line with "{exe}" placeholder, or None to run the executable directly.
+        :param runs: Measured runs per program. Runs of both programs are interleaved.
+        :param warmup: Unmeasured runs per program before measuring.
+        :param link_flags: Extra flags for linking, e.g. ["-lm"].
+        :param confidence: Confidence level of the slowdown interval.
+        :param seed: Seed of the bootstrap resampling, so reports are reproducible.
+        """
+        if runs < 2:
+            raise ValueError("At least two runs are needed for a confidence interval.")
+        self._cancelled.clear()
+        for bc_file in (original_bc, obfuscated_bc):
+            self.check_target(bc_file)
+
+        exes = {}
+        for name, bc_file in (("original", original_bc), ("obfuscated", obfuscated_bc)):
+            exe_file = Path(bc_file).with_suffix(".exe" if os.name == "nt" else ".bin")
+            exes[name] = self.build_executable(bc_file, str(exe_file), link_flags)
+
+        outputs = {}
+        for name, exe_file in exes.items():
+            for _ in range(warmup):
+                outputs[name], _ = self._run_once(exe_file, driver)
+
+        measured: Dict[str, List[Dict[str, float]]] = {"original": [], "obfuscated": []}
+        for _ in range(runs):
+            for name, exe_file in exes.items():
+                stdout, usage = self._run_once(exe_file, driver)
+                outputs.setdefault(name, stdout)
+                measured[name].append(usage)
+
+        original = _summarize_runs(measured["original"])
+        obfuscated = _summarize_runs(measured["obfuscated"])
+        low, high = _bootstrap_ratio_ci(
+            [run["wall_s"] for run in measured["original"]],
+            [run["wall_s"] for run in measured["obfuscated"]],
+            confidence,
+            seed,
+        )
+        original_size = os.path.getsize(exes["original"])
+        obfuscated_size = os.path.getsize(exes["obfuscated"])
+
+        report = {
+            "driver": driver or "{exe}",
+            "runs": runs,
+            "slowdown": obfuscated["mean_s"] / original["mean_s"] if original["mean_s"] else None,
+            "slowdown_ci_low": low,
+            "slowdown_ci_high": high,
+            "confidence": confidence,
+            "original": original,
+            "obfuscated": obfuscated,
+            "binary_size_original": original_size,
+            "binary_size_obfuscated": obfuscated_size,
+            "binary_size_delta": obfuscated_size - original_size,
+            "outputs_match": outputs["original"] == outputs["obfuscated"],
+        }
+        if original["peak_rss_kb"] is not None and obfuscated["peak_rss_kb"] is not None:
+            report["peak_rss_delta_kb"] = obfuscated["peak_rss_kb"] - original["peak_rss_kb"]
+        return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare runtime of an original and an obfuscated .bc.")
+    parser.add_argument("original_bc")
+    parser.add_argument("obfuscated_bc")
+    parser.add_argument("--clang", default=os.getenv("CLANG_PATH", "clang"))
+    parser.add_argument("--driver", help='Command line with "{exe}" placeholder.')
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--link-flag", action="append", default=[], dest="link_flags")
+    parser.add_argument("--llvm-dis", default=os.getenv("LLVM_DIS_PATH", "llvm-dis"))
+    args = parser.parse_args()
+
+    profiler = RuntimeProfiler(args.clang, llvm_dis_path=args.llvm_dis)
+    result = profiler.profile(
+        args.original_bc, args.obfuscated_bc, args.driver, args.runs, args.warmup, args.link_flags
+    )
+    print(json.dumps(result, indent=4))
@@ -0,0 +1,256 @@
+"""
+scheduler_service.py
+
+Admission control and resource limits for the pass processes (clang/opt)
+started by LLVMPassService:
+- At most `max_procs` pass processes run at once (default: the available cores)
+- Every process reserves memory from a budget (default: 75% of physical
+  memory) and only starts once its reservation fits. The reservation is the
+  process's memory limit, or a default estimate without one. A process
+  larger than the whole budget still runs, alone
+- Waiting processes are admitted by priority class (interactive before
+  normal before batch), then in arrival order
+- Processes get rlimits on address space and CPU time (set with prlimit
+  right after the spawn, Linux only), and are killed after an optional
+  wall-clock timeout; batch processes also run under nice, so they yield
+  to other programs on a shared host as well
+- A process that fails after hitting a limit is reported as such
+
+The scheduler coordinates the threads of one Python process; use
+shared_scheduler() so every service of the process draws from one budget.
+"""
+
+import heapq
+import itertools
+import os
+import shutil
+import signal
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import resource
+except ImportError:  # Windows: no rlimits
+    resource = None
+
+from src.utils.system import available_cores
+
+INTERACTIVE = 0
+NORMAL = 1
+BATCH = 2
+PRIORITIES = {"interactive": INTERACTIVE, "normal": NORMAL, "batch": BATCH}
+
+# Niceness added to the pass processes of each priority class.
+_NICE = {INTERACTIVE: 0, NORMAL: 0, BATCH: 10}
+
+# stderr of clang/opt when an allocation failed under RLIMIT_AS.
+_OOM_MARKERS = ("out of memory", "bad_alloc", "Cannot allocate memory", "Allocation failed")
+
+DEFAULT_RESERVATION_MB = 512
+
+_warned_no_prlimit = False
+
+
+def parse_priority(value: Any) -> int:
+    """Priority class from its name ("interactive", "normal", "batch") or number."""
+    if isinstance(value, str) and value.lower() in PRIORITIES:
+        return PRIORITIES[value.lower()]
+    if isinstance(value, int) and value in PRIORITIES.values():
+        return value
+    raise ValueError(f"Unknown priority {value!r}, expected one of {sorted(PRIORITIES)}.")
+
+
+@dataclass(frozen=True)
+class ResourceLimits:
+    memory_mb: Optional[int] = None  # address space of each pass process
+    cpu_s: Optional[int] = None  # CPU time of each pass process
+    wall_s: Optional[int] = None  # wall-clock time of each pass process
+    job_s: Optional[int] = None  # wall-clock time of a whole job, enforced by the JobManager
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "ResourceLimits":
+        """
+        Limits from the "limits" section of a config, falling back to the
+        PASS_MEMORY_LIMIT_MB, PASS_CPU_LIMIT_S, PASS_TIMEOUT_S and JOB_TIMEOUT_S environment variables.
+        Raises ValueError for a limit that is not a positive integer.
+        """
+        section = config.get("limits") or {}
+        values = {}
+        for field, env in (
+            ("memory_mb", "PASS_MEMORY_LIMIT_MB"), ("cpu_s", "PASS_CPU_LIMIT_S"), ("wall_s", "PASS_TIMEOUT_S"),
+            ("job_s", "JOB_TIMEOUT_S"),
+        ):
+            value = section.get(field, os.getenv(env))
+            if value in (None, ""):
+                values[field] = None
+                continue
+            try:
+                values[field] = int(value)
+            except (TypeError, ValueError):
+                values[field] = 0
+            if values[field] <= 0:
+                raise ValueError(f"limits.{field} must be a positive integer, got {value!r}.")
+        return cls(**values)
+
+    @staticmethod
+    def command(params: List[str], priority: int = NORMAL) -> List[str]:
+        """The command line of a pass process, run under nice for priority classes that lower it."""
+        nice = _NICE.get(priority, 0)
+        if not nice or os.name != "posix" or not shutil.which("nice"):
+            return params
+        return ["nice", "-n", str(nice), *params]
+
+    def apply(self, pid: int):
+        """
+        Set these limits on a just-started process. This is done from the
+        parent (a preexec_fn is not safe in a threaded program) and needs
+        prlimit, so the memory and CPU limits are only enforced on Linux.
+        """
+        if not (self.memory_mb or self.cpu_s):
+            return
+        if resource is None or not hasattr(resource, "prlimit"):
+            global _warned_no_prlimit
+            if not _warned_no_prlimit:
+                print("[WARN] Memory and CPU limits need prlimit (Linux); pass processes run without them.")
+                _warned_no_prlimit = True
+            return
+        try:
+            if self.memory_mb:
+                memory_bytes = self.memory_mb * 1024 * 1024
+                resource.prlimit(pid, resource.RLIMIT_AS, (memory_bytes, memory_bytes))
+            if self.cpu_s:
+                # SIGXCPU at the soft limit, SIGKILL if the process ignores it.
+                resource.prlimit(pid, resource.RLIMIT_CPU, (self.cpu_s, self.cpu_s + 5))
+        except ProcessLookupError:
+            pass  # already exited
+
+    def exceeded(self, returncode: Optional[int], stderr: str, usage: Dict[str, Any]) -> Optional[str]:
+        """
+        Describe the limit a failed process ran into, or None if it failed for
+        another reason. RLIMIT_AS caps reserved address space, which peak RSS
+        says little about, so a memory limit is only detected by the
+        allocation failure clang/opt print on stderr.
+        """
+        if not returncode:
+            return None
+        killed = returncode < 0 and -returncode in (
+            getattr(signal, "SIGXCPU", 0), getattr(signal, "SIGKILL", 0),
+        )
+        cpu_used = usage.get("user_s", 0.0) + usage.get("sys_s", 0.0)
+        if self.cpu_s and killed and cpu_used >= self.cpu_s * 0.95:
+            return f"CPU time limit of {self.cpu_s}s"
+        if self.memory_mb and any(marker in stderr for marker in _OOM_MARKERS):
+            return f"memory limit of {self.memory_mb} MiB"
+        return None
+
+
+def _physical_memory_mb() -> Optional[int]:
+    try:
+        return os.sysconf("SC_PHYS_PAGES") * os.sysconf("SC_PAGE_SIZE") // (1024 * 1024)
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+class ResourceScheduler:
+    """
+    Admits pass processes by free process slots, a memory budget and priority.
+    """
+
+    def __init__(
+        self,
+        max_procs: Optional[int] = None,
+        memory_budget_mb: Optional[int] = None,
+        default_reservation_mb: int = DEFAULT_RESERVATION_MB,
+    ):
+        """
+        :param max_procs: Pass processes running at once. Defaults to the available cores.
+        :param memory_budget_mb: Memory all running processes may reserve together.
+                                 Defaults to 75% of physical memory; no budget if that is unknown.
+        :param default_reservation_mb: Reservation of a process without a memory limit.
+        """
+        self.max_procs = max_procs or available_cores()
+        if memory_budget_mb is None:
+            physical = _physical_memory_mb()
+            memory_budget_mb = physical * 3 // 4 if physical else None
+        self.memory_budget_mb = memory_budget_mb
+        self.default_reservation_mb = default_reservation_mb
+        self._cond = threading.Condition()
+        self._waiting: List[Tuple[int, int]] = []  # heap of (priority, arrival)
+        self._arrivals = itertools.count()
+        self._running = 0
+        self._reserved_mb = 0
+
+    @property
+    def running(self) -> int:
+        with self._cond:
+            return self._running
+
+    @property
+    def waiting(self) -> int:
+        with self._cond:
+            return len(self._waiting)
+
+    def reservation(self, limits: Optional[ResourceLimits]) -> int:
+        """Memory reserved for a process started with these limits."""
+        if limits is not None and limits.memory_mb:
+            return limits.memory_mb
+        return self.default_reservation_mb
+
+    def _fits(self, memory_mb: int) -> bool:
+        if self._running >= self.max_procs:
+            return False
+        if self.memory_budget_mb is None or self._running == 0:
+            return True
+        return self._reserved_mb + memory_mb <= self.memory_budget_mb
+
+    def acquire(self, priority: int, memory_mb: int, cancelled: Optional[threading.Event] = None) -> bool:
+        """
+        Block until a process reserving memory_mb may start. Returns False
+        (without reserving anything) if `cancelled` is set while waiting.
+        """
+        with self._cond:
+            ticket = (priority, next(self._arrivals))
+            heapq.heappush(self._waiting, ticket)
+            try:
+                while self._waiting[0] != ticket or not self._fits(memory_mb):
+                    if cancelled is not None and cancelled.is_set():
+                        return False
+                    # Cancellation is not signalled through the condition, so poll for it.
+                    self._cond.wait(0.1 if cancelled is not None else None)
+                heapq.heappop(self._waiting)
+                self._running += 1
+                self._reserved_mb += memory_mb
+                return True
+            finally:
+                if ticket in self._waiting:
+                    self._waiting.remove(ticket)
+                    heapq.heapify(self._waiting)
+                # The next waiter may fit as well, or may now be at the head.
+                self._cond.notify_all()
+
+    def release(self, memory_mb: int):
+        """Return the slot and reservation of a finished process."""
+        with self._cond:
+            self._running -= 1
+            self._reserved_mb -= memory_mb
+            self._cond.notify_all()
+
+
+_shared: Optional[ResourceScheduler] = None
+_shared_lock = threading.Lock()
+
+
+def shared_scheduler() -> ResourceScheduler:
+    """
+    The scheduler shared by every service of this process, configured from
+    MAX_PASS_PROCS and MEMORY_BUDGET_MB on first use.
+    """
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = ResourceScheduler(
+                max_procs=int(os.getenv("MAX_PASS_PROCS", "0")) or None,
+                memory_budget_mb=int(os.getenv("MEMORY_BUDGET_MB", "0")) or None,
+            )
+        return _shared
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+shard_service.py
+
+Usage:
+    python -m src.services.shard_service input.bc config.json [shards]
+
+Obfuscates one large module on several cores:
+- Splits the module into function-level partitions with llvm-split
+  (-preserve-locals keeps internal symbols next to their users)
+- Skips the passes for partitions without function definitions (llvm-split
+  leaves some empty, or holding only globals); those are linked unchanged
+- Runs the configured passes on every partition in parallel, each with its
+  own LLVMPassService and a seed derived deterministically from the
+  configured seed and the partition index
+- Relinks the obfuscated partitions into one .bc with llvm-link
+- Merges the RunResults (stats, stats records, resource usage) of every partition
+
+Passes only see the functions of their partition, so cross-function passes
+(merge, alias, indcall, gvenc) act within a partition rather than over the
+whole module. Without llvm-split, or with a single shard, the module is
+obfuscated as a whole.
+"""
+
+import copy
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from src.core.plan import PASS_SCHEMAS, canonical_param, compile_config
+from src.core.result import RunResult
+from src.services.artifact_cache import ArtifactCache
+from src.services.llvm_pass_service import (
+    LLVMPassService,
+    ObfuscationCancelled,
+    ProgressCallback,
+)
+from src.utils.system import available_cores
+
+
+def derive_seed(seed: int, shard: int) -> int:
+    """Deterministic 31-bit seed of a shard, independent of scheduling order."""
+    digest = hashlib.sha256(f"{seed}/{shard}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:4], "big") & 0x7FFFFFFF
+
+
+def shard_config(config: Dict[str, Any], shard: int) -> Dict[str, Any]:
+    """Return a copy of config with every pass seed replaced by its derived seed for shard."""
+    derived = copy.deepcopy(config)
+    for entry in derived.get("passes", []):
+        schema = PASS_SCHEMAS.get(entry.get("name"), {})
+        params = entry.get("params") or {}
+        for param, value in params.items():
+            canonical = canonical_param(entry["name"], param)
+            if canonical in schema and canonical.endswith("seed"):
+                params[param] = derive_seed(int(value), shard)
+    return derived
+
+
+class ShardedPassService:
+    """
+    Drop-in replacement for LLVMPassService that obfuscates the functions of
+    a module in parallel partitions. Exposes the same apply_json_conf (which
+    returns the merged RunResult of all partitions), cancel and history.
+    """
+
+    def __init__(
+        self,
+        clang_path: str = "clang",
+        work_dir: Optional[str] = None,
+        shards: Optional[int] = None,
+        fused: bool = True,
+        cache: Optional[ArtifactCache] = None,
+        llvm_split_path: str = "llvm-split",
+        llvm_link_path: str = "llvm-link",
+        llvm_nm_path: str = "llvm-nm",
+        **pass_options,
+    ):
+        """
+        :param clang_path: Path to clang executable.
+        :param work_dir: Working directory of every clang run.
+        :param shards: Number of partitions, which also bounds the parallelism. Defaults to the available cores.
+        :param fused: Fuse the passes of every partition as LLVMPassService does.
+        :param cache: Optional ArtifactCache shared by every partition.
+        :param llvm_nm_path: Path to llvm-nm, used to find partitions without functions.
+        :param pass_options: Further LLVMPassService arguments (backend, opt_path, pass_plugin, time_passes).
+        """
+        self.clang_path = clang_path
+        self.work_dir = work_dir
+        self.shards = shards or available_cores()
+        self.fused = fused
+        self.cache = cache
+        self.llvm_split = shutil.which(llvm_split_path) or llvm_split_path
+        self.llvm_link = shutil.which(llvm_link_path) or llvm_link_path
+        self.llvm_nm = shutil.which(llvm_nm_path)
+        self.pass_options = pass_options
+        # Shared by every partition; LLVMPassService keeps concurrent runs apart.
+        self._pass_service = LLVMPassService(
+            clang_path, work_dir=work_dir, fused=fused, cache=cache, **pass_options
+        )
+        self.history = self._pass_service.history
+        self._cancelled = threading.Event()
+        if not shutil.which(self.llvm_split):
+            print(f"[WARN] llvm-split binary '{llvm_split_path}' not found in PATH. Modules will not be sharded.")
+            self.shards = 1
+
+    def cancel(self):
+        """Stop the running apply_json_conf call, killing the clang process of every partition."""
+        self._cancelled.set()
+        self._pass_service.cancel()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def _run_tool(self, cmd: List[str], what: str):
+        print("[CMD]", " ".join(cmd))
+        try:
+            subprocess.run(cmd, check=True, cwd=self.work_dir, capture_output=True, text=True)
+        except subprocess.CalledProcessError as e:
+            raise RuntimeError(f"Failed to {what}. Error: {e.stderr.strip() or e}")
+
+    def split(self, input_file: str, out_dir: str) -> List[str]:
+        """Split input_file into at most self.shards partitions and return their paths."""
+        prefix = str(Path(out_dir, "shard"))
+        self._run_tool(
+            [self.llvm_split, f"-j={self.shards}", "-preserve-locals", "-o", prefix, input_file],
+            "split the module",
+        )
+        # llvm-split names its outputs <prefix>0, <prefix>1, ...
+        return [f"{prefix}{i}" for i in range(self.shards) if Path(f"{prefix}{i}").exists()]
+
+    def has_functions(self, partition: str) -> bool:
+        """Whether a partition defines any function. Assumed when llvm-nm is unavailable or fails."""
+        if self.llvm_nm is None:
+            return True
+        proc = subprocess.run(
+            [self.llvm_nm, "--defined-only", partition], capture_output=True, text=True, cwd=self.work_dir
+        )
+        if proc.returncode != 0:
+            return True
+        # "<address> <type> <name>"; T/t are functions, W weak functions.
+        return any(line.split()[1:2] in (["T"], ["t"], ["W"]) for line in proc.stdout.splitlines())
+
+    def link(self, inputs: List[str], output_file: str):
+        """Link obfuscated partitions back into one module."""
+        self._run_tool([self.llvm_link, *inputs, "-o", output_file], "link the obfuscated shards")
+
+    def _obfuscate_shard(
+        self,
+        index: int,
+        config: Dict[str, Any],
+        shard_file: str,
+        on_progress: Optional[ProgressCallback],
+    ) -> RunResult:
+        def shard_progress(event):
+            # Also catches a cancel that arrived before this partition started.
+            if self._cancelled.is_set():
+                raise ObfuscationCancelled("Obfuscation cancelled.")
+            if on_progress is not None:
+                on_progress({**event, "shard": index, "shards": self.shards})
+
+        return self._pass_service.apply_json_conf(
+            shard_config(config, index), shard_file, f"{shard_file}_obf.bc", on_progress=shard_progress
+        )
+
+    def apply_json_conf(
+        self,
+        config: Dict[str, Any],
+        input_file: str,
+        output_file: str,
+        on_progress: Optional[ProgressCallback] = None,
+    ) -> RunResult:
+        """Obfuscate input_file partition by partition and return the merged RunResult."""
+        self._cancelled.clear()
+        compile_config(config, fused=self.fused)  # reject an invalid config before splitting
+
+        if self.shards <= 1:
+            return self._pass_service.apply_json_conf(config, input_file, output_file, on_progress=on_progress)
+
+        started_at = time.time()
+        with tempfile.TemporaryDirectory(prefix="llvm-shards-") as tmp_dir:
+            shard_files = self.split(input_file, tmp_dir)
+            if self._cancelled.is_set():
+                raise ObfuscationCancelled("Obfuscation cancelled.")
+
+            # Partitions without functions give the passes nothing to do; they are linked as they are.
+            work = [(index, f) for index, f in enumerate(shard_files) if self.has_functions(f)]
+            if not work:
+                return self._pass_service.apply_json_conf(config, input_file, output_file, on_progress=on_progress)
+
+            with ThreadPoolExecutor(max_workers=min(len(work), available_cores())) as pool:
+                futures = [
+                    pool.submit(self._obfuscate_shard, index, config, shard_file, on_progress)
+                    for index, shard_file in work
+                ]
+                try:
+                    parts = [future.result() for future in futures]
+                except BaseException:
+                    self.cancel()  # stop the other partitions instead of waiting for them
+                    raise
+
+            result = RunResult.combine(
+                parts, input_file, output_file, started_at, shards=[index for index, _ in work]
+            )
+            if self._cancelled.is_set():
+                raise ObfuscationCancelled("Obfuscation cancelled.")
+            if result.success:
+                obfuscated = {shard_file for _, shard_file in work}
+                self.link([f"{f}_obf.bc" if f in obfuscated else f for f in shard_files], output_file)
+            else:
+                print(f"[ERROR] {result.error}")
+            return result
+
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (3, 4):
+        print(__doc__)
+        sys.exit(1)
+    with open(sys.argv[2], "r", encoding="utf-8") as f:
+        shard_conf = json.load(f)
+    sharded = ShardedPassService(
+        os.getenv("CLANG_PATH", "clang"), shards=int(sys.argv[3]) if len(sys.argv) == 4 else None
+    )
+    input_path = Path(sys.argv[1])
+    print(json.dumps(sharded.apply_json_conf(
+        shard_conf, str(input_path), str(input_path.with_name(f"{input_path.stem}_obf.bc"))
+    ).to_dict()["stats"], indent=4))
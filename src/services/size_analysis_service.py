@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+size_analysis_service.py
+
+Usage:
+    python -m src.services.size_analysis_service original.bc obfuscated.bc [top]
+
+Breaks the original and the obfuscated module down per function and per
+global to show where obfuscation made the code grow:
+- Disassembles both modules with llvm-dis and streams the textual IR,
+  counting the instructions, basic blocks and disassembly bytes of every
+  function, and the data size of every global variable
+- Ranks the functions by how many instructions they gained, with their
+  growth ratio; functions the passes added or removed are reported as such
+- Caches the breakdown of a module by its content hash and the llvm-dis
+  version, so analysing the same bitcode again costs one hash
+
+The IR size of a function (its disassembly in bytes) stands in for its
+encoded size, which LLVM does not report per function. The data size of a
+global is the unpadded size of its type.
+"""
+
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from src.services.artifact_cache import ArtifactCache, get_tool_version, hash_file
+
+# Bump when the breakdown format changes, so stale cache entries are not read.
+ANALYSIS_VERSION = "1"
+
+_FUNCTION_NAME = re.compile(r'@("(?:[^"\\]|\\.)*"|[-\w$.]+)\(')
+_GLOBAL = re.compile(r'^@("(?:[^"\\]|\\.)*"|[-\w$.]+) = (.*)$')
+_NAMED_TYPE = re.compile(r'^(%"(?:[^"\\]|\\.)*"|%[-\w$.]+) = type (.*)$')
+_LABEL = re.compile(r'^("(?:[^"\\]|\\.)*"|[-\w$.]+):')
+_ARRAY_TYPE = re.compile(r"^[\[<](\d+) x (.+)[\]>]$")
+_FLOAT_SIZES = {"half": 2, "bfloat": 2, "float": 4, "double": 8, "x86_fp80": 10, "fp128": 16, "ppc_fp128": 16}
+# Clause lines of a landingpad belong to the landingpad instruction.
+_CLAUSE_PREFIXES = ("catch ", "filter ", "cleanup")
+
+
+def _unquote(name: str) -> str:
+    return name[1:-1] if name.startswith('"') else name
+
+
+def _split_top_level(text: str, sep: str = ",") -> List[str]:
+    """Split text at separators outside of brackets."""
+    parts, depth, start = [], 0, 0
+    for i, ch in enumerate(text):
+        if ch in "[{<(":
+            depth += 1
+        elif ch in "]}>)":
+            depth -= 1
+        elif ch == sep and depth == 0:
+            parts.append(text[start:i])
+            start = i + 1
+    parts.append(text[start:])
+    return [part.strip() for part in parts if part.strip()]
+
+
+def _leading_type(text: str) -> str:
+    """The type expression at the start of text, e.g. "[6 x i8]" of '[6 x i8] c"hello\\00"'."""
+    depth = 0
+    for i, ch in enumerate(text):
+        if ch in "[{<(":
+            depth += 1
+        elif ch in "]}>)":
+            depth -= 1
+        elif ch == " " and depth == 0:
+            return text[:i]
+    return text
+
+
+def type_size(type_str: str, named: Dict[str, str], _seen: Optional[set] = None) -> Optional[int]:
+    """
+    Unpadded size in bytes of an IR type, or None if it cannot be determined
+    (opaque types, functions, unknown syntax).
+    :param named: Bodies of the named types of the module ("%struct.S" -> "{ i32, ptr }").
+    """
+    type_str = type_str.strip()
+    if type_str == "ptr" or type_str.endswith("*"):
+        return 8
+    if type_str in _FLOAT_SIZES:
+        return _FLOAT_SIZES[type_str]
+    if re.fullmatch(r"i\d+", type_str):
+        return (int(type_str[1:]) + 7) // 8
+    match = _ARRAY_TYPE.match(type_str)
+    if match:
+        element = type_size(match.group(2), named, _seen)
+        return None if element is None else int(match.group(1)) * element
+    if type_str.startswith("<{") and type_str.endswith("}>"):
+        type_str = type_str[1:-1]
+    if type_str.startswith("{") and type_str.endswith("}"):
+        sizes = [type_size(field, named, _seen) for field in _split_top_level(type_str[1:-1])]
+        return None if None in sizes else sum(sizes)
+    if type_str.startswith("%"):
+        seen = _seen or set()
+        if type_str in seen or type_str not in named:
+            return None
+        return type_size(named[type_str], named, seen | {type_str})
+    return None
+
+
+def _global_type(definition: str) -> Optional[str]:
+    """The value type of a global definition such as 'private constant [6 x i8] c"..."'."""
+    tokens = definition.split(" ")
+    if "external" in tokens or "extern_weak" in tokens:
+        return None  # declared here, defined elsewhere
+    for i, token in enumerate(tokens):
+        if token in ("global", "constant"):
+            return _leading_type(" ".join(tokens[i + 1:]))
+    return None
+
+
+def parse_ir_sizes(lines: Iterable[str]) -> Dict[str, Dict[str, Dict[str, Any]]]:
+    """
+    Per-function and per-global sizes of a textual IR module.
+    :return: {"functions": {name: {"instructions", "blocks", "ir_bytes"}},
+              "globals": {name: {"data_bytes", "ir_bytes"}}}
+    """
+    functions: Dict[str, Dict[str, Any]] = {}
+    global_types: Dict[str, str] = {}
+    global_bytes: Dict[str, int] = {}
+    named: Dict[str, str] = {}
+
+    current = None
+    in_list = False  # inside the multi-line case table of a switch
+    for line in lines:
+        line = line.rstrip("\n")
+        if current is not None:
+            current["ir_bytes"] += len(line) + 1
+            stripped = line.strip()
+            if line == "}":
+                current = None
+            elif in_list:
+                in_list = stripped != "]"
+            elif not stripped or stripped.startswith(";"):
+                continue
+            elif not line[0].isspace() and _LABEL.match(line):
+                current["blocks"] += 1
+            elif not stripped.startswith(_CLAUSE_PREFIXES):
+                if current["blocks"] == 0:
+                    current["blocks"] = 1  # unlabelled entry block
+                current["instructions"] += 1
+                in_list = stripped.endswith("[")
+            continue
+
+        if line.startswith("define "):
+            match = _FUNCTION_NAME.search(line)
+            if match:
+                name = _unquote(match.group(1))
+                current = functions[name] = {"instructions": 0, "blocks": 0, "ir_bytes": len(line) + 1}
+            continue
+
+        match = _GLOBAL.match(line)
+        if match:
+            definition = match.group(2)
+            value_type = _global_type(definition)
+            if value_type is not None:  # declarations, aliases and ifuncs have no data here
+                name = _unquote(match.group(1))
+                global_types[name] = value_type
+                global_bytes[name] = len(line) + 1
+            continue
+
+        match = _NAMED_TYPE.match(line)
+        if match:
+            named[match.group(1)] = match.group(2).strip()
+
+    globals_ = {
+        name: {"data_bytes": type_size(value_type, named), "ir_bytes": global_bytes[name]}
+        for name, value_type in global_types.items()
+    }
+    return {"functions": functions, "globals": globals_}
+
+
+def compare_sizes(
+    original: Dict[str, Dict[str, Dict[str, Any]]],
+    obfuscated: Dict[str, Dict[str, Dict[str, Any]]],
+    top: int = 25,
+) -> Dict[str, Any]:
+    """
+    Compare two breakdowns from parse_ir_sizes.
+    :param top: Number of functions and globals kept in the rankings.
+    :return: Dict with "summary" (flat metrics, suitable as a stats section),
+             "functions" and "globals" (rows ranked by growth, largest first).
+    """
+    def totals(breakdown, key, field):
+        return sum(entry[field] or 0 for entry in breakdown[key].values())
+
+    functions = []
+    for name, after in obfuscated["functions"].items():
+        before = original["functions"].get(name)
+        row = {
+            "name": name,
+            "status": "kept" if before else "added",
+            "instructions": [before["instructions"] if before else 0, after["instructions"]],
+            "blocks": [before["blocks"] if before else 0, after["blocks"]],
+            "ir_bytes": [before["ir_bytes"] if before else 0, after["ir_bytes"]],
+        }
+        row["growth"] = after["instructions"] / before["instructions"] if before and before["instructions"] else None
+        functions.append(row)
+    removed = sorted(set(original["functions"]) - set(obfuscated["functions"]))
+    functions.sort(key=lambda row: (row["instructions"][1] - row["instructions"][0], row["ir_bytes"][1]), reverse=True)
+
+    globals_ = []
+    for name, after in obfuscated["globals"].items():
+        before = original["globals"].get(name)
+        globals_.append({
+            "name": name,
+            "status": "kept" if before else "added",
+            "data_bytes": [before["data_bytes"] if before else 0, after["data_bytes"]],
+            "ir_bytes": [before["ir_bytes"] if before else 0, after["ir_bytes"]],
+        })
+    globals_.sort(key=lambda row: row["ir_bytes"][1] - row["ir_bytes"][0], reverse=True)
+
+    summary: Dict[str, Any] = {}
+    for field in ("instructions", "blocks", "ir_bytes"):
+        summary[f"functions.{field}.original"] = totals(original, "functions", field)
+        summary[f"functions.{field}.obfuscated"] = totals(obfuscated, "functions", field)
+    before = summary["functions.instructions.original"]
+    if before:
+        summary["functions.instructions.growth"] = summary["functions.instructions.obfuscated"] / before
+    summary["functions.defined.original"] = len(original["functions"])
+    summary["functions.defined.obfuscated"] = len(obfuscated["functions"])
+    summary["functions.added"] = sum(1 for row in functions if row["status"] == "added")
+    summary["functions.removed"] = len(removed)
+    summary["globals.data_bytes.original"] = totals(original, "globals", "data_bytes")
+    summary["globals.data_bytes.obfuscated"] = totals(obfuscated, "globals", "data_bytes")
+    summary["globals.added"] = sum(1 for row in globals_ if row["status"] == "added")
+    if functions:
+        summary["largest_growth"] = functions[0]["name"]
+
+    return {"summary": summary, "functions": functions[:top], "globals": globals_[:top], "removed": removed}
+
+
+class SizeAnalyzer:
+    """
+    Service computing per-function size breakdowns of bitcode modules.
+    """
+
+    def __init__(self, llvm_dis_path: str = "llvm-dis", cache: Optional[ArtifactCache] = None):
+        """
+        :param llvm_dis_path: Path to llvm-dis.
+        :param cache: Breakdowns are stored in a "size-analysis" directory of this cache's root.
+        """
+        self.llvm_dis = shutil.which(llvm_dis_path) or llvm_dis_path
+        self.cache_dir = Path(cache.root, "size-analysis") if cache is not None else None
+        self._memo: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def _disassemble(self, bc_path: str) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        cmd = [self.llvm_dis, bc_path, "-o", "-"]
+        print("[CMD]", " ".join(cmd))
+        try:
+            proc = subprocess.Popen(
+                cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, errors="replace"
+            )
+        except OSError as e:
+            raise RuntimeError(f"Failed to run llvm-dis: {e}")
+        # Parsed while llvm-dis writes, so the textual IR of a large module is never held whole.
+        stderr = []
+        reader = threading.Thread(target=lambda: stderr.append(proc.stderr.read()))
+        reader.start()
+        try:
+            sizes = parse_ir_sizes(proc.stdout)
+        finally:
+            proc.stdout.close()
+            reader.join()
+            proc.wait()
+        if proc.returncode != 0:
+            raise RuntimeError(f"llvm-dis failed on {bc_path}: {stderr[0].strip()}")
+        return sizes
+
+    def analyze(self, bc_path: str) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """Per-function and per-global sizes of a bitcode file (see parse_ir_sizes)."""
+        key = f"{hash_file(bc_path)}-{ANALYSIS_VERSION}"
+        version = get_tool_version(self.llvm_dis)
+        with self._lock:
+            if key in self._memo:
+                return self._memo[key]
+        cache_file = self.cache_dir / f"{key}.json" if self.cache_dir is not None else None
+        if cache_file is not None:
+            try:
+                with open(cache_file, "r", encoding="utf-8") as f:
+                    entry = json.load(f)
+                if entry.get("tool_version") == version:
+                    print(f"[CACHE] hit size analysis {key[:12]}")
+                    with self._lock:
+                        self._memo[key] = entry["sizes"]
+                    return entry["sizes"]
+            except (OSError, json.JSONDecodeError, KeyError):
+                pass
+
+        sizes = self._disassemble(bc_path)
+        with self._lock:
+            self._memo[key] = sizes
+        if cache_file is not None:
+            try:
+                cache_file.parent.mkdir(parents=True, exist_ok=True)
+                tmp = cache_file.with_name(f"{cache_file.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump({"tool_version": version, "sizes": sizes}, f)
+                os.replace(tmp, cache_file)
+            except OSError as e:
+                print(f"[WARN] Could not cache size analysis {key[:12]}: {e}")
+        return sizes
+
+    def compare(self, original_bc: str, obfuscated_bc: str, top: int = 25) -> Dict[str, Any]:
+        """Analyse both modules and rank the functions and globals by growth (see compare_sizes)."""
+        return compare_sizes(self.analyze(original_bc), self.analyze(obfuscated_bc), top)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (3, 4):
+        print(__doc__)
+        sys.exit(1)
+    analyzer = SizeAnalyzer(os.getenv("LLVM_DIS_PATH", "llvm-dis"), ArtifactCache(os.getenv("CACHE_DIR")))
+    report = analyzer.compare(sys.argv[1], sys.argv[2], int(sys.argv[3]) if len(sys.argv) == 4 else 25)
+    print(json.dumps(report, indent=4))
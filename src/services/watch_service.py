@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+watch_service.py
+
+Usage:
+    python -m src.services.watch_service <source.c|source_dir> config.json
+
+Re-obfuscates a source file (or every source of a directory) whenever it or
+its config changes:
+- Polls the size and mtime of the watched files, which is cheap enough to
+  do several times a second and needs no platform-specific notifier
+- Coalesces bursts of changes (editor save sequences, git checkouts) and
+  only rebuilds once nothing changed for `debounce` seconds
+- Only recompiles sources whose contents (or included headers) changed,
+  only re-runs passes when the bitcode or the execution plan changed, and
+  runs stages unfused by default so the ArtifactCache restores every
+  leading stage a config edit did not touch
+- Hands every RunResult to a callback as soon as it is ready; the CLI
+  prints them, the GUI shows them and enables saving
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from src.core.plan import ConfigError, compile_config
+from src.core.result import RunResult
+from src.services.artifact_cache import ArtifactCache, hash_file
+from src.services.llvm_pass_service import LLVMPassService
+from src.services.llvm_service import LLVMService
+from src.services.project_service import SOURCE_SUFFIXES
+
+HEADER_SUFFIXES = {".h", ".hh", ".hpp", ".hxx", ".inc"}
+
+# Marks a config handed over with set_config() in the set of changed paths.
+_CONFIG_UPDATED = "<config>"
+
+# on_result(source, result) and on_error(source or None, message).
+ResultCallback = Callable[[str, RunResult], None]
+ErrorCallback = Callable[[Optional[str], str], None]
+
+
+@dataclass
+class _WatchedUnit:
+    source: Path
+    bc_path: Path
+    output_path: Path
+    source_digest: Optional[str] = None
+    bc_digest: Optional[str] = None
+    plan_key: Optional[str] = None
+    compiler: Optional[str] = None
+
+
+def _print_result(source: str, result: RunResult):
+    reused = sum(1 for usage in result.resource_usage if usage.get("cached"))
+    print(
+        f"[WATCH] {Path(source).name}: {result.status} in {result.elapsed:.2f}s "
+        f"({reused}/{len(result.resource_usage)} stages reused) -> {result.output_file}"
+    )
+
+
+def _print_error(source: Optional[str], message: str):
+    print(f"[ERROR] {Path(source).name + ': ' if source else ''}{message}")
+
+
+class WatchService:
+    """
+    Service that keeps the obfuscated output of a source file or directory
+    up to date while it is being edited.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        config_file: Optional[str] = None,
+        config: Optional[Dict[str, Any]] = None,
+        clang_path: str = "clang",
+        cache: Optional[ArtifactCache] = None,
+        debounce: float = 0.3,
+        poll_interval: float = 0.25,
+        fused: bool = False,
+        **pass_options,
+    ):
+        """
+        :param path: Source file or directory to watch.
+        :param config_file: JSON config to watch. Either this or config is required.
+        :param config: Initial config; later configs can be handed over with set_config().
+        :param cache: ArtifactCache used to skip unchanged pass stages. Defaults to the default cache directory.
+        :param debounce: Seconds without further changes before a rebuild starts.
+        :param poll_interval: Seconds between two looks at the watched files.
+        :param fused: Fuse the passes; faster full rebuilds, but a config edit then reruns every pass.
+        :param pass_options: Further LLVMPassService arguments (backend, opt_path, pass_plugin, time_passes).
+        """
+        if config_file is None and config is None:
+            raise ValueError("A config file or a config is required.")
+        self.path = Path(path).resolve()
+        if not self.path.exists():
+            raise FileNotFoundError(f"Nothing to watch at: {path}")
+        self.config_file = Path(config_file).resolve() if config_file else None
+        self.config = config
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.fused = fused
+        cache = cache or ArtifactCache()
+        self.llvm_service = LLVMService(clang_path, cache=cache)
+        self.pass_service = LLVMPassService(clang_path, fused=fused, cache=cache, **pass_options)
+        self.units: Dict[Path, _WatchedUnit] = {}
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._pending_config: Optional[Dict[str, Any]] = None
+        self._config_updated = False
+
+    def stop(self):
+        """Make run() return, cancelling the rebuild in progress."""
+        self._stop.set()
+        self.llvm_service.cancel()
+        self.pass_service.cancel()
+
+    def set_config(self, config: Dict[str, Any]):
+        """Hand over a new config from another thread; it is applied like an edited config file."""
+        with self._lock:
+            self._pending_config = config
+            self._config_updated = True
+
+    def _watched_files(self) -> List[Path]:
+        if self.path.is_dir():
+            suffixes = SOURCE_SUFFIXES | HEADER_SUFFIXES
+            files = [p for p in self.path.rglob("*") if p.suffix.lower() in suffixes]
+        else:
+            # The headers next to the source, which it most likely includes.
+            files = [self.path, *(p for p in self.path.parent.iterdir() if p.suffix.lower() in HEADER_SUFFIXES)]
+        if self.config_file is not None:
+            files.append(self.config_file)
+        return files
+
+    def _snapshot(self) -> Dict[Path, Tuple[int, int]]:
+        snapshot = {}
+        for path in self._watched_files():
+            try:
+                st = path.stat()
+            except OSError:
+                continue  # deleted between listing and stat, or mid-save
+            snapshot[path] = (st.st_mtime_ns, st.st_size)
+        return snapshot
+
+    def _sources(self) -> List[Path]:
+        if not self.path.is_dir():
+            return [self.path]
+        return sorted(p for p in self.path.rglob("*") if p.suffix.lower() in SOURCE_SUFFIXES and p.is_file())
+
+    def _load_config(self, changed: Set[Any]) -> Optional[Dict[str, Any]]:
+        """The config to build with. Raises ConfigError, OSError or JSONDecodeError for a bad config."""
+        with self._lock:
+            pending, self._pending_config = self._pending_config, None
+        if pending is not None:
+            config = pending
+        elif self.config_file is not None and (self.config is None or self.config_file in changed):
+            with open(self.config_file, "r", encoding="utf-8") as f:
+                config = json.load(f)
+        else:
+            config = self.config
+        compile_config(config, fused=self.fused)  # raises ConfigError
+        return config
+
+    def rebuild(
+        self,
+        changed: Set[Any],
+        on_result: Optional[ResultCallback] = None,
+        on_error: Optional[ErrorCallback] = None,
+    ):
+        """Bring every output up to date after the given paths changed."""
+        on_result = on_result or _print_result
+        on_error = on_error or _print_error
+        try:
+            config = self._load_config(changed)
+        except (OSError, json.JSONDecodeError) as e:
+            on_error(str(self.config_file), f"Could not read config: {e}")
+            return
+        except ConfigError as e:
+            on_error(None, "Invalid config: " + "; ".join(e.errors))
+            return
+        self.config = config
+        plan_key = compile_config(config, fused=self.fused).key
+        compiler = config.get("compiler")
+        headers_changed = any(Path(p).suffix.lower() in HEADER_SUFFIXES for p in changed if p != _CONFIG_UPDATED)
+
+        sources = self._sources()
+        self.units = {source: self.units.get(source) or _WatchedUnit(
+            source, source.with_suffix(".bc"), source.with_name(f"{source.stem}_obf.bc")
+        ) for source in sources}
+
+        for unit in self.units.values():
+            if self._stop.is_set():
+                return
+            try:
+                source_digest = hash_file(str(unit.source))
+                if source_digest != unit.source_digest or compiler != unit.compiler or headers_changed:
+                    self.llvm_service.compile_to_bytecode(
+                        str(unit.source), str(unit.bc_path), compiler, cwd=str(unit.source.parent)
+                    )
+                    unit.source_digest, unit.compiler = source_digest, compiler
+                bc_digest = hash_file(str(unit.bc_path))
+                if bc_digest == unit.bc_digest and plan_key == unit.plan_key and unit.output_path.exists():
+                    continue  # e.g. a save without edits, or an edit to a comment
+
+                result = self.pass_service.apply_json_conf(config, str(unit.bc_path), str(unit.output_path))
+            except Exception as e:
+                if self._stop.is_set():
+                    return
+                unit.source_digest = None  # retry on the next change
+                on_error(str(unit.source), str(e))
+                continue
+            if result.success:
+                unit.bc_digest, unit.plan_key = bc_digest, plan_key
+            on_result(str(unit.source), result)
+
+    def run(
+        self,
+        on_result: Optional[ResultCallback] = None,
+        on_error: Optional[ErrorCallback] = None,
+    ):
+        """Build once, then rebuild after every burst of changes until stop() is called."""
+        snapshot = self._snapshot()
+        self.rebuild(set(snapshot), on_result, on_error)
+
+        changed: Set[Any] = set()
+        last_change = 0.0
+        while not self._stop.wait(self.poll_interval):
+            current = self._snapshot()
+            diff = {p for p in current.keys() | snapshot.keys() if current.get(p) != snapshot.get(p)}
+            with self._lock:
+                if self._config_updated:
+                    diff.add(_CONFIG_UPDATED)
+                    self._config_updated = False
+            if diff:
+                changed |= diff
+                last_change = time.monotonic()
+            snapshot = current
+            if changed and time.monotonic() - last_change >= self.debounce:
+                self.rebuild(changed, on_result, on_error)
+                changed = set()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print(__doc__)
+        sys.exit(1)
+    watcher = WatchService(
+        sys.argv[1], config_file=sys.argv[2],
+        clang_path=os.getenv("CLANG_PATH", "clang"), cache=ArtifactCache(os.getenv("CACHE_DIR")),
+    )
+    print(f"[WATCH] Watching {watcher.path} and {watcher.config_file}. Press Ctrl+C to stop.")
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        watcher.stop()
@@ -0,0 +1,49 @@
+"""
+This file contains the config model shared by the pass view and the JSON view.
+"""
+
+from typing import Any, Callable, Dict, List, Optional
+
+FIELD = "field"
+PASS = "pass"
+STRUCTURE = "structure"  # a field or pass was added, the layout changed
+
+ConfigListener = Callable[[str, Optional[str]], None]
+
+
+class ConfigModel:
+    """
+    Config in the example.json format (top-level fields followed by "passes").
+    Listeners are called with (kind, name) only when a value actually changes.
+    """
+
+    def __init__(self):
+        self.fields: Dict[str, Any] = {}
+        self.passes: Dict[str, Dict[str, Any]] = {}  # pass name -> pass entry, in display order
+        self._listeners: List[ConfigListener] = []
+
+    def subscribe(self, listener: ConfigListener):
+        self._listeners.append(listener)
+
+    def _notify(self, kind: str, name: Optional[str]):
+        for listener in self._listeners:
+            listener(kind, name)
+
+    def set_field(self, key: str, value: Any):
+        if key not in self.fields:
+            self.fields[key] = value
+            self._notify(STRUCTURE, key)
+        elif self.fields[key] != value:
+            self.fields[key] = value
+            self._notify(FIELD, key)
+
+    def set_pass(self, name: str, entry: Dict[str, Any]):
+        if name not in self.passes:
+            self.passes[name] = entry
+            self._notify(STRUCTURE, name)
+        elif self.passes[name] != entry:
+            self.passes[name] = entry
+            self._notify(PASS, name)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {**self.fields, "passes": list(self.passes.values())}
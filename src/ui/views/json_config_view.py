@@ -5,6 +5,9 @@ This file contains the JSON configuration view.
 import customtkinter as ctk
 import tkinter as tk
 import json
+from typing import List, Optional, Tuple
+
+from src.ui.config_model import FIELD, PASS, STRUCTURE, ConfigModel
 
 def create_json_config_frame(parent, load_json_file_callback):
     """Creates and populates the JSON configuration frame."""
@@ -39,3 +42,62 @@ def create_json_config_frame(parent, load_json_file_callback):
     }
     json_config_text.insert(tk.END, json.dumps(default_json, indent=4))
     return config_frame, json_config_text
+
+
+class JsonConfigTextSync:
+    """
+    Mirrors a ConfigModel into the JSON textbox. The text has the same layout
+    as json.dumps(config, indent=4), so a changed field or pass entry is
+    patched in place instead of re-serialising and replacing the whole text.
+    """
+
+    def __init__(self, textbox, model: ConfigModel):
+        self.textbox = textbox
+        self.model = model
+        self._pass_line_counts: Optional[List[int]] = None  # None until the first full render
+        self._changes: List[Tuple[str, Optional[str]]] = []
+        model.subscribe(lambda kind, name: self._changes.append((kind, name)))
+
+    @staticmethod
+    def _pass_text(entry: dict) -> str:
+        return "\n".join("        " + line for line in json.dumps(entry, indent=4).splitlines())
+
+    def render(self):
+        """Replace the whole text with the model."""
+        self.textbox.delete("1.0", tk.END)
+        self.textbox.insert(tk.END, json.dumps(self.model.to_dict(), indent=4))
+        self._pass_line_counts = [self._pass_text(e).count("\n") + 1 for e in self.model.passes.values()]
+        self.textbox.edit_modified(False)
+
+    def _replace_lines(self, first: int, last: int, text: str):
+        self.textbox.delete(f"{first}.0", f"{last}.end")
+        self.textbox.insert(f"{first}.0", text)
+
+    def sync(self):
+        """Apply the model changes recorded since the last sync to the text."""
+        changes, self._changes = self._changes, []
+        # Hand edits in the JSON view or a new field/pass invalidate the known layout.
+        if (
+            self._pass_line_counts is None
+            or self.textbox.edit_modified()
+            or any(kind == STRUCTURE for kind, _ in changes)
+        ):
+            self.render()
+            return
+
+        field_names = list(self.model.fields)
+        pass_names = list(self.model.passes)
+        for kind, name in dict.fromkeys(changes):
+            if kind == FIELD:
+                line = 2 + field_names.index(name)  # line 1 is "{"
+                self._replace_lines(line, line, "    " + json.dumps({name: self.model.fields[name]})[1:-1] + ",")
+            elif kind == PASS:
+                index = pass_names.index(name)
+                first = 2 + len(field_names) + 1 + sum(self._pass_line_counts[:index])  # after '"passes": ['
+                last = first + self._pass_line_counts[index] - 1
+                text = self._pass_text(self.model.passes[name])
+                if index < len(pass_names) - 1:
+                    text += ","
+                self._replace_lines(first, last, text)
+                self._pass_line_counts[index] = text.count("\n") + 1
+        self.textbox.edit_modified(False)
@@ -1,3 +1,5 @@
-from .stats_parser import parse_llvm_stats
+from .stats_parser import merge_stats, parse_llvm_stats, parse_llvm_stats_json
+from .stats_store import StatsStore
+from .system import available_cores
 
-__all__ = [parse_llvm_stats]
+__all__ = [merge_stats, parse_llvm_stats, parse_llvm_stats_json, StatsStore, available_cores]
@@ -1,21 +1,96 @@
+import json
 import re
-from typing import Dict
+from typing import Dict, List, Optional
 
+# "   12 flattening - Number of blocks"
+_STATS_LINE_RE = re.compile(r"^\s*(\d+)\s+([^\s]+)\s+-\s+(.+)$")
 
-def parse_llvm_stats(stderr: str) -> Dict[str, dict]:
+
+def parse_llvm_stats(stderr: str, unparsed: Optional[List[str]] = None) -> Dict[str, dict]:
+    """
+    Parse the textual `-stats` report from stderr, the fallback for tools that
+    do not write `-stats-json`. Metrics are keyed by their description
+    ("Number of blocks"), unlike parse_llvm_stats_json, which keys them by
+    statistic name ("NumBlocks").
+    :param unparsed: If given, non-empty lines that are not stats lines are appended to it.
+    """
     stats = {}
     if not stderr:
         return stats  # empty dict if nothing to parse
 
-    line_re = re.compile(r"^\s*(\d+)\s+([^\s]+)\s+-\s+(.+)$")
-
     for line in stderr.splitlines():
-        m = line_re.match(line)
+        m = _STATS_LINE_RE.match(line)
         if m:
             value, pass_name, metric = m.groups()
             value = int(value)
             if pass_name not in stats:
                 stats[pass_name] = {}
             stats[pass_name][metric.strip()] = value
+        elif unparsed is not None and line.strip():
+            unparsed.append(line)
 
     return stats  # always a dict
+
+
+def _load_stats_json(text: str) -> dict:
+    # The info output file is opened for appending, so a textual timer report
+    # may follow the JSON object; only the first object is decoded.
+    start = text.find("{")
+    if start < 0:
+        raise json.JSONDecodeError("No JSON object found", text, 0)
+    data, _ = json.JSONDecoder().raw_decode(text, start)
+    return data
+
+
+def parse_llvm_stats_json(text: str) -> Dict[str, dict]:
+    """
+    Parse the `-stats-json` report, whose keys are "<debug-type>.<StatName>".
+    Timer entries and non-integer values are skipped.
+    """
+    stats = {}
+    if not text or not text.strip():
+        return stats
+
+    for key, value in _load_stats_json(text).items():
+        debug_type, _, metric = key.partition(".")
+        if not metric or debug_type == "time" or not isinstance(value, int):
+            continue
+        if debug_type not in stats:
+            stats[debug_type] = {}
+        stats[debug_type][metric] = value
+
+    return stats
+
+
+def parse_llvm_time_passes_json(text: str) -> Dict[str, dict]:
+    """
+    Extract the `-time-passes` timers from a `-stats-json` report, whose keys
+    are "time.<group>.<timer>.<wall|user|sys|mem>". Returns {timer: {kind: value}}.
+    """
+    timings = {}
+    if not text or not text.strip():
+        return timings
+
+    for key, value in _load_stats_json(text).items():
+        if not key.startswith("time."):
+            continue
+        name, _, kind = key[len("time."):].rpartition(".")
+        _, _, timer = name.partition(".")
+        if not timer or not isinstance(value, (int, float)):
+            continue
+        timings.setdefault(timer, {})[kind] = timings.get(timer, {}).get(kind, 0) + value
+
+    return timings
+
+
+def merge_stats(total: Dict[str, dict], run_stats: Dict[str, dict]) -> Dict[str, dict]:
+    """Add every metric of run_stats into total (in place) and return total."""
+    for key, metrics in run_stats.items():
+        if key not in total:
+            total[key] = {}
+        for metric_name, value in metrics.items():
+            if metric_name in total[key]:
+                total[key][metric_name] += value
+            else:
+                total[key][metric_name] = value
+    return total
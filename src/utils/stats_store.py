@@ -0,0 +1,147 @@
+"""
+Compact, typed storage for LLVM pass statistics.
+
+Every record is one (unit, stage, cycle, debug type, metric, value) tuple.
+Strings are interned into per-store tables and the records are kept as
+parallel typed arrays, so millions of records from large batch jobs cost a
+few bytes each instead of a nested dict per run. With numpy installed,
+aggregations run vectorised on zero-copy views of those arrays.
+"""
+
+import math
+from array import array
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # optional; aggregate() falls back to plain Python
+    np = None
+
+# Record fields that can be used to group aggregations.
+FIELDS = ("unit", "stage", "cycle", "debug_type", "metric")
+
+# Below this many records, numpy's per-call overhead outweighs what it saves.
+_VECTORISE_MIN = 1024
+
+
+class StatsStore:
+    def __init__(self):
+        self._tables: Dict[str, List[str]] = {"unit": [], "stage": [], "debug_type": [], "metric": []}
+        self._index: Dict[str, Dict[str, int]] = {name: {} for name in self._tables}
+        self._columns: Dict[str, array] = {
+            "unit": array("I"),
+            "stage": array("I"),
+            "cycle": array("I"),
+            "debug_type": array("I"),
+            "metric": array("I"),
+        }
+        self._values = array("q")
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def _intern(self, table: str, value: str) -> int:
+        index = self._index[table]
+        code = index.get(value)
+        if code is None:
+            code = index[value] = len(self._tables[table])
+            self._tables[table].append(value)
+        return code
+
+    def add(self, unit: str, stage: str, cycle: int, run_stats: Dict[str, dict]):
+        """Append the {debug_type: {metric: value}} stats of one run."""
+        unit_code = self._intern("unit", unit)
+        stage_code = self._intern("stage", stage)
+        for debug_type, metrics in run_stats.items():
+            type_code = self._intern("debug_type", debug_type)
+            for metric, value in metrics.items():
+                self._columns["unit"].append(unit_code)
+                self._columns["stage"].append(stage_code)
+                self._columns["cycle"].append(cycle)
+                self._columns["debug_type"].append(type_code)
+                self._columns["metric"].append(self._intern("metric", metric))
+                self._values.append(int(value))
+
+    def extend(self, other: "StatsStore"):
+        """Append every record of another store, e.g. one per translation unit."""
+        remap = {
+            name: array("I", (self._intern(name, value) for value in other._tables[name]))
+            for name in self._tables
+        }
+        for name, column in other._columns.items():
+            if name in remap:
+                table = remap[name]
+                self._columns[name].extend(table[code] for code in column)
+            else:
+                self._columns[name].extend(column)
+        self._values.extend(other._values)
+
+    def _decode(self, field: str, code: int):
+        return code if field == "cycle" else self._tables[field][code]
+
+    def _radix(self, field: str) -> int:
+        if field == "cycle":
+            return max(self._columns["cycle"]) + 1
+        return max(len(self._tables[field]), 1)
+
+    def _sum_codes(self, by: Sequence[str]) -> Optional[Dict[Tuple[int, ...], int]]:
+        """
+        Sums keyed by the codes of the `by` fields, computed with numpy on
+        whole columns. None if the combined group keys would not fit in int64.
+        """
+        radixes = [self._radix(field) for field in by]
+        if math.prod(radixes) >= 2 ** 63:
+            return None
+        keys = np.zeros(len(self._values), dtype=np.int64)
+        for field, radix in zip(by, radixes):
+            keys = keys * radix + np.frombuffer(self._columns[field], dtype=np.uint32)
+        order = np.argsort(keys, kind="stable")
+        keys = keys[order]
+        starts = np.flatnonzero(np.diff(keys, prepend=-1))
+        totals = np.add.reduceat(np.frombuffer(self._values, dtype=np.int64)[order], starts)
+
+        # Split the combined keys of the groups back into one code column per field.
+        keys = keys[starts]
+        codes = []
+        for radix in reversed(radixes):
+            keys, code = np.divmod(keys, radix)
+            codes.append(code.tolist())
+        return dict(zip(zip(*reversed(codes)), totals.tolist()))
+
+    def aggregate(self, by: Sequence[str] = ("debug_type", "metric")) -> Dict[Tuple, int]:
+        """Sum values grouped by the given record fields."""
+        for field in by:
+            if field not in FIELDS:
+                raise ValueError(f"Unknown stats field: {field}")
+        sums = None
+        if np is not None and by and len(self._values) >= _VECTORISE_MIN:
+            sums = self._sum_codes(by)
+        if sums is None:
+            columns = [self._columns[field] for field in by]
+            sums = {}
+            for key, value in zip(zip(*columns), self._values):
+                sums[key] = sums.get(key, 0) + value
+        return {
+            tuple(self._decode(field, code) for field, code in zip(by, key)): total
+            for key, total in sums.items()
+        }
+
+    def total(self) -> Dict[str, dict]:
+        """Totals across all units, stages and cycles as {debug_type: {metric: value}}."""
+        nested: Dict[str, dict] = {}
+        for (debug_type, metric), value in self.aggregate().items():
+            nested.setdefault(debug_type, {})[metric] = value
+        return nested
+
+    def records(self) -> Iterator[Tuple[str, str, int, str, str, int]]:
+        """Iterate (unit, stage, cycle, debug_type, metric, value) records."""
+        c = self._columns
+        for i, value in enumerate(self._values):
+            yield (
+                self._tables["unit"][c["unit"][i]],
+                self._tables["stage"][c["stage"][i]],
+                c["cycle"][i],
+                self._tables["debug_type"][c["debug_type"][i]],
+                self._tables["metric"][c["metric"][i]],
+                value,
+            )
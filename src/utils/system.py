@@ -0,0 +1,12 @@
+"""
+This file contains helpers about the machine the services run on.
+"""
+
+import os
+
+
+def available_cores() -> int:
+    """Number of cores this process may run on."""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
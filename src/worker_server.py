@@ -0,0 +1,110 @@
+"""
+This file contains the HTTP worker used for distributed obfuscation
+(see src/services/distributed_service.py for the protocol).
+
+Run on every worker node with:
+    uv run uvicorn src.worker_server:app --host 0.0.0.0 --port 8100
+"""
+
+import os
+import socket
+import tempfile
+from typing import Any, Dict
+
+from dotenv import load_dotenv
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import FileResponse
+from pydantic import BaseModel
+
+from src.core.plan import ConfigError
+from src.services.artifact_cache import ArtifactCache, hash_file
+from src.services.distributed_service import ArtifactMissing, LocalWorker, check_digest
+from src.services.llvm_pass_service import ObfuscationCancelled
+
+load_dotenv()
+
+worker = LocalWorker(
+    clang_path=os.getenv("CLANG_PATH", "clang"),
+    store_dir=os.getenv("WORKER_STORE_DIR"),
+    slots=int(os.getenv("WORKER_SLOTS", "0")) or None,
+    name=os.getenv("WORKER_NAME", socket.gethostname()),
+    cache=ArtifactCache(os.getenv("CACHE_DIR")),
+)
+
+app = FastAPI(title="RMOR Obfuscation Worker")
+
+
+class TaskRequest(BaseModel):
+    task_id: str
+    input: str
+    config: Dict[str, Any]
+
+
+def _checked(digest: str) -> str:
+    """The digest names a file in the store; reject anything but a sha256 hex digest."""
+    try:
+        return check_digest(digest)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/health")
+def health():
+    return worker.health()
+
+
+@app.head("/artifacts/{digest}")
+def has_artifact(digest: str):
+    return Response(status_code=200 if worker.has_artifact(_checked(digest)) else 404)
+
+
+@app.get("/artifacts/{digest}")
+def get_artifact(digest: str):
+    path = worker.artifact_path(_checked(digest))
+    if path is None:
+        raise HTTPException(status_code=404, detail="Artifact not found.")
+    return FileResponse(path, media_type="application/octet-stream")
+
+
+@app.put("/artifacts/{digest}", status_code=201)
+async def put_artifact(digest: str, request: Request):
+    _checked(digest)
+    fd, tmp_path = tempfile.mkstemp(prefix="worker-upload-", suffix=".bc")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            async for chunk in request.stream():
+                f.write(chunk)
+        if hash_file(tmp_path) != digest:
+            raise HTTPException(status_code=400, detail="Artifact does not match its digest.")
+        worker.put_artifact(tmp_path, digest)
+    finally:
+        os.unlink(tmp_path)
+    return {"digest": digest}
+
+
+@app.post("/tasks")
+def run_task(request: TaskRequest):
+    _checked(request.input)
+    try:
+        return worker.run_task(request.task_id, request.input, request.config)
+    except ArtifactMissing:
+        raise HTTPException(status_code=404, detail="Input artifact not found.")
+    except ObfuscationCancelled as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ConfigError as e:
+        raise HTTPException(status_code=400, detail=e.errors)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/tasks/{task_id}/cancel")
+def cancel_task(task_id: str):
+    if not worker.cancel_task(task_id):
+        raise HTTPException(status_code=404, detail="Task not running.")
+    return {"task_id": task_id, "cancelled": True}
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(app, host="0.0.0.0", port=8100)
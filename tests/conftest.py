@@ -0,0 +1,112 @@
+import json
+import shutil
+import stat
+import subprocess
+from pathlib import Path
+
+import pytest
+
+FAKE_CLANG = Path(__file__).with_name("fake_clang.py")
+
+
+class FakeToolchain:
+    """A fake clang (and opt) in a temporary directory, logging every call."""
+
+    def __init__(self, root: Path):
+        self.root = root
+        self.log = root / "calls.jsonl"
+        self.clang = str(self._install("clang"))
+        self.opt = str(self._install("opt"))
+
+    def _install(self, name: str) -> Path:
+        path = self.root / name
+        shutil.copyfile(FAKE_CLANG, path)
+        path.chmod(path.stat().st_mode | stat.S_IXUSR)
+        return path
+
+    @property
+    def calls(self):
+        if not self.log.exists():
+            return []
+        return [json.loads(line) for line in self.log.read_text().splitlines()]
+
+    def pass_runs(self):
+        """The -passes pipeline of every pass stage run, in order."""
+        runs = []
+        for argv in self.calls:
+            for arg in argv:
+                if arg.startswith("-passes="):
+                    runs.append(arg.split("=", 1)[1])
+        return runs
+
+    def reset(self):
+        if self.log.exists():
+            self.log.unlink()
+
+
+@pytest.fixture
+def toolchain(tmp_path, monkeypatch):
+    root = tmp_path / "bin"
+    root.mkdir()
+    fake = FakeToolchain(root)
+    monkeypatch.setenv("FAKE_CLANG_LOG", str(fake.log))
+    for name in ("FAKE_CLANG_FAIL", "FAKE_CLANG_SLEEP", "FAKE_CLANG_TEXT_STATS", "FAKE_OPT_UNSUPPORTED"):
+        monkeypatch.delenv(name, raising=False)
+    return fake
+
+
+@pytest.fixture
+def make_config():
+    def make(*passes, **sections):
+        config = {"passes": [{"name": name, "enabled": True, "params": params} for name, params in passes]}
+        config.update(sections)
+        return config
+
+    return make
+
+
+@pytest.fixture
+def input_bc(tmp_path):
+    path = tmp_path / "input.bc"
+    path.write_bytes(b"module\n")
+    return str(path)
+
+
+def requires_tools(*tools):
+    missing = [tool for tool in tools if not shutil.which(tool)]
+    return pytest.mark.skipif(bool(missing), reason=f"needs {', '.join(missing)}")
+
+
+
+MODULE_IR = """\
+@g1 = global i32 1
+@g2 = global i32 2
+@g3 = global [4 x i8] c"abc\\00"
+
+define i32 @f(i32 %x) {
+  %y = add i32 %x, 1
+  ret i32 %y
+}
+
+define i32 @h(i32 %x) {
+  %y = call i32 @f(i32 %x)
+  ret i32 %y
+}
+"""
+
+
+@pytest.fixture
+def module_bc(tmp_path):
+    """Real bitcode of a module with two functions and three globals; llvm-split -j=6 leaves 4 partitions without functions."""
+    if not shutil.which("llvm-as"):
+        pytest.skip("needs llvm-as")
+    ir = tmp_path / "module.ll"
+    ir.write_text(MODULE_IR)
+    bc = tmp_path / "module.bc"
+    subprocess.run(["llvm-as", str(ir), "-o", str(bc)], check=True)
+    return str(bc)
+
+
+def defined_symbols(bitcode: str):
+    proc = subprocess.run(["llvm-nm", "--defined-only", bitcode], check=True, capture_output=True, text=True)
+    return sorted(line.split()[-1] for line in proc.stdout.splitlines())
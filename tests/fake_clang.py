@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Stand-in for clang (and opt, when called through a name containing "opt")
+that understands just the command lines the services build:
+- `--version` and `-print-target-triple` (x86_64-pc-linux-gnu)
+- pass stages (-passes=...): copies the input (a file or stdin) to the output
+  (a file or stdout), appending one ";<pass>" line per pass unless the input
+  is real bitcode, and writes a -stats-json report with <pass>.NumRuns
+- frontend and object compiles: writes the source with the contents of the
+  headers it includes (`#include "..."`), plus a depfile for -MD -MF
+- links (no -c): writes the inputs one after the other
+
+Environment:
+    FAKE_CLANG_LOG          append every command line to this JSON lines file
+    FAKE_CLANG_FAIL         fail any stage that runs this pass
+    FAKE_CLANG_SLEEP        seconds to sleep per pass, after a stderr line per pass
+    FAKE_CLANG_TEXT_STATS   print the textual -stats report instead of writing -stats-json
+    FAKE_OPT_UNSUPPORTED    as opt, reject every pass like an opt built without them
+"""
+
+import json
+import os
+import re
+import sys
+import time
+from pathlib import Path
+
+BITCODE_MAGIC = b"BC\xc0\xde"
+_INCLUDE = re.compile(r'^\s*#\s*include\s+"([^"]+)"', re.MULTILINE)
+
+
+def _log(argv):
+    log = os.environ.get("FAKE_CLANG_LOG")
+    if log:
+        with open(log, "a", encoding="utf-8") as f:
+            f.write(json.dumps(argv) + "\n")
+
+
+def _parse(args):
+    parsed = {"llvm": [], "inputs": [], "includes": [], "output": None, "depfile": None, "flags": []}
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        if arg == "-mllvm":
+            parsed["llvm"].append(args[i + 1])
+            i += 1
+        elif arg == "-o":
+            parsed["output"] = args[i + 1]
+            i += 1
+        elif arg in ("-x", "-MF", "-I"):
+            if arg == "-MF":
+                parsed["depfile"] = args[i + 1]
+            elif arg == "-I":
+                parsed["includes"].append(args[i + 1])
+            i += 1
+        elif arg.startswith("-I"):
+            parsed["includes"].append(arg[2:])
+        elif arg.startswith(("-passes=", "-info-output-file=", "-stats", "-time-passes")):
+            parsed["llvm"].append(arg)  # opt takes the LLVM options directly
+        elif arg.startswith("-") and arg != "-":
+            parsed["flags"].append(arg)
+        else:
+            parsed["inputs"].append(arg)
+        i += 1
+    return parsed
+
+
+def _option(llvm, name):
+    for option in llvm:
+        if option.startswith(f"-{name}="):
+            return option.split("=", 1)[1]
+    return None
+
+
+def _read_input(path):
+    return sys.stdin.buffer.read() if path == "-" else Path(path).read_bytes()
+
+
+def _write_output(path, data):
+    if path == "-":
+        sys.stdout.buffer.write(data)
+    else:
+        Path(path).write_bytes(data)
+
+
+def _run_passes(parsed, opt):
+    passes = _option(parsed["llvm"], "passes").split(",")
+    if opt and os.environ.get("FAKE_OPT_UNSUPPORTED"):
+        print(f"opt: unknown pass name '{passes[0]}'", file=sys.stderr)
+        return 1
+    for name in passes:
+        print(f"remark: running {name}", file=sys.stderr, flush=True)
+        time.sleep(float(os.environ.get("FAKE_CLANG_SLEEP", "0")))
+    if os.environ.get("FAKE_CLANG_FAIL") in passes:
+        print(f"error: pass '{os.environ['FAKE_CLANG_FAIL']}' failed", file=sys.stderr)
+        return 1
+
+    data = _read_input(parsed["inputs"][0])
+    if not data.startswith(BITCODE_MAGIC):
+        data += b"".join(f";{name}\n".encode() for name in passes)
+    _write_output(parsed["output"], data)
+
+    counts = {}
+    for name in passes:
+        counts[f"{name}.NumRuns"] = counts.get(f"{name}.NumRuns", 0) + 1
+    stats_file = _option(parsed["llvm"], "info-output-file")
+    if os.environ.get("FAKE_CLANG_TEXT_STATS"):
+        for key, value in counts.items():
+            print(f"  {value} {key.split('.')[0]} - Number of runs", file=sys.stderr)
+    elif stats_file and "-stats-json" in parsed["llvm"]:
+        if "-time-passes" in parsed["llvm"]:
+            counts.update({f"time.pass.{name}.wall": 0.001 for name in passes})
+        with open(stats_file, "a", encoding="utf-8") as f:
+            json.dump(counts, f)
+    return 0
+
+
+def _expand(source, include_dirs, seen):
+    """The source with the contents of every header it includes, recursively."""
+    text = source.read_text()
+    deps = [source]
+    for name in _INCLUDE.findall(text):
+        for directory in (source.parent, *include_dirs):
+            header = Path(directory, name).resolve()
+            if header.is_file() and header not in seen:
+                seen.add(header)
+                header_text, header_deps = _expand(header, include_dirs, seen)
+                text += header_text
+                deps.extend(header_deps)
+                break
+    return text, deps
+
+
+def _compile(parsed):
+    source = Path(parsed["inputs"][0]).resolve()
+    include_dirs = [Path(d).resolve() for d in parsed["includes"]]
+    text, deps = _expand(source, include_dirs, {source})
+    target = next((f for f in parsed["flags"] if f.startswith("--target=")), "--target=host")
+    _write_output(parsed["output"], f"{target}\n{text}".encode())
+    if parsed["depfile"]:
+        escaped = " ".join(str(dep).replace(" ", "\\ ") for dep in deps)
+        Path(parsed["depfile"]).write_text(f"{parsed['output']}: {escaped}\n")
+    return 0
+
+
+def main(argv):
+    _log(argv)
+    args = argv[1:]
+    if args == ["--version"]:
+        print("fake clang version 1.0.0")
+        return 0
+    if args == ["-print-target-triple"]:
+        print("x86_64-pc-linux-gnu")
+        return 0
+    opt = "opt" in Path(argv[0]).name
+    parsed = _parse(args)
+    if _option(parsed["llvm"], "passes"):
+        return _run_passes(parsed, opt)
+    if "-c" in parsed["flags"]:
+        return _compile(parsed)
+    with open(parsed["output"], "wb") as f:
+        for path in parsed["inputs"]:
+            f.write(Path(path).read_bytes())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
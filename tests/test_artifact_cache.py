@@ -0,0 +1,85 @@
+import os
+
+from src.services.artifact_cache import ArtifactCache, hash_bytes, hash_file
+from src.services.llvm_service import LLVMService, parse_depfile
+
+
+def _entry(tmp_path, name, size):
+    path = tmp_path / f"{name}.src"
+    path.write_bytes(b"x" * size)
+    return str(path)
+
+
+def test_put_and_get_round_trip(tmp_path):
+    cache = ArtifactCache(str(tmp_path / "cache"))
+    key = cache.make_key(hash_bytes(b"input"), ["-passes=fla"], "x86_64", "clang 14")
+    assert key != cache.make_key(hash_bytes(b"input"), ["-passes=sub"], "x86_64", "clang 14")
+    assert cache.get(key, str(tmp_path / "out.bc")) is None
+
+    cache.put(key, _entry(tmp_path, "a", 10), {"stats": {"fla": {"NumRuns": 1}}})
+    assert cache.contains(key)
+    assert cache.get(key, str(tmp_path / "out.bc")) == {"stats": {"fla": {"NumRuns": 1}}}
+    assert (tmp_path / "out.bc").read_bytes() == b"x" * 10
+    assert cache.get_bytes(key) == (b"x" * 10, {"stats": {"fla": {"NumRuns": 1}}})
+    assert hash_file(str(tmp_path / "out.bc")) == hash_bytes(b"x" * 10)
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = ArtifactCache(str(tmp_path / "cache"), max_bytes=25)
+    for i, name in enumerate("abc"):
+        cache.put(name, _entry(tmp_path, name, 10))
+        artifact = cache.path(name)
+        os.utime(artifact, (i, i))
+    # "a" was stored first and never read again.
+    assert [name for name in "abc" if cache.contains(name)] == ["b", "c"]
+
+    cache.get("b", str(tmp_path / "out.bc"))  # now more recent than "c"
+    cache.put("d", _entry(tmp_path, "d", 10))
+    assert [name for name in "bcd" if cache.contains(name)] == ["b", "d"]
+
+
+def test_clear_keeps_other_services_directories(tmp_path):
+    cache = ArtifactCache(str(tmp_path / "cache"))
+    cache.put("a", _entry(tmp_path, "a", 10))
+    (cache.root / "thinlto").mkdir()
+    (cache.root / "thinlto" / "entry").write_text("kept")
+    cache.clear()
+    assert not cache.contains("a")
+    assert (cache.root / "thinlto" / "entry").read_text() == "kept"
+
+
+def test_parse_depfile():
+    text = "out.bc: main.c include/a\\ b.h \\\n  /usr/include/c.h\n"
+    assert parse_depfile(text) == ["main.c", "include/a b.h", "/usr/include/c.h"]
+    assert parse_depfile("C:\\src\\out.bc: C:\\src\\main.c\n") == ["C:\\src\\main.c"]
+    assert parse_depfile("") == []
+
+
+def test_header_edits_invalidate_the_frontend_cache(toolchain, tmp_path):
+    project = tmp_path / "project"
+    (project / "include").mkdir(parents=True)
+    source = project / "main.c"
+    source.write_text('#include "config.h"\nint main(void) { return VALUE; }\n')
+    header = project / "include" / "config.h"
+    header.write_text("#define VALUE 1\n")
+    output = tmp_path / "main.bc"
+
+    service = LLVMService(toolchain.clang, cache=ArtifactCache(str(tmp_path / "cache")))
+
+    def compile_unit():
+        """Compile main.c and return how many times the frontend actually ran."""
+        toolchain.reset()
+        service.compile_to_bytecode(str(source), str(output), "mingw/gnu", ["-Iinclude"], cwd=str(project))
+        return sum(1 for argv in toolchain.calls if "-c" in argv)
+
+    assert compile_unit() == 1
+    assert b"#define VALUE 1" in output.read_bytes()
+    output.unlink()
+    assert compile_unit() == 0
+    assert b"#define VALUE 1" in output.read_bytes()
+
+    header.write_text("#define VALUE 2\n")
+    assert compile_unit() == 1
+    assert b"#define VALUE 2" in output.read_bytes()
+    assert compile_unit() == 0
+    assert b"#define VALUE 2" in output.read_bytes()
@@ -0,0 +1,75 @@
+import pytest
+
+from src.core.plan import compile_config
+from src.services.cost_model_service import CostModel, parse_budget
+
+MB = 1024 * 1024
+
+
+def _config(*passes, **sections):
+    config = {"passes": [{"name": name, "enabled": True, "params": params} for name, params in passes]}
+    config.update(sections)
+    return config
+
+
+@pytest.fixture
+def model(tmp_path):
+    """A model that saw fla double the bitcode at 1s/MB and sub keep it at 0.5s/MB, plus 0.1s startup."""
+    model = CostModel(str(tmp_path / "history.jsonl"))
+    fla = compile_config(_config(("fla", {"seed": 1}))).stages[0]
+    sub = compile_config(_config(("sub", {"seed": 1}))).stages[0]
+    for size_mb in (1, 2, 4, 8):
+        model.observe(fla, size_mb * MB, 2 * size_mb * MB, 0.1 + 1.0 * size_mb)
+        model.observe(sub, size_mb * MB, size_mb * MB, 0.1 + 0.5 * size_mb)
+    return model
+
+
+def test_no_history(tmp_path):
+    assert CostModel(str(tmp_path / "history.jsonl")).estimate(_config(("fla", {})), MB) is None
+
+
+def test_estimate_chains_sizes_through_the_stages(model):
+    estimate = model.estimate(_config(("fla", {"seed": 3}), ("sub", {})), 4 * MB, fused=False)
+    assert [stage["stage"] for stage in estimate["stages"]] == ["fla", "sub"]
+    assert estimate["output_bytes"] == pytest.approx(8 * MB, rel=0.05)
+    # sub runs on fla's doubled output.
+    assert estimate["stages"][0]["seconds"] == pytest.approx(4.1, rel=0.1)
+    assert estimate["stages"][1]["seconds"] == pytest.approx(4.1, rel=0.1)
+    assert estimate["seconds_low"] <= estimate["seconds"] <= estimate["seconds_high"]
+    assert estimate["unknown_passes"] == []
+    assert estimate["warnings"] == []
+
+
+def test_fused_stage_pays_the_startup_once(model):
+    unfused = model.estimate(_config(("fla", {}), ("sub", {})), MB, fused=False)
+    fused = model.estimate(_config(("fla", {}), ("sub", {})), MB, fused=True)
+    assert len(fused["stages"]) == 1
+    assert fused["seconds"] < unfused["seconds"]
+
+
+def test_unknown_passes_are_reported(model):
+    estimate = model.estimate(_config(("mba", {})), MB)
+    assert estimate["unknown_passes"] == ["mba"]
+
+
+def test_history_is_reloaded(model):
+    reloaded = CostModel(str(model.history_path))
+    assert reloaded.samples == model.samples == 8
+
+
+def test_budget_warnings(model):
+    config = _config(("fla", {}), budget={"seconds": 1, "output_mb": 1})
+    assert len(model.estimate(config, 4 * MB)["warnings"]) == 2
+
+
+@pytest.mark.parametrize("budget", [{"seconds": 0}, {"seconds": "10"}, {"output_mb": True}, {"minutes": 1}, [60]])
+def test_invalid_budget(model, budget):
+    with pytest.raises(ValueError):
+        parse_budget({"budget": budget})
+    with pytest.raises(ValueError):
+        model.estimate(_config(("fla", {}), budget=budget), MB)
+
+
+def test_valid_budget():
+    assert parse_budget({}) == {}
+    assert parse_budget({"budget": {"seconds": 2.5, "output_mb": None}}) == {"seconds": 2.5}
@@ -0,0 +1,157 @@
+import threading
+
+import pytest
+from conftest import defined_symbols, requires_tools
+
+from src.services.artifact_cache import hash_file
+from src.services.distributed_service import (
+    ArtifactMissing,
+    Coordinator,
+    DistributedPassService,
+    LocalWorker,
+    RemoteTask,
+    WorkerLost,
+    check_digest,
+)
+
+
+def _worker(toolchain, tmp_path, name, slots=1):
+    return LocalWorker(toolchain.clang, store_dir=str(tmp_path / f"store-{name}"), slots=slots, name=name)
+
+
+class FlakyWorker:
+    """Wraps a worker and loses the connection on the first `failures` tasks."""
+
+    def __init__(self, worker, failures=1):
+        self.worker = worker
+        self.name = f"flaky-{worker.name}"
+        self.failures = failures
+        self.tasks = 0
+
+    def __getattr__(self, name):
+        return getattr(self.worker, name)
+
+    def run_task(self, task_id, input_digest, config):
+        self.tasks += 1
+        if self.tasks <= self.failures:
+            raise WorkerLost(f"Worker {self.name} is unreachable.")
+        return self.worker.run_task(task_id, input_digest, config)
+
+
+def _task(tmp_path, make_config, name="unit", content=b"module\n"):
+    source = tmp_path / f"{name}.bc"
+    source.write_bytes(content)
+    return RemoteTask(name, str(source), make_config(("fla", {"seed": 1})), str(tmp_path / f"{name}_obf.bc"))
+
+
+def test_worker_rejects_names_that_are_not_digests(toolchain, tmp_path, make_config):
+    worker = _worker(toolchain, tmp_path, "a")
+    for bad in ("../../etc/passwd", "A" * 64, "a" * 63):
+        with pytest.raises(ValueError):
+            check_digest(bad)
+        with pytest.raises(ValueError):
+            worker.has_artifact(bad)
+        with pytest.raises(ValueError):
+            worker.run_task("t", bad, make_config(("fla", {})))
+
+
+def test_worker_runs_a_stored_input(toolchain, tmp_path, make_config):
+    worker = _worker(toolchain, tmp_path, "a")
+    task = _task(tmp_path, make_config)
+    digest = worker.put_artifact(task.input_file)
+    assert digest == hash_file(task.input_file) and worker.has_artifact(digest)
+
+    result = worker.run_task("t", digest, task.config)
+    worker.get_artifact(result["output"], task.output_file)
+    assert open(task.output_file, "rb").read() == b"module\n;fla\n"
+    assert result["stats"] == {"fla": {"NumRuns": 1}}
+    with pytest.raises(ArtifactMissing):
+        worker.run_task("t", "0" * 64, task.config)
+
+
+def test_coordinator_retries_on_another_worker(toolchain, tmp_path, make_config):
+    flaky = FlakyWorker(_worker(toolchain, tmp_path, "a"))
+    healthy = _worker(toolchain, tmp_path, "b")
+    coordinator = Coordinator([flaky, healthy], max_retries=2)
+    coordinator.check_health()
+
+    task = _task(tmp_path, make_config)
+    [result] = coordinator.run([task])
+    assert result["worker"] == "b"
+    assert flaky.tasks == 1
+    assert open(task.output_file, "rb").read() == b"module\n;fla\n"
+
+
+def test_coordinator_gives_up_after_max_retries(toolchain, tmp_path, make_config):
+    workers = [FlakyWorker(_worker(toolchain, tmp_path, name), failures=5) for name in "abc"]
+    coordinator = Coordinator(workers, max_retries=1)
+    coordinator.check_health()
+    with pytest.raises(RuntimeError, match="after 2 attempts"):
+        coordinator.run([_task(tmp_path, make_config)])
+
+
+def test_coordinator_prefers_workers_holding_the_input(toolchain, tmp_path, make_config):
+    first, second = _worker(toolchain, tmp_path, "a"), _worker(toolchain, tmp_path, "b")
+    coordinator = Coordinator([first, second])
+    coordinator.check_health()
+    task = _task(tmp_path, make_config)
+    [result] = coordinator.run([task])
+    holder = first if result["worker"] == "a" else second
+
+    uploads = []
+    put_artifact = holder.put_artifact
+    holder.put_artifact = lambda *args: uploads.append(args) or put_artifact(*args)
+    for _ in range(3):
+        [again] = coordinator.run([task])
+        assert again["worker"] == holder.name
+    assert [args for args in uploads if args[0] == task.input_file] == []  # never sent again
+
+
+def test_coordinator_runs_tasks_in_parallel_slots(toolchain, tmp_path, make_config):
+    workers = [_worker(toolchain, tmp_path, "a", slots=2), _worker(toolchain, tmp_path, "b", slots=2)]
+    coordinator = Coordinator(workers)
+    coordinator.check_health()
+    assert coordinator.total_slots == 4
+
+    tasks = [_task(tmp_path, make_config, f"unit{i}", f"module {i}\n".encode()) for i in range(8)]
+    results = coordinator.run(tasks)
+    assert [r["status"] for r in results] == ["succeeded"] * 8
+    for i, task in enumerate(tasks):
+        assert open(task.output_file, "rb").read() == f"module {i}\n;fla\n".encode()
+
+
+def test_coordinator_holdings_are_consistent_under_threads(toolchain, tmp_path, make_config):
+    coordinator = Coordinator([_worker(toolchain, tmp_path, "a", slots=4)])
+    coordinator.check_health()
+    tasks = [_task(tmp_path, make_config, f"unit{i}", f"module {i}\n".encode()) for i in range(12)]
+    errors = []
+
+    def run(chunk):
+        try:
+            coordinator.run(chunk)
+        except Exception as e:  # pragma: no cover - reported below
+            errors.append(e)
+
+    threads = [threading.Thread(target=run, args=(tasks[i::3],)) for i in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    [holdings] = coordinator._holdings.values()
+    assert {hash_file(task.input_file) for task in tasks} <= holdings
+
+
+@requires_tools("llvm-split", "llvm-link", "llvm-nm")
+def test_sharded_distribution_skips_partitions_without_functions(toolchain, tmp_path, make_config, module_bc):
+    workers = [_worker(toolchain, tmp_path, "a", slots=3), _worker(toolchain, tmp_path, "b", slots=3)]
+    service = DistributedPassService(workers, shards=0, work_dir=str(tmp_path))
+    output = str(tmp_path / "module_obf.bc")
+    progress = []
+    result = service.apply_json_conf(make_config(("fla", {"seed": 1})), module_bc, output, progress.append)
+
+    assert result.success
+    assert len(toolchain.pass_runs()) == 2
+    assert sorted({usage["shard"] for usage in result.resource_usage}) == [1, 5]
+    assert {event["shard"] for event in progress} == {1, 5}
+    assert defined_symbols(output) == ["f", "g1", "g2", "g3", "h"]
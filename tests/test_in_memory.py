@@ -0,0 +1,48 @@
+from src.services.artifact_cache import ArtifactCache
+from src.services.llvm_pass_service import LLVMPassService
+
+
+def _io(argv):
+    """(input, output) of a pass stage command line."""
+    output = argv[argv.index("-o") + 1]
+    return argv[argv.index("-o") - 1], output
+
+
+def test_piped_stages_match_the_file_based_run(toolchain, make_config, input_bc, tmp_path):
+    config = make_config(("fla", {}), ("bcf", {}), ("sub", {}))
+    file_output, piped_output = tmp_path / "file.bc", tmp_path / "piped.bc"
+    LLVMPassService(toolchain.clang).apply_json_conf(config, input_bc, str(file_output))
+    toolchain.reset()
+    result = LLVMPassService(toolchain.clang, in_memory=True).apply_json_conf(config, input_bc, str(piped_output))
+
+    assert result.success
+    assert piped_output.read_bytes() == file_output.read_bytes() == b"module\n;fla\n;bcf\n;sub\n"
+    # Only the first stage reads a file and only the last one writes one.
+    assert [_io(argv) for argv in toolchain.calls] == [(input_bc, "-"), ("-", "-"), ("-", str(piped_output))]
+    assert all(usage["piped"] for usage in result.resource_usage)
+    assert result.stats == {"fla": {"NumRuns": 1}, "bcf": {"NumRuns": 1}, "sub": {"NumRuns": 1}}
+
+
+def test_piped_stages_are_cached_in_memory(toolchain, make_config, input_bc, tmp_path):
+    cache = ArtifactCache(str(tmp_path / "cache"))
+    config = make_config(("fla", {}), ("sub", {}))
+    service = LLVMPassService(toolchain.clang, in_memory=True, cache=cache, keep_intermediates=str(tmp_path / "keep"))
+    service.apply_json_conf(config, input_bc, str(tmp_path / "first.bc"))
+    toolchain.reset()
+    result = service.apply_json_conf(config, input_bc, str(tmp_path / "second.bc"))
+
+    assert toolchain.calls == []
+    assert [usage["cached"] for usage in result.resource_usage] == [True, True]
+    assert result.stats == {"fla": {"NumRuns": 1}, "sub": {"NumRuns": 1}}
+    assert (tmp_path / "second.bc").read_bytes() == b"module\n;fla\n;sub\n"
+    assert (tmp_path / "keep" / "input.01.fla.bc").read_bytes() == b"module\n;fla\n"
+
+
+def test_a_failed_piped_stage_fails_the_run(toolchain, make_config, input_bc, tmp_path, monkeypatch):
+    monkeypatch.setenv("FAKE_CLANG_FAIL", "sub")
+    result = LLVMPassService(toolchain.clang, in_memory=True).apply_json_conf(
+        make_config(("fla", {}), ("sub", {})), input_bc, str(tmp_path / "out.bc")
+    )
+    assert not result.success
+    assert result.error == "Pass 'sub' failed."
+    assert not (tmp_path / "out.bc").exists()
@@ -0,0 +1,127 @@
+import importlib
+import time
+
+import pytest
+
+from src.core.plan import ConfigError
+from src.services.cost_model_service import CostModel
+from src.services.job_service import CANCELLED, MAX_EVENTS, SUCCEEDED, JobManager, JobQueueFull, ObfuscationJob
+from src.services.scheduler_service import ResourceScheduler
+
+SOURCE = b"int main(void) { return 0; }\n"
+
+
+def _wait_until_finished(job, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not job.finished:
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.02)
+
+
+@pytest.fixture
+def manager(toolchain, tmp_path):
+    manager = JobManager(
+        toolchain.clang, jobs_dir=str(tmp_path / "jobs"), max_workers=1, max_pending=2,
+        scheduler=ResourceScheduler(max_procs=2, memory_budget_mb=None),
+        cost_model=CostModel(str(tmp_path / "history.jsonl")),
+    )
+    yield manager
+    manager.shutdown()
+
+
+def test_a_job_compiles_and_obfuscates_its_source(manager, make_config):
+    job = manager.submit("main.c", SOURCE, make_config(("fla", {}), ("sub", {})))
+    _wait_until_finished(job)
+
+    assert job.state == SUCCEEDED, job.error
+    assert job.stats == {"fla": {"NumRuns": 1}, "sub": {"NumRuns": 1}}
+    assert job.output_path.read_bytes().endswith(b";fla\n;sub\n")
+    events = [event["event"] for event in job.events]
+    assert events[:3] == ["queued", "running", "compiled"]
+    assert events.index("stage_started") < events.index("stage_finished") < events.index(SUCCEEDED)
+    assert job.to_dict()["has_result"]
+
+
+def test_invalid_submissions_are_rejected_before_anything_is_stored(manager, make_config, tmp_path):
+    with pytest.raises(ValueError):
+        manager.submit("notes.txt", SOURCE, make_config(("fla", {})))
+    with pytest.raises(ConfigError):
+        manager.submit("main.c", SOURCE, {"passes": [{"name": "nope", "enabled": True}]})
+    with pytest.raises(ValueError):
+        manager.submit("main.c", SOURCE, make_config(("fla", {}), limits={"wall_s": -1}))
+    assert manager.jobs == {}
+    assert not (tmp_path / "jobs").exists()
+
+
+def test_running_and_queued_jobs_can_be_cancelled(manager, make_config, monkeypatch):
+    monkeypatch.setenv("FAKE_CLANG_SLEEP", "5")
+    running = manager.submit("a.c", SOURCE, make_config(("fla", {})))
+    deadline = time.monotonic() + 5
+    while not any(event["event"] == "stage_started" for event in running.events):
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.02)
+    second = manager.submit("b.c", SOURCE, make_config(("fla", {})))
+    with pytest.raises(JobQueueFull):
+        manager.submit("c.c", SOURCE, make_config(("fla", {})))
+
+    started = time.monotonic()
+    assert manager.cancel(running.id) and manager.cancel(second.id)
+    _wait_until_finished(running)
+    _wait_until_finished(second)
+    assert time.monotonic() - started < 4
+    assert running.state == second.state == CANCELLED
+    assert not manager.cancel(running.id)  # already finished
+
+
+def test_finished_jobs_are_pruned_with_their_files(manager, make_config):
+    manager.max_finished = 1
+    first = manager.submit("a.c", SOURCE, make_config(("fla", {})))
+    _wait_until_finished(first)
+    second = manager.submit("b.c", SOURCE, make_config(("fla", {})))
+    _wait_until_finished(second)
+    manager.prune()
+    assert list(manager.jobs) == [second.id]
+    assert not first.source_path.parent.exists()
+
+    assert manager.delete(second.id)
+    assert manager.jobs == {} and not second.source_path.parent.exists()
+
+
+def test_event_positions_survive_trimming(tmp_path):
+    job = ObfuscationJob("job", tmp_path / "main.c", {})
+    for n in range(MAX_EVENTS + 10):
+        job.add_event({"event": "stage_output", "line": str(n)})
+    assert len(job.events) == MAX_EVENTS
+
+    events, position = job.events_since(0)  # the first ten are gone
+    assert events[0]["line"] == "10" and position == MAX_EVENTS + 10
+    events, position = job.events_since(MAX_EVENTS + 5)
+    assert [event["line"] for event in events] == [str(n) for n in range(MAX_EVENTS + 5, MAX_EVENTS + 10)]
+    assert job.events_since(position) == ([], position)
+
+
+def test_server_runs_jobs(toolchain, make_config, tmp_path, monkeypatch):
+    pytest.importorskip("fastapi")
+    pytest.importorskip("httpx")
+    from fastapi.testclient import TestClient
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("CLANG_PATH", toolchain.clang)
+    server = importlib.reload(importlib.import_module("src.server"))
+    with TestClient(server.app) as client:
+        response = client.post("/jobs", json={"filename": "main.c", "source": SOURCE.decode(), "config": {"passes": []}})
+        assert response.status_code == 400
+
+        response = client.post(
+            "/jobs", json={"filename": "main.c", "source": SOURCE.decode(), "config": make_config(("fla", {}))}
+        )
+        assert response.status_code == 202
+        job_id = response.json()["id"]
+        _wait_until_finished(server.job_manager.get(job_id))
+
+        assert client.get(f"/jobs/{job_id}").json()["state"] == SUCCEEDED
+        assert client.get(f"/jobs/{job_id}/stats").json() == {"fla": {"NumRuns": 1}}
+        assert client.get(f"/jobs/{job_id}/result").content.endswith(b";fla\n")
+        events = client.get(f"/jobs/{job_id}/events").text
+        assert '"event": "succeeded"' in events
+        assert client.get("/jobs/unknown").status_code == 404
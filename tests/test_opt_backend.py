@@ -0,0 +1,59 @@
+from pathlib import Path
+
+from src.services.artifact_cache import ArtifactCache
+from src.services.llvm_pass_service import LLVMPassService
+
+
+def _tools(toolchain):
+    """The program name of every call, in order."""
+    return [Path(argv[0]).name for argv in toolchain.calls if argv[1:] != ["--version"]]
+
+
+def test_opt_takes_the_llvm_options_directly(toolchain, make_config, input_bc, tmp_path):
+    service = LLVMPassService(toolchain.clang, backend="opt", opt_path=toolchain.opt, pass_plugin="/lib/Obf.so")
+    result = service.apply_json_conf(make_config(("fla", {})), input_bc, str(tmp_path / "out.bc"))
+
+    assert result.success and service.backend == "opt"
+    [argv] = toolchain.calls
+    assert Path(argv[0]).name == "opt"
+    assert "-mllvm" not in argv
+    assert "-load-pass-plugin=/lib/Obf.so" in argv and "-passes=fla" in argv
+    assert (tmp_path / "out.bc").read_bytes() == b"module\n;fla\n"
+    assert result.stats == {"fla": {"NumRuns": 1}}
+
+
+def test_opt_without_the_passes_falls_back_to_clang(toolchain, make_config, input_bc, tmp_path, monkeypatch):
+    monkeypatch.setenv("FAKE_OPT_UNSUPPORTED", "1")
+    service = LLVMPassService(toolchain.clang, backend="opt", opt_path=toolchain.opt)
+    result = service.apply_json_conf(make_config(("fla", {}), ("sub", {})), input_bc, str(tmp_path / "out.bc"))
+
+    assert result.success
+    assert service.backend == "clang"
+    # opt is tried once; the failed stage and every later one run with clang.
+    assert _tools(toolchain) == ["opt", "clang", "clang"]
+    assert (tmp_path / "out.bc").read_bytes() == b"module\n;fla\n;sub\n"
+
+
+def test_cache_entries_are_kept_apart_per_backend(toolchain, make_config, input_bc, tmp_path, monkeypatch):
+    cache = ArtifactCache(str(tmp_path / "cache"))
+    config = make_config(("fla", {}))
+    output = str(tmp_path / "out.bc")
+
+    LLVMPassService(toolchain.clang, backend="opt", opt_path=toolchain.opt, cache=cache).apply_json_conf(
+        config, input_bc, output
+    )
+    toolchain.reset()
+    result = LLVMPassService(toolchain.clang, cache=cache).apply_json_conf(config, input_bc, output)
+    assert not result.resource_usage[0].get("cached")
+    assert _tools(toolchain) == ["clang"]
+
+    # After a fallback the stage is stored under the clang key.
+    monkeypatch.setenv("FAKE_OPT_UNSUPPORTED", "1")
+    config = make_config(("sub", {}))
+    LLVMPassService(toolchain.clang, backend="opt", opt_path=toolchain.opt, cache=cache).apply_json_conf(
+        config, input_bc, output
+    )
+    toolchain.reset()
+    result = LLVMPassService(toolchain.clang, cache=cache).apply_json_conf(config, input_bc, output)
+    assert result.resource_usage[0].get("cached")
+    assert _tools(toolchain) == []
@@ -0,0 +1,59 @@
+from pathlib import Path
+
+import pytest
+
+from src.core.plan import ConfigError
+from src.core.result import FAILED, SUCCEEDED
+from src.services.llvm_pass_service import LLVMPassService
+
+
+def test_unfused_runs_one_stage_per_pass_and_cycle(toolchain, make_config, input_bc, tmp_path):
+    output = str(tmp_path / "out.bc")
+    service = LLVMPassService(toolchain.clang)
+    result = service.apply_json_conf(make_config(("fla", {"seed": 1, "cycles": 2}), ("sub", {})), input_bc, output)
+
+    assert result.status == SUCCEEDED
+    assert toolchain.pass_runs() == ["fla", "fla", "sub"]
+    assert Path(output).read_bytes() == b"module\n;fla\n;fla\n;sub\n"
+    assert result.stats == {"fla": {"NumRuns": 2}, "sub": {"NumRuns": 1}}
+    assert [usage["stage"] for usage in result.resource_usage] == ["fla", "fla", "sub"]
+
+
+def test_fused_runs_the_pipeline_in_one_invocation(toolchain, make_config, input_bc, tmp_path):
+    output = str(tmp_path / "out.bc")
+    service = LLVMPassService(toolchain.clang, fused=True)
+    result = service.apply_json_conf(make_config(("fla", {"seed": 1, "cycles": 2}), ("sub", {})), input_bc, output)
+
+    assert result.status == SUCCEEDED
+    assert toolchain.pass_runs() == ["fla,fla,sub"]
+    assert Path(output).read_bytes() == b"module\n;fla\n;fla\n;sub\n"
+    assert result.stats == {"fla": {"NumRuns": 2}, "sub": {"NumRuns": 1}}
+
+
+def test_fused_and_unfused_produce_the_same_output(toolchain, make_config, input_bc, tmp_path):
+    config = make_config(("fla", {"seed": 1}), ("bcf", {"prob": 30}), ("fla", {"seed": 1}))
+    outputs = []
+    for fused in (False, True):
+        output = tmp_path / f"out-{fused}.bc"
+        LLVMPassService(toolchain.clang, fused=fused).apply_json_conf(config, input_bc, str(output))
+        outputs.append(output.read_bytes())
+    assert outputs[0] == outputs[1]
+
+
+def test_failed_stage_stops_the_run(toolchain, make_config, input_bc, tmp_path, monkeypatch):
+    monkeypatch.setenv("FAKE_CLANG_FAIL", "bcf")
+    service = LLVMPassService(toolchain.clang)
+    result = service.apply_json_conf(
+        make_config(("fla", {}), ("bcf", {}), ("sub", {})), input_bc, str(tmp_path / "out.bc")
+    )
+    assert result.status == FAILED
+    assert result.error == "Pass 'bcf' failed."
+    assert toolchain.pass_runs() == ["fla", "bcf"]
+    assert service.last_result is result
+
+
+def test_invalid_config_runs_nothing(toolchain, input_bc, tmp_path):
+    service = LLVMPassService(toolchain.clang)
+    with pytest.raises(ConfigError):
+        service.apply_json_conf({"passes": [{"name": "nope", "enabled": True}]}, input_bc, str(tmp_path / "o.bc"))
+    assert toolchain.calls == []
@@ -0,0 +1,68 @@
+import pytest
+
+from src.core.plan import ConfigError, compile_config
+
+
+def _config(*passes):
+    return {"passes": [{"name": name, "enabled": True, "params": params} for name, params in passes]}
+
+
+def test_unfused_stage_per_pass_and_cycle():
+    plan = compile_config(_config(("fla", {"seed": 1, "cycles": 2}), ("sub", {"seed": 2})))
+    assert [stage.label for stage in plan] == ["fla", "fla", "sub"]
+    assert plan.stages[0].args == (
+        "-mllvm", "-passes=fla", "-mllvm", "-fla-seed=1", "-mllvm", "-stats",
+    )
+
+
+def test_aliases_and_unprefixed_options():
+    plan = compile_config(_config(("bcf", {"seed": 7, "prob": "30"}), ("gvenc", {"process-arrays": "true"})))
+    assert plan.stages[0].options == ("-boguscfg-seed=7", "-boguscfg-prob=30")
+    assert plan.stages[1].options == ("-gvenc-process-arrays=true",)
+
+
+def test_disabled_and_zero_cycle_passes_are_skipped():
+    config = _config(("fla", {"cycles": 0}), ("sub", {}))
+    config["passes"].append({"name": "mba", "enabled": False, "params": {}})
+    assert [stage.label for stage in compile_config(config)] == ["sub"]
+
+
+def test_invalid_config_lists_every_error():
+    config = _config(("nope", {}), ("gvenc", {"keylen": 9}), ("fla", {"seed": "x", "unknown": 1}))
+    with pytest.raises(ConfigError) as info:
+        compile_config(config)
+    assert len(info.value.errors) == 4
+    with pytest.raises(ConfigError):
+        compile_config({"passes": "fla"})
+
+
+def test_fused_folds_passes_and_cycles():
+    plan = compile_config(_config(("fla", {"seed": 1, "cycles": 2}), ("sub", {"seed": 2})), fused=True)
+    assert len(plan) == 1
+    assert plan.stages[0].pipeline == ("fla", "fla", "sub")
+    assert plan.stages[0].options == ("-fla-seed=1", "-sub-seed=2")
+
+
+def test_fused_splits_on_conflicting_options():
+    plan = compile_config(_config(("fla", {"seed": 1}), ("sub", {}), ("fla", {"seed": 2})), fused=True)
+    assert [stage.pipeline for stage in plan] == [("fla", "sub"), ("fla",)]
+
+
+def test_fused_splits_when_a_repeated_pass_drops_an_option():
+    # The second fla would otherwise run with the first one's seed.
+    plan = compile_config(_config(("fla", {"seed": 1}), ("sub", {}), ("fla", {})), fused=True)
+    assert [stage.pipeline for stage in plan] == [("fla", "sub"), ("fla",)]
+    assert plan.stages[1].options == ()
+
+
+def test_fused_keeps_a_repeated_pass_with_the_same_options():
+    plan = compile_config(_config(("fla", {"seed": 1}), ("sub", {}), ("fla", {"seed": 1})), fused=True)
+    assert [stage.pipeline for stage in plan] == [("fla", "sub", "fla")]
+
+
+def test_plans_are_memoised_and_keyed_by_arguments():
+    config = _config(("fla", {"seed": 1}))
+    assert compile_config(config) is compile_config(dict(config))
+    assert compile_config(config).key != compile_config(_config(("fla", {"seed": 2}))).key
+    plan = compile_config(config)
+    assert compile_config(plan) is plan
@@ -0,0 +1,63 @@
+import time
+
+from src.services.cost_model_service import CostModel
+from src.services.job_service import FAILED, JobManager
+from src.services.llvm_pass_service import LLVMPassService
+from src.services.scheduler_service import ResourceScheduler
+
+
+def _wait_until_finished(job, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not job.finished:
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.05)
+
+
+def test_stderr_lines_are_reported_while_the_stage_runs(toolchain, make_config, input_bc, tmp_path, monkeypatch):
+    monkeypatch.setenv("FAKE_CLANG_SLEEP", "0.5")
+    events = []
+    service = LLVMPassService(toolchain.clang, fused=True)
+    result = service.apply_json_conf(
+        make_config(("fla", {}), ("sub", {})), input_bc, str(tmp_path / "out.bc"),
+        lambda event: events.append((time.monotonic(), event)),
+    )
+    assert result.success
+
+    started = next(at for at, event in events if event["event"] == "stage_started")
+    finished = next(at for at, event in events if event["event"] == "stage_finished")
+    output = [(at, event) for at, event in events if event["event"] == "stage_output"]
+    assert [event["line"] for _, event in output] == ["remark: running fla", "remark: running sub"]
+    assert output[0][1]["stage"] == "fla,sub" and output[0][1]["run_id"] == result.run_id
+    # The first line arrives as it is written, not when the stage is over.
+    assert output[0][0] - started < 0.4
+    assert finished - output[0][0] >= 0.5
+
+
+def test_a_failing_progress_callback_does_not_block_the_stage(toolchain, make_config, input_bc, tmp_path):
+    def on_progress(event):
+        if event["event"] == "stage_output":
+            raise ValueError("client went away")
+
+    service = LLVMPassService(toolchain.clang)
+    result = service.apply_json_conf(make_config(("fla", {})), input_bc, str(tmp_path / "out.bc"), on_progress)
+    assert result.success
+    assert (tmp_path / "out.bc").read_bytes() == b"module\n;fla\n"
+
+
+def test_jobs_are_stopped_at_their_time_limit(toolchain, make_config, tmp_path, monkeypatch):
+    monkeypatch.setenv("FAKE_CLANG_SLEEP", "5")
+    manager = JobManager(
+        toolchain.clang, jobs_dir=str(tmp_path / "jobs"), max_workers=1,
+        scheduler=ResourceScheduler(max_procs=1, memory_budget_mb=None),
+        cost_model=CostModel(str(tmp_path / "history.jsonl")),
+    )
+    try:
+        started = time.monotonic()
+        job = manager.submit("main.c", b"int main(void) { return 0; }\n", make_config(("fla", {}), limits={"job_s": 1}))
+        _wait_until_finished(job)
+        assert time.monotonic() - started < 4
+        assert job.state == FAILED
+        assert job.error == "The job exceeded its time limit of 1s."
+        assert any(event["event"] == "stage_output" for event in job.events)
+    finally:
+        manager.shutdown()
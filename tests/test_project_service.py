@@ -0,0 +1,71 @@
+import json
+from pathlib import Path
+
+from src.services.project_service import ProjectService, _frontend_flags, discover_units
+
+
+def _project(tmp_path):
+    """Two units sharing a header, described by a compile_commands.json."""
+    root = tmp_path / "project"
+    (root / "src").mkdir(parents=True)
+    (root / "include").mkdir()
+    (root / "include" / "util.h").write_text("int util(void);\n")
+    (root / "src" / "main.c").write_text('#include "util.h"\nint main(void) { return util(); }\n')
+    (root / "src" / "util.c").write_text('#include "util.h"\nint util(void) { return 0; }\n')
+    database = root / "compile_commands.json"
+    database.write_text(json.dumps([
+        {"directory": str(root), "file": "src/main.c",
+         "arguments": ["cc", "-Iinclude", "-DNDEBUG", "-c", "src/main.c", "-o", "build/main.o", "-MD", "-MF", "build/main.d"]},
+        {"directory": str(root), "file": "src/util.c",
+         "command": "cc -Iinclude -O2 -c -o build/util.o src/util.c"},
+    ]))
+    return database
+
+
+def test_frontend_flags_keep_only_preprocessor_and_language_flags():
+    arguments = ["cc", "-Iinclude", "-DX=1", "-std=c11", "-c", "a.c", "-o", "a.o", "-MD", "-MF", "a.d", "-MT", "a.o"]
+    assert _frontend_flags(arguments, "a.c") == ("-Iinclude", "-DX=1", "-std=c11")
+
+
+def test_units_are_read_from_a_compile_database(tmp_path):
+    database = _project(tmp_path)
+    units = discover_units(str(database))
+    assert [Path(unit.source).name for unit in units] == ["main.c", "util.c"]
+    assert units[0].flags == ("-Iinclude", "-DNDEBUG")
+    assert units[1].flags == ("-Iinclude", "-O2")
+    assert discover_units(str(database.parent)) == units
+
+
+def test_units_of_a_plain_source_directory(tmp_path):
+    _project(tmp_path)
+    units = discover_units(str(tmp_path / "project" / "src"))
+    assert [Path(unit.source).name for unit in units] == ["main.c", "util.c"]
+    assert all(unit.flags == () for unit in units)
+
+
+def test_every_unit_is_obfuscated_and_merged(toolchain, make_config, tmp_path):
+    database = _project(tmp_path)
+    events = []
+    service = ProjectService(toolchain.clang, llvm_link_path=toolchain.clang, jobs=2)
+    report = service.obfuscate_project(
+        str(database), make_config(("fla", {"seed": 1})), out_dir=str(tmp_path / "out"), on_progress=events.append
+    )
+
+    assert report["units"] == 2 and report["failed"] == {}
+    assert report["stats"] == {"fla": {"NumRuns": 2}}
+    assert sorted(entry["unit"] for entry in report["resource_usage"]) == ["main.c", "util.c"]
+    [merged] = report["outputs"]
+    text = Path(merged).read_text()
+    # Both units, compiled with the header from -Iinclude, each obfuscated once.
+    assert text.count("int util(void);") == 2 and text.count(";fla") == 2
+    assert events[0] == {"event": "project_started", "total": 2}
+    assert [event["done"] for event in events[1:]] == [1, 2]
+
+
+def test_failed_units_are_reported(toolchain, make_config, tmp_path, monkeypatch):
+    database = _project(tmp_path)
+    monkeypatch.setenv("FAKE_CLANG_FAIL", "fla")
+    service = ProjectService(toolchain.clang, llvm_link_path=toolchain.clang, jobs=2)
+    report = service.obfuscate_project(str(database), make_config(("fla", {})), out_dir=str(tmp_path / "out"))
+    assert sorted(Path(source).name for source in report["failed"]) == ["main.c", "util.c"]
+    assert report["outputs"] == []
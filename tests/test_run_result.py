@@ -0,0 +1,90 @@
+import pickle
+import threading
+import time
+
+import pytest
+
+from src.core.result import CANCELLED, FAILED, SUCCEEDED, RunResult
+from src.services.llvm_pass_service import LLVMPassService
+from src.utils.stats_store import StatsStore
+
+
+def _part(status=SUCCEEDED, error=None, stats=None, stage="fla"):
+    store = StatsStore()
+    store.add("unit", stage, 1, stats or {})
+    return RunResult.create(
+        run_id="part", input_file="in.bc", output_file="out.bc", status=status,
+        stats=stats or {}, resource_usage=[{"stage": stage, "wall_s": 1.0}],
+        started_at=0.0, error=error, stats_store=store,
+    )
+
+
+def test_results_are_read_only_and_picklable():
+    result = _part(stats={"fla": {"NumRuns": 1}})
+    with pytest.raises(TypeError):
+        result.stats["fla"]["NumRuns"] = 2
+    with pytest.raises(TypeError):
+        result.stats.update({})
+    assert result.to_dict()["stats"] == {"fla": {"NumRuns": 1}}
+    result.to_dict()["stats"]["fla"]["NumRuns"] = 5  # a mutable copy
+    assert pickle.loads(pickle.dumps(result)) == result
+
+
+def test_combine_merges_stats_and_tags_shards():
+    parts = [_part(stats={"fla": {"NumRuns": 1}}), _part(stats={"fla": {"NumRuns": 2}, "sub": {"NumRuns": 1}})]
+    combined = RunResult.combine(parts, "in.bc", "out.bc", started_at=0.0, shards=[3, 5])
+    assert combined.status == SUCCEEDED
+    assert combined.stats == {"fla": {"NumRuns": 3}, "sub": {"NumRuns": 1}}
+    assert [usage["shard"] for usage in combined.resource_usage] == [3, 5]
+    assert len(combined.stats_store) == len(parts[0].stats_store) + len(parts[1].stats_store)
+
+
+def test_combine_reports_the_first_failure():
+    parts = [_part(), _part(FAILED, "Pass 'bcf' failed."), _part(CANCELLED, "cancelled")]
+    combined = RunResult.combine(parts, "in.bc", "out.bc", started_at=0.0)
+    assert combined.status == FAILED
+    assert combined.error == "Pass 'bcf' failed."
+    assert [usage["shard"] for usage in combined.resource_usage] == [0, 1, 2]
+
+
+def test_concurrent_runs_keep_their_results_apart(toolchain, make_config, tmp_path):
+    service = LLVMPassService(toolchain.clang, history_size=2)
+    results = {}
+
+    def run(name, config):
+        source = tmp_path / f"{name}.bc"
+        source.write_bytes(name.encode() + b"\n")
+        results[name] = service.apply_json_conf(config, str(source), str(tmp_path / f"{name}_obf.bc"))
+
+    threads = [
+        threading.Thread(target=run, args=("a", make_config(("fla", {})))),
+        threading.Thread(target=run, args=("b", make_config(("sub", {}), ("sub", {})))),
+        threading.Thread(target=run, args=("c", make_config(("mba", {})))),
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results["a"].stats == {"fla": {"NumRuns": 1}}
+    assert results["b"].stats == {"sub": {"NumRuns": 2}}
+    assert results["c"].stats == {"mba": {"NumRuns": 1}}
+    assert len({result.run_id for result in results.values()}) == 3
+    assert len(service.history) == 2
+
+
+def test_cancel_without_a_run_id_does_not_stick(toolchain):
+    service = LLVMPassService(toolchain.clang)
+    service.cancel()
+    assert service.run_command(["echo", "first"])[:2] == (True, "first")
+
+    outcome = {}
+    thread = threading.Thread(target=lambda: outcome.update(result=service.run_command(["sleep", "5"])))
+    started = time.monotonic()
+    thread.start()
+    time.sleep(0.3)
+    service.cancel()
+    thread.join(5)
+    assert outcome["result"][0] is False
+    assert time.monotonic() - started < 4
+    assert service.run_command(["echo", "again"])[:2] == (True, "again")
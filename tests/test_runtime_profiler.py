@@ -0,0 +1,42 @@
+import subprocess
+
+import pytest
+from conftest import requires_tools
+
+from src.services.runtime_profiler_service import RuntimeProfiler, TargetMismatch, _same_platform
+
+
+def test_triples_match_by_arch_os_and_environment():
+    assert _same_platform("x86_64-unknown-linux-gnu", "x86_64-pc-linux-gnu")
+    assert _same_platform("arm64-apple-macosx14.0.0", "arm64-apple-darwin23.1.0")
+    assert _same_platform("x86_64-pc-linux", "x86_64-pc-linux-gnu")
+    assert not _same_platform("x86_64-pc-windows-msvc", "x86_64-pc-linux-gnu")
+    assert not _same_platform("x86_64-w64-windows-gnu", "x86_64-pc-windows-msvc")
+    assert not _same_platform("aarch64-unknown-linux-gnu", "x86_64-pc-linux-gnu")
+
+
+def _bitcode(tmp_path, name, triple):
+    ir = tmp_path / f"{name}.ll"
+    header = f'target triple = "{triple}"\n' if triple else ""
+    ir.write_text(header + "define i32 @main() {\n  ret i32 0\n}\n")
+    bc = tmp_path / f"{name}.bc"
+    subprocess.run(["llvm-as", str(ir), "-o", str(bc)], check=True)
+    return str(bc)
+
+
+@requires_tools("llvm-as", "llvm-dis")
+def test_bitcode_for_another_target_is_not_linked(toolchain, tmp_path):
+    original = _bitcode(tmp_path, "main", "x86_64-pc-windows-msvc")
+    obfuscated = _bitcode(tmp_path, "main_obf", "x86_64-pc-windows-msvc")
+    profiler = RuntimeProfiler(toolchain.clang, work_dir=str(tmp_path))
+    with pytest.raises(TargetMismatch, match="x86_64-pc-windows-msvc"):
+        profiler.profile(original, obfuscated, runs=2)
+    assert all(original not in argv for argv in toolchain.calls)  # nothing was linked
+
+
+@requires_tools("llvm-as", "llvm-dis")
+def test_bitcode_for_the_host_passes_the_check(toolchain, tmp_path):
+    profiler = RuntimeProfiler(toolchain.clang, work_dir=str(tmp_path))
+    assert profiler.bitcode_triple(_bitcode(tmp_path, "none", None)) == ""
+    profiler.check_target(_bitcode(tmp_path, "none", None))
+    profiler.check_target(_bitcode(tmp_path, "linux", "x86_64-unknown-linux-gnu"))
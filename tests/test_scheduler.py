@@ -0,0 +1,122 @@
+import os
+import threading
+import time
+
+import pytest
+
+from src.services.llvm_pass_service import LLVMPassService
+from src.services.scheduler_service import (
+    BATCH,
+    INTERACTIVE,
+    NORMAL,
+    ResourceLimits,
+    ResourceScheduler,
+)
+
+
+def _acquire_in_thread(scheduler, priority, memory_mb, order, name, cancelled=None):
+    def run():
+        if scheduler.acquire(priority, memory_mb, cancelled):
+            order.append(name)
+        else:
+            order.append(f"{name}:cancelled")
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+
+def _wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_slots_bound_the_running_processes():
+    scheduler = ResourceScheduler(max_procs=2, memory_budget_mb=None)
+    assert scheduler.acquire(NORMAL, 100)
+    assert scheduler.acquire(NORMAL, 100)
+    order = []
+    thread = _acquire_in_thread(scheduler, NORMAL, 100, order, "third")
+    _wait_for(lambda: scheduler.waiting == 1)
+    assert order == []
+    scheduler.release(100)
+    thread.join(2.0)
+    assert order == ["third"]
+    assert scheduler.running == 2
+
+
+def test_waiters_start_by_priority_then_arrival():
+    scheduler = ResourceScheduler(max_procs=1, memory_budget_mb=None)
+    assert scheduler.acquire(NORMAL, 0)
+    order = []
+    threads = []
+    for name, priority in (("batch", BATCH), ("normal-1", NORMAL), ("normal-2", NORMAL), ("interactive", INTERACTIVE)):
+        threads.append(_acquire_in_thread(scheduler, priority, 0, order, name))
+        _wait_for(lambda n=len(threads): scheduler.waiting == n)
+    for _ in threads:
+        scheduler.release(0)
+        _wait_for(lambda n=len(order) + 1: len(order) == n)
+    assert order == ["interactive", "normal-1", "normal-2", "batch"]
+
+
+def test_memory_budget_and_oversized_processes():
+    scheduler = ResourceScheduler(max_procs=4, memory_budget_mb=1000)
+    assert scheduler.acquire(NORMAL, 600)
+    order = []
+    thread = _acquire_in_thread(scheduler, NORMAL, 600, order, "second")
+    _wait_for(lambda: scheduler.waiting == 1)
+    scheduler.release(600)
+    thread.join(2.0)
+    assert order == ["second"]
+    scheduler.release(600)
+    # Larger than the whole budget: still runs, alone.
+    assert scheduler.acquire(NORMAL, 5000)
+
+
+def test_cancelled_waiter_reserves_nothing():
+    scheduler = ResourceScheduler(max_procs=1, memory_budget_mb=None)
+    assert scheduler.acquire(NORMAL, 0)
+    cancelled = threading.Event()
+    order = []
+    thread = _acquire_in_thread(scheduler, NORMAL, 0, order, "waiter", cancelled)
+    _wait_for(lambda: scheduler.waiting == 1)
+    cancelled.set()
+    thread.join(2.0)
+    assert order == ["waiter:cancelled"]
+    assert scheduler.waiting == 0
+    assert scheduler.running == 1
+
+
+def test_reservation_is_the_memory_limit():
+    scheduler = ResourceScheduler(max_procs=1, memory_budget_mb=None, default_reservation_mb=256)
+    assert scheduler.reservation(None) == 256
+    assert scheduler.reservation(ResourceLimits(memory_mb=2048)) == 2048
+
+
+def test_limits_from_config(monkeypatch):
+    monkeypatch.delenv("PASS_MEMORY_LIMIT_MB", raising=False)
+    monkeypatch.setenv("PASS_CPU_LIMIT_S", "60")
+    monkeypatch.delenv("PASS_TIMEOUT_S", raising=False)
+    limits = ResourceLimits.from_config({"limits": {"memory_mb": "512"}})
+    assert limits == ResourceLimits(memory_mb=512, cpu_s=60, wall_s=None)
+    with pytest.raises(ValueError):
+        ResourceLimits.from_config({"limits": {"wall_s": 0}})
+
+
+def test_a_failing_prlimit_does_not_leave_the_process_behind(monkeypatch):
+    pids = []
+
+    def apply(self, pid):
+        pids.append(pid)
+        raise PermissionError("prlimit denied")
+
+    monkeypatch.setattr(ResourceLimits, "apply", apply)
+    service = LLVMPassService("true", limits=ResourceLimits(memory_mb=1024))
+    started = time.monotonic()
+    success, _, stderr, _ = service.run_command(["sleep", "30"])
+    assert not success and "prlimit denied" in stderr
+    assert time.monotonic() - started < 5
+    with pytest.raises(ProcessLookupError):
+        os.kill(pids[0], 0)  # killed and reaped
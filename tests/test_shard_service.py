@@ -0,0 +1,58 @@
+import subprocess
+
+from conftest import defined_symbols, requires_tools
+
+from src.services.shard_service import ShardedPassService, derive_seed, shard_config
+
+pytestmark = requires_tools("llvm-split", "llvm-link", "llvm-nm")
+
+
+def test_shard_seeds_are_derived_per_partition(make_config):
+    config = make_config(("fla", {"seed": 1}), ("bcf", {"seed": 2, "prob": 30}))
+    first, second = shard_config(config, 0), shard_config(config, 1)
+    assert first["passes"][0]["params"]["seed"] == derive_seed(1, 0)
+    assert first["passes"][0]["params"]["seed"] != second["passes"][0]["params"]["seed"]
+    assert first["passes"][1]["params"]["prob"] == 30
+    assert config["passes"][0]["params"]["seed"] == 1  # not modified
+    assert shard_config(config, 0) == first
+
+
+def test_partitions_without_functions_are_linked_unchanged(toolchain, make_config, module_bc, tmp_path):
+    output = str(tmp_path / "module_obf.bc")
+    service = ShardedPassService(toolchain.clang, shards=6)
+    progress = []
+    result = service.apply_json_conf(make_config(("fla", {"seed": 1})), module_bc, output, progress.append)
+
+    assert result.success
+    # llvm-split puts f and h into two of the six partitions.
+    assert len(toolchain.pass_runs()) == 2
+    assert sorted({usage["shard"] for usage in result.resource_usage}) == [1, 5]
+    assert {event["shard"] for event in progress} == {1, 5}
+    assert result.stats == {"fla": {"NumRuns": 2}}
+    assert defined_symbols(output) == ["f", "g1", "g2", "g3", "h"]
+
+
+def test_module_without_functions_runs_whole(toolchain, make_config, tmp_path):
+    ir = tmp_path / "data.ll"
+    ir.write_text("@a = global i32 1\n@b = global i32 2\n")
+    bc = tmp_path / "data.bc"
+    subprocess.run(["llvm-as", str(ir), "-o", str(bc)], check=True)
+    output = tmp_path / "data_obf.bc"
+
+    result = ShardedPassService(toolchain.clang, shards=4).apply_json_conf(
+        make_config(("fla", {})), str(bc), str(output)
+    )
+    assert result.success
+    assert toolchain.pass_runs() == ["fla"]
+    assert output.read_bytes() == bc.read_bytes()
+
+
+def test_failed_partition_fails_the_run(toolchain, make_config, module_bc, tmp_path, monkeypatch):
+    monkeypatch.setenv("FAKE_CLANG_FAIL", "fla")
+    output = tmp_path / "module_obf.bc"
+    result = ShardedPassService(toolchain.clang, shards=6).apply_json_conf(
+        make_config(("fla", {})), module_bc, str(output)
+    )
+    assert not result.success
+    assert result.error == "Pass 'fla' failed."
+    assert not output.exists()
@@ -0,0 +1,44 @@
+from src.services.size_analysis_service import parse_ir_sizes
+
+MODULE = """\
+%struct.S = type { i32, [4 x i8] }
+@msg = private constant [6 x i8] c"hello\\00", align 1
+@s = global %struct.S zeroinitializer, align 4
+@ext = external global i32
+declare i32 @puts(ptr)
+
+define i32 @main(i32 %x) {
+entry:
+  %c = icmp eq i32 %x, 0
+  br i1 %c, label %a, label %b
+
+a:
+  switch i32 %x, label %b [
+    i32 1, label %b
+    i32 2, label %b
+  ]
+
+b:
+  ret i32 0
+}
+
+define internal void @"quoted name"() {
+  ret void
+}
+"""
+
+
+def test_function_sizes():
+    functions = parse_ir_sizes(MODULE.splitlines(True))["functions"]
+    assert set(functions) == {"main", "quoted name"}
+    # The case table of the switch is one instruction.
+    assert functions["main"]["instructions"] == 4
+    assert functions["main"]["blocks"] == 3
+    assert functions["quoted name"] == {"instructions": 1, "blocks": 1, "ir_bytes": 53}
+
+
+def test_global_sizes_skip_declarations():
+    globals_ = parse_ir_sizes(MODULE.splitlines(True))["globals"]
+    assert set(globals_) == {"msg", "s"}
+    assert globals_["msg"]["data_bytes"] == 6
+    assert globals_["s"]["data_bytes"] == 8
@@ -0,0 +1,62 @@
+import json
+
+import pytest
+
+from src.services.llvm_pass_service import LLVMPassService
+from src.utils.stats_parser import parse_llvm_stats, parse_llvm_stats_json, parse_llvm_time_passes_json
+
+
+REPORT = json.dumps({
+    "flattening.NumBlocks": 12,
+    "flattening.NumSwitches": 3,
+    "boguscfg.NumAdded": 7,
+    "time.pass.Flattening.wall": 0.5,
+    "ratio.Average": 0.5,
+})
+
+
+def test_stats_are_keyed_by_debug_type_and_name():
+    assert parse_llvm_stats_json(REPORT) == {
+        "flattening": {"NumBlocks": 12, "NumSwitches": 3},
+        "boguscfg": {"NumAdded": 7},
+    }
+
+
+def test_text_after_the_json_object_is_ignored():
+    text = REPORT + "\n===---===\n  Pass execution timing report\n"
+    assert parse_llvm_stats_json(text)["boguscfg"] == {"NumAdded": 7}
+
+
+def test_empty_report():
+    assert parse_llvm_stats_json("") == {}
+    assert parse_llvm_stats_json("  \n") == {}
+
+
+def test_report_without_json():
+    with pytest.raises(json.JSONDecodeError):
+        parse_llvm_stats_json("no report")
+
+
+def test_time_passes_are_summed_per_timer():
+    text = json.dumps({
+        "time.pass.Flattening.wall": 0.5,
+        "time.pass.Flattening.user": 0.25,
+        "time.analysis.Flattening.wall": 0.25,
+        "flattening.NumBlocks": 12,
+    })
+    assert parse_llvm_time_passes_json(text) == {"Flattening": {"wall": 0.75, "user": 0.25}}
+
+
+def test_textual_report():
+    unparsed = []
+    stderr = "remark: running fla\n   12 flattening - Number of blocks\n    3 flattening - Number of switches\n"
+    assert parse_llvm_stats(stderr, unparsed) == {"flattening": {"Number of blocks": 12, "Number of switches": 3}}
+    assert unparsed == ["remark: running fla"]
+
+
+def test_runs_without_a_json_report_fall_back_to_the_textual_stats(toolchain, make_config, input_bc, tmp_path, monkeypatch):
+    monkeypatch.setenv("FAKE_CLANG_TEXT_STATS", "1")
+    service = LLVMPassService(toolchain.clang)
+    result = service.apply_json_conf(make_config(("fla", {}), ("sub", {})), input_bc, str(tmp_path / "out.bc"))
+    assert result.success
+    assert result.stats == {"fla": {"Number of runs": 1}, "sub": {"Number of runs": 1}}
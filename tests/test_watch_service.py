@@ -0,0 +1,93 @@
+import threading
+import time
+
+from src.services.artifact_cache import ArtifactCache
+from src.services.watch_service import _CONFIG_UPDATED, WatchService
+
+
+def _source(tmp_path):
+    """A source file including a header next to it."""
+    (tmp_path / "util.h").write_text("int util(void);\n")
+    source = tmp_path / "main.c"
+    source.write_text('#include "util.h"\nint main(void) { return util(); }\n')
+    return source
+
+
+def _watcher(toolchain, tmp_path, config, **options):
+    return WatchService(
+        str(_source(tmp_path)), config=config, clang_path=toolchain.clang,
+        cache=ArtifactCache(str(tmp_path / "cache")), **options,
+    )
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.02)
+
+
+def test_a_burst_of_edits_is_rebuilt_once(toolchain, make_config, tmp_path):
+    watcher = _watcher(toolchain, tmp_path, make_config(("fla", {})), debounce=0.3, poll_interval=0.02)
+    results, errors = [], []
+    thread = threading.Thread(
+        target=watcher.run,
+        kwargs={"on_result": lambda source, result: results.append(result),
+                "on_error": lambda source, message: errors.append(message)},
+    )
+    thread.start()
+    try:
+        _wait_for(lambda: len(results) == 1)
+        for n in range(3):
+            with open(tmp_path / "main.c", "a") as f:
+                f.write(f"int edit{n};\n")
+            time.sleep(0.05)
+        _wait_for(lambda: len(results) == 2)
+        time.sleep(0.5)
+    finally:
+        watcher.stop()
+        thread.join(timeout=5)
+
+    assert not thread.is_alive()
+    assert errors == [] and len(results) == 2
+    assert all(result.success for result in results)
+    output = (tmp_path / "main_obf.bc").read_text()
+    assert "int edit2;" in output and output.endswith(";fla\n")
+    assert toolchain.pass_runs() == ["fla", "fla"]
+
+
+def test_a_header_edit_recompiles_the_source(toolchain, make_config, tmp_path):
+    watcher = _watcher(toolchain, tmp_path, make_config(("fla", {})))
+    results = []
+    watcher.rebuild({tmp_path / "main.c"}, lambda source, result: results.append(result))
+    # Nothing changed: the output is left alone.
+    watcher.rebuild(set(), lambda source, result: results.append(result))
+    assert len(results) == 1
+
+    (tmp_path / "util.h").write_text("int util(int);\n")
+    watcher.rebuild({tmp_path / "util.h"}, lambda source, result: results.append(result))
+    assert len(results) == 2 and results[1].success
+    assert "int util(int);" in (tmp_path / "main_obf.bc").read_text()
+
+
+def test_a_config_edit_reuses_the_stages_it_did_not_touch(toolchain, make_config, tmp_path):
+    watcher = _watcher(toolchain, tmp_path, make_config(("fla", {})))
+    results = []
+    watcher.rebuild({tmp_path / "main.c"}, lambda source, result: results.append(result))
+
+    toolchain.reset()
+    watcher.set_config(make_config(("fla", {}), ("sub", {})))
+    watcher.rebuild({_CONFIG_UPDATED}, lambda source, result: results.append(result))
+    assert [usage.get("cached", False) for usage in results[1].resource_usage] == [True, False]
+    assert toolchain.pass_runs() == ["sub"]
+    assert (tmp_path / "main_obf.bc").read_text().endswith(";fla\n;sub\n")
+
+
+def test_an_invalid_config_is_reported_and_the_last_one_kept(toolchain, make_config, tmp_path):
+    config = make_config(("fla", {}))
+    watcher = _watcher(toolchain, tmp_path, config)
+    errors = []
+    watcher.set_config({"passes": [{"name": "nope", "enabled": True}]})
+    watcher.rebuild({_CONFIG_UPDATED}, lambda source, result: None, lambda source, message: errors.append(message))
+    assert len(errors) == 1 and errors[0].startswith("Invalid config: ")
+    assert watcher.config == config